@@ -0,0 +1,85 @@
+# benchmarks/codec_benchmark.py
+"""Compare JSON decoding of report bodies with the stdlib and orjson.
+
+Generates synthetic report responses shaped like the Pitágoras report
+endpoints (``{"headers": [...], "rows": [[...], ...]}``) and measures
+decode time and peak memory (tracemalloc) for each available backend.
+
+Usage:
+    python benchmarks/codec_benchmark.py [--rows 10000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pitagoras import codec  # noqa: E402
+
+HEADERS = [
+    "campaign.name", "campaign.id", "segments.date",
+    "metrics.cost_micros", "metrics.impressions", "metrics.clicks",
+]
+
+
+def build_body(rows: int) -> bytes:
+    """Synthetic Google Ads report body with ``rows`` rows."""
+    data = {
+        "headers": HEADERS,
+        "rows": [
+            [f"Campaña {i % 500}", str(10_000 + i % 500), f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+             i * 1_000 % 9_999_991, i % 5_000, i % 300]
+            for i in range(rows)
+        ],
+    }
+    return codec.dumps(data)
+
+
+def backends():
+    result = {"json": json.loads}
+    if codec.orjson is not None:
+        result["orjson"] = codec.orjson.loads
+    return result
+
+
+def measure(decode, body: bytes, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        data = decode(body)
+        best = min(best, time.perf_counter() - start)
+        del data
+
+    gc.collect()
+    tracemalloc.start()
+    data = decode(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Backend activo en pitagoras.codec: {codec.JSON_BACKEND}\n")
+    print("| Filas | Tamaño (MB) | Backend | Decodificación (ms) | Pico de memoria (MB) |")
+    print("| --- | --- | --- | --- | --- |")
+    for rows in args.rows:
+        body = build_body(rows)
+        size = len(body) / 1024 / 1024
+        for name, decode in backends().items():
+            seconds, peak = measure(decode, body, args.repeat)
+            print(f"| {rows:,} | {size:.1f} | {name} | {seconds * 1000:.1f} | {peak / 1024 / 1024:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
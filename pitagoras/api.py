@@ -1,45 +1,247 @@
 # pitagoras/api.py
+import asyncio
+import gzip
 import httpx
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Tuple
 
-from .config import ENDPOINTS, AUTH_TOKEN, DEFAULT_USER_EMAIL
+from . import cassette, codec, deadline, progress
+from .batching import AccountBatcher, ReportBatcher, split_facebook_fields
+from .cache import ReportCache
+from .replicas import ReplicaPool
+from .config import (
+    ENDPOINTS,
+    AUTH_TOKEN,
+    API_BASE_URLS,
+    API_LATENCY_EWMA_ALPHA,
+    API_FAILURE_THRESHOLD,
+    API_FAILURE_COOLDOWN_SECONDS,
+    API_HEALTH_INTERVAL_SECONDS,
+    API_HEALTH_PATH,
+    DEFAULT_USER_EMAIL,
+    CUSTOMERS_CACHE_TTL,
+    REPORT_BATCH_WINDOW_MS,
+    ACCOUNT_BATCH_SIZE,
+    ACCOUNT_BATCH_MAX_ROWS,
+    ACCOUNT_BATCH_CONCURRENCY,
+    ACCOUNT_BATCH_TARGET_SECONDS,
+    REPORT_CACHE_TTL,
+    REPORT_CACHE_MAX_ENTRIES,
+    REPORT_CACHE_MAX_MB,
+    SPILL_THRESHOLD_MB,
+    GA4_LOCAL_FILTERS,
+    REQUEST_COMPRESSION_MIN_BYTES,
+)
+from .filters import FilterCompileError, apply_filter, filter_vars
+from .models import Customer
+from .offload import run_cpu
+from .search import CustomerIndex
 
 logger = logging.getLogger("pitagoras.api")
 
+# Caché compartida de respuestas de reportes
+report_cache = ReportCache(
+    REPORT_CACHE_TTL,
+    REPORT_CACHE_MAX_ENTRIES,
+    max_bytes=int(REPORT_CACHE_MAX_MB * 1024 * 1024),
+    max_entry_bytes=int(SPILL_THRESHOLD_MB * 1024 * 1024),
+)
 
-async def get_customers(user_email: str = DEFAULT_USER_EMAIL) -> List[Dict[str, Any]]:
-    """Get list of customers for a specific user"""
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-            
-        response = await client.post(
-            ENDPOINTS["customers"],
-            json={"user_email": user_email},
-            headers=headers
+# Timeout por solicitud cuando la llamada no indica otro (el predeterminado de httpx)
+DEFAULT_TIMEOUT = 5.0
+
+# Se desactiva si la API responde 415 a un cuerpo comprimido
+_compress_requests = REQUEST_COMPRESSION_MIN_BYTES > 0
+
+# Respuestas que indican una réplica con problemas; las consultas se reintentan en otra
+FAILOVER_STATUS = {502, 503, 504}
+
+
+def _new_client(base_url: str) -> httpx.AsyncClient:
+    """Pooled client of one API replica.
+
+    Connections are kept alive between calls and responses are requested
+    compressed: httpx advertises gzip and deflate, plus brotli and zstd
+    when the ``compression`` extra is installed, and decodes each chunk as
+    the body is read. With ``CASSETTE_MODE`` set, traffic is recorded to or
+    replayed from a cassette.
+    """
+    return httpx.AsyncClient(base_url=base_url, transport=cassette.transport())
+
+
+# Réplicas de la API, cada una con su propio pool de conexiones
+replicas = ReplicaPool(
+    API_BASE_URLS,
+    _new_client,
+    alpha=API_LATENCY_EWMA_ALPHA,
+    failure_threshold=API_FAILURE_THRESHOLD,
+    cooldown=API_FAILURE_COOLDOWN_SECONDS,
+    health_interval=API_HEALTH_INTERVAL_SECONDS,
+    health_path=API_HEALTH_PATH,
+)
+
+
+async def close_client() -> None:
+    """Close the pooled clients of every replica (on server shutdown)."""
+    await replicas.aclose()
+
+
+def _log_transfer(response: httpx.Response) -> None:
+    encoding = response.headers.get("Content-Encoding", "identity")
+    logger.debug(
+        f"{response.request.method} {response.request.url}: "
+        f"{response.num_bytes_downloaded} bytes transferred ({encoding}), "
+        f"{len(response.content)} bytes decoded"
+    )
+
+
+def _auth_headers() -> Dict[str, str]:
+    headers = {}
+    if AUTH_TOKEN:
+        headers["Authorization"] = AUTH_TOKEN
+    return headers
+
+
+async def _send(
+    method: str, url: str, idempotent: bool, timeout: Optional[float] = DEFAULT_TIMEOUT, **kwargs
+) -> httpx.Response:
+    """Send a request to the fastest healthy replica.
+
+    Idempotent requests that fail with a network error or a 502/503/504
+    are retried on the next replica; the last replica's outcome is
+    returned or raised. Read and write timeouts are raised right away: a
+    report that is slow on one replica is as slow on the others, and the
+    account batcher already retries it with fewer accounts. Connect and
+    pool timeouts fail over, since the request never reached the replica.
+    Every attempt's timeout is clamped to the time left before the
+    caller's deadline.
+    """
+    candidates = replicas.ordered()
+    if not idempotent:
+        candidates = candidates[:1]
+    for attempt, replica in enumerate(candidates, 1):
+        last = attempt == len(candidates)
+        request_timeout = deadline.request_timeout(timeout)
+        started = time.monotonic()
+        try:
+            response = await replica.client().request(method, url, timeout=request_timeout, **kwargs)
+        except httpx.TransportError as e:
+            replicas.record(replica, time.monotonic() - started, ok=False)
+            if last or isinstance(e, (httpx.ReadTimeout, httpx.WriteTimeout)):
+                raise
+            logger.warning(f"{method} {url} failed on {replica.base_url} ({type(e).__name__}), trying another replica")
+            continue
+        ok = response.status_code not in FAILOVER_STATUS
+        replicas.record(replica, time.monotonic() - started, ok)
+        if ok or last:
+            _log_transfer(response)
+            return response
+        logger.warning(f"{method} {url} got {response.status_code} from {replica.base_url}, trying another replica")
+
+
+async def _post(url: str, payload: Any, idempotent: bool = False, **kwargs) -> httpx.Response:
+    """POST ``payload`` encoded with the fast JSON codec.
+
+    ``idempotent`` requests (queries without side effects) fail over to
+    another replica when one fails. Bodies of at least
+    ``REQUEST_COMPRESSION_MIN_BYTES`` are sent gzipped. If the API rejects
+    them with 415 the request is repeated uncompressed and compression
+    stays off for the rest of the session.
+    """
+    global _compress_requests
+    headers = {"Content-Type": "application/json", **kwargs.pop("headers", _auth_headers())}
+    body = codec.dumps(payload)
+
+    if _compress_requests and len(body) >= REQUEST_COMPRESSION_MIN_BYTES:
+        response = await _send(
+            "POST",
+            url,
+            idempotent,
+            content=gzip.compress(body, compresslevel=5),
+            headers={**headers, "Content-Encoding": "gzip"},
+            **kwargs,
         )
-        response.raise_for_status()
-        
-        data = response.json()
-        logger.info(f"Received {len(data.get('customers', []))} customers")
-        return data.get("customers", [])
-
-async def search_customers(query: str, user_email: str = DEFAULT_USER_EMAIL) -> List[Dict[str, Any]]:
-    """Return customers whose name or ID contains ``query``."""
-    customers = await get_customers(user_email)
-    query_lower = query.lower()
-    filtered = [
-        c
-        for c in customers
-        if query_lower in str(c.get("ID", "")).lower()
-        or query_lower in c.get("name", "").lower()
-    ]
+        if response.status_code != 415:
+            return response
+        logger.warning("The API doesn't accept gzip request bodies, sending them uncompressed")
+        _compress_requests = False
+
+    return await _send("POST", url, idempotent, content=body, headers=headers, **kwargs)
+
+
+async def _get(url: str, **kwargs) -> httpx.Response:
+    return await _send("GET", url, True, headers=_auth_headers(), **kwargs)
+
+
+def _json(response: httpx.Response) -> Any:
+    """Decode a JSON response body with the fast JSON codec."""
+    return codec.loads(response.content)
+
+
+async def _fetch_customers(user_email: str) -> List[Customer]:
+    response = await _post(ENDPOINTS["customers"], {"user_email": user_email}, idempotent=True)
+    response.raise_for_status()
+    
+    data = _json(response)
+    logger.info(f"Received {len(data.get('customers', []))} customers")
+    return [Customer.from_dict(c) for c in data.get("customers", [])]
+
+
+# Lista de clientes e índice de búsqueda por usuario: email -> (cargado en, índice)
+_customer_indexes: Dict[str, Tuple[float, CustomerIndex]] = {}
+_customer_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def get_customer_index(user_email: str = DEFAULT_USER_EMAIL) -> CustomerIndex:
+    """Return the search index of the user's customers, reloading it when stale.
+
+    The customers list is cached for ``CUSTOMERS_CACHE_TTL`` seconds and the
+    index is rebuilt only when the list is downloaded again.
+    """
+    lock = _customer_locks.setdefault(user_email, asyncio.Lock())
+    async with lock:
+        cached = _customer_indexes.get(user_email)
+        if cached and time.monotonic() - cached[0] <= CUSTOMERS_CACHE_TTL:
+            return cached[1]
+        index = CustomerIndex(await _fetch_customers(user_email))
+        if CUSTOMERS_CACHE_TTL > 0:
+            _customer_indexes[user_email] = (time.monotonic(), index)
+        return index
+
+
+async def get_customers(user_email: str = DEFAULT_USER_EMAIL) -> List[Customer]:
+    """Get list of customers for a specific user"""
+    return (await get_customer_index(user_email)).customers
+
+async def search_customers(
+    query: str, user_email: str = DEFAULT_USER_EMAIL, limit: int = 20
+) -> List[Customer]:
+    """Return the customers that best match ``query`` by name or ID, ranked.
+
+    Matching ignores accents and case and tolerates small typos.
+    """
+    index = await get_customer_index(user_email)
+    results = index.search(query, limit)
     logger.info(
-        f"Filtered customers by '{query}', found {len(filtered)} matches"
+        f"Searched customers by '{query}', found {len(results)} matches"
     )
-    return filtered
+    return results
+
+async def _cached_report(
+    kind: str, label: str, params: Dict[str, Any], fetch, accounts: int
+) -> Dict[str, Any]:
+    """Get a report through the cache, reporting progress to the current call.
+
+    Each upstream request of the fetch is a progress step; a cached response
+    counts as a single step.
+    """
+    shared = progress.SharedProgress(progress.current())
+    data = await report_cache.get_or_fetch(kind, params, fetch, shared)
+    if not shared.steps_done:
+        await shared.step(label, len(data.get("rows", [])), accounts)
+    return data
+
 
 async def get_google_ads_report(
     accounts: List[Dict[str, str]],
@@ -50,7 +252,34 @@ async def get_google_ads_report(
     start_date: str,
     end_date: str
 ) -> Dict[str, Any]:
-    """Get Google Ads report data"""
+    """Get Google Ads report data.
+
+    Responses are cached for ``REPORT_CACHE_TTL`` seconds and compatible calls
+    issued within ``REPORT_BATCH_WINDOW_MS`` are merged into a single upstream
+    request with the union of their metrics.
+    """
+    params = {
+        "accounts": accounts,
+        "attributes": attributes,
+        "segments": segments,
+        "metrics": metrics,
+        "resource": resource,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    return await _cached_report("google_ads", "Google Ads", params, _google_ads_batcher.submit, len(accounts))
+
+
+async def _fetch_google_ads_report(
+    accounts: List[Dict[str, str]],
+    attributes: List[Dict[str, Any]],
+    segments: List[str],
+    metrics: List[str],
+    resource: str,
+    start_date: str,
+    end_date: str
+) -> Dict[str, Any]:
+    """Request Google Ads report data from Pitágoras"""
     payload = {
         "accounts": accounts,
         "attributes": attributes,
@@ -63,21 +292,12 @@ async def get_google_ads_report(
     
     logger.info(f"Requesting Google Ads data with payload: {payload}")
     
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-            
-        response = await client.post(
-            ENDPOINTS["google_ads"],
-            json=payload,
-            headers=headers
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        logger.info(f"Received Google Ads data with {len(data.get('rows', []))} rows")
-        return data
+    response = await _post(ENDPOINTS["google_ads"], payload, idempotent=True)
+    response.raise_for_status()
+    
+    data = _json(response)
+    logger.info(f"Received Google Ads data with {len(data.get('rows', []))} rows")
+    return data
 
 
 async def get_facebook_ads_report(
@@ -86,7 +306,30 @@ async def get_facebook_ads_report(
     start_date: str,
     end_date: str
 ) -> Dict[str, Any]:
-    """Get Facebook Ads report data"""
+    """Get Facebook Ads report data.
+
+    Responses are cached for ``REPORT_CACHE_TTL`` seconds and calls with the
+    same accounts, dates and dimension fields issued within
+    ``REPORT_BATCH_WINDOW_MS`` are merged into a single upstream request.
+    """
+    params = {
+        "accounts": accounts,
+        "fields": fields,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    return await _cached_report(
+        "facebook_ads", "Facebook Ads", params, _facebook_ads_batcher.submit, len(accounts)
+    )
+
+
+async def _fetch_facebook_ads_report(
+    accounts: List[Dict[str, str]],
+    fields: List[str],
+    start_date: str,
+    end_date: str
+) -> Dict[str, Any]:
+    """Request Facebook Ads report data from Pitágoras"""
     # El formato correcto del payload según el ejemplo actualizado
     payload = {
         "accounts": accounts,
@@ -97,63 +340,63 @@ async def get_facebook_ads_report(
     
     logger.info(f"Requesting Facebook Ads data with payload: {payload}")
     
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-            logger.info(f"Using Authorization header: {AUTH_TOKEN[:5]}...")  # Log primeros 5 caracteres para debug
-        else:
-            logger.warning("No Authorization token found")
+    headers = _auth_headers()
+    if AUTH_TOKEN:
+        logger.info(f"Using Authorization header: {AUTH_TOKEN[:5]}...")  # Log primeros 5 caracteres para debug
+    else:
+        logger.warning("No Authorization token found")
+    
+    try:
+        logger.info(f"Sending request to: {ENDPOINTS['facebook_ads']}")
+        response = await _post(
+            ENDPOINTS["facebook_ads"],
+            payload,
+            idempotent=True,
+            headers=headers,
+            timeout=30.0  # Aumentar timeout
+        )
+        
+        # Log de la respuesta para debug
+        logger.info(f"Response status code: {response.status_code}")
+        logger.info(f"Response headers: {response.headers}")
         
+        # Decodificar el cuerpo una sola vez, incluso si el status code no es exitoso
+        response_body = None
         try:
-            logger.info(f"Sending request to: {ENDPOINTS['facebook_ads']}")
-            response = await client.post(
-                ENDPOINTS["facebook_ads"],
-                json=payload,
-                headers=headers,
-                timeout=30.0  # Aumentar timeout
-            )
-            
-            # Log de la respuesta para debug
-            logger.info(f"Response status code: {response.status_code}")
-            logger.info(f"Response headers: {response.headers}")
-            
-            # Intentar obtener el cuerpo de la respuesta incluso si el status code no es exitoso
-            try:
-                response_body = response.json()
-                logger.info(f"Response body: {response_body}")
-            except Exception as json_err:
-                logger.warning(f"Couldn't parse response as JSON: {str(json_err)}")
-                logger.info(f"Raw response: {response.text[:500]}...")  # Primeros 500 caracteres
-            
-            response.raise_for_status()
-            
-            data = response.json()
-            logger.info(f"Received Facebook Ads data with {len(data.get('rows', []))} rows")
-            return data
-            
-        except httpx.HTTPStatusError as e:
-            # Capturar y registrar detalles del error
-            error_body = None
-            try:
-                error_body = e.response.json()
-            except Exception:
-                error_body = e.response.text if e.response.text else "No response body"
-            
-            logger.error(f"HTTP error {e.response.status_code} from Facebook API: {error_body}")
-            
-            # Re-lanzar la excepción con más información
-            raise Exception(f"Error HTTP {e.response.status_code} de la API de Facebook: {error_body}") from e
-            
-        except httpx.RequestError as e:
-            # Errores de red, timeout, etc.
-            logger.error(f"Request error with Facebook API: {str(e)}")
-            raise Exception(f"Error de conexión con la API de Facebook: {str(e)}") from e
-            
-        except Exception as e:
-            # Capturar cualquier otro error
-            logger.error(f"Unexpected error with Facebook API: {str(e)}", exc_info=True)
-            raise Exception(f"Error inesperado con la API de Facebook: {str(e)}") from e
+            response_body = _json(response)
+            logger.info(f"Response body preview: {response.content[:500]!r}...")
+        except Exception as json_err:
+            logger.warning(f"Couldn't parse response as JSON: {str(json_err)}")
+            logger.info(f"Raw response: {response.text[:500]}...")  # Primeros 500 caracteres
+        
+        response.raise_for_status()
+        
+        data = response_body if response_body is not None else _json(response)
+        logger.info(f"Received Facebook Ads data with {len(data.get('rows', []))} rows")
+        return data
+        
+    except httpx.HTTPStatusError as e:
+        # Capturar y registrar detalles del error
+        error_body = None
+        try:
+            error_body = _json(e.response)
+        except Exception:
+            error_body = e.response.text if e.response.text else "No response body"
+        
+        logger.error(f"HTTP error {e.response.status_code} from Facebook API: {error_body}")
+        
+        # Re-lanzar la excepción con más información
+        raise Exception(f"Error HTTP {e.response.status_code} de la API de Facebook: {error_body}") from e
+        
+    except httpx.RequestError as e:
+        # Errores de red, timeout, etc.
+        logger.error(f"Request error with Facebook API: {str(e)}")
+        raise Exception(f"Error de conexión con la API de Facebook: {str(e)}") from e
+        
+    except Exception as e:
+        # Capturar cualquier otro error
+        logger.error(f"Unexpected error with Facebook API: {str(e)}", exc_info=True)
+        raise Exception(f"Error inesperado con la API de Facebook: {str(e)}") from e
 
 async def get_google_analytics_report(
     accounts: List[Dict[str, str]],
@@ -163,7 +406,13 @@ async def get_google_analytics_report(
     end_date: str,
     filters: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
-    """Get Google Analytics report data"""
+    """Get Google Analytics report data.
+
+    When every variable of ``filters`` is one of the requested dimensions and
+    an unfiltered response for the same request is cached (or
+    ``GA4_LOCAL_FILTERS`` is enabled), the filter is compiled and evaluated
+    locally instead of requesting a new filtered report.
+    """
     # Nos aseguramos que cada cuenta tenga los campos requeridos
     formatted_accounts = []
     for account in accounts:
@@ -176,11 +425,57 @@ async def get_google_analytics_report(
     if not formatted_accounts:
         raise ValueError("No se proporcionaron cuentas de Google Analytics con el formato correcto. Cada cuenta debe tener 'account_id', 'property_id', 'name' y 'credential_email'.")
     
-    payload = {
+    params = {
         "accounts": formatted_accounts,
         "dimensions": dimensions,
         "metrics": metrics,
         "start_date": start_date,
+        "end_date": end_date,
+        "filters": None,
+    }
+
+    if filters and filter_vars(filters) <= set(dimensions):
+        unfiltered = report_cache.get("google_analytics", params)
+        cached = unfiltered is not None
+        if cached:
+            report_cache.track("google_analytics", params)
+        elif GA4_LOCAL_FILTERS:
+            unfiltered = await _cached_report(
+                "google_analytics",
+                "Google Analytics",
+                params,
+                _google_analytics_batcher.submit,
+                len(formatted_accounts),
+            )
+        if unfiltered is not None and not unfiltered.get("errors"):
+            try:
+                data = await run_cpu(apply_filter, filters, unfiltered, rows=len(unfiltered.get("rows") or []))
+                if cached:
+                    await progress.step("Google Analytics", len(data.get("rows", [])), len(formatted_accounts))
+                return data
+            except FilterCompileError as e:
+                logger.info(f"Filter can't be evaluated locally, sending it upstream: {str(e)}")
+
+    params["filters"] = filters
+    return await _cached_report(
+        "google_analytics", "Google Analytics", params, _google_analytics_batcher.submit, len(formatted_accounts)
+    )
+
+
+async def _fetch_google_analytics_report(
+    accounts: List[Dict[str, str]],
+    dimensions: List[str],
+    metrics: List[str],
+    start_date: str,
+    end_date: str,
+    filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Request Google Analytics report data from Pitágoras"""
+    payload = {
+        "accounts": accounts,
+        "dimensions": dimensions,
+        "metrics": metrics,
+        "start_date": start_date,
         "end_date": end_date
     }
     
@@ -189,53 +484,89 @@ async def get_google_analytics_report(
     
     logger.info(f"Requesting Google Analytics data with payload: {payload}")
     
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-            logger.info(f"Using Authorization header: {AUTH_TOKEN[:5]}...")  # Log primeros 5 caracteres para debug
-        else:
-            logger.warning("No Authorization token found")
+    headers = _auth_headers()
+    if AUTH_TOKEN:
+        logger.info(f"Using Authorization header: {AUTH_TOKEN[:5]}...")  # Log primeros 5 caracteres para debug
+    else:
+        logger.warning("No Authorization token found")
+    
+    try:
+        logger.info(f"Sending request to: {ENDPOINTS['google_analytics']}")
+        response = await _post(
+            ENDPOINTS["google_analytics"],
+            payload,
+            idempotent=True,
+            headers=headers,
+            timeout=30.0
+        )
+        
+        # Log de la respuesta para debug
+        logger.info(f"Response status code: {response.status_code}")
         
+        # Decodificar el cuerpo una sola vez, incluso si el status code no es exitoso
+        response_body = None
         try:
-            logger.info(f"Sending request to: {ENDPOINTS['google_analytics']}")
-            response = await client.post(
-                ENDPOINTS["google_analytics"],
-                json=payload,
-                headers=headers,
-                timeout=30.0
-            )
-            
-            # Log de la respuesta para debug
-            logger.info(f"Response status code: {response.status_code}")
-            
-            # Intentar obtener el cuerpo de la respuesta incluso si el status code no es exitoso
-            try:
-                response_body = response.json()
-                logger.info(f"Response body preview: {str(response_body)[:500]}...")
-            except Exception as json_err:
-                logger.warning(f"Couldn't parse response as JSON: {str(json_err)}")
-                logger.info(f"Raw response: {response.text[:500]}...")
-            
-            response.raise_for_status()
-            
-            data = response.json()
-            logger.info(f"Received Google Analytics data with {len(data.get('rows', []))} rows")
-            return data
-            
-        except httpx.HTTPStatusError as e:
-            error_body = None
-            try:
-                error_body = e.response.json()
-            except Exception:
-                error_body = e.response.text if e.response.text else "No response body"
-            
-            logger.error(f"HTTP error {e.response.status_code} from Google Analytics API: {error_body}")
-            raise Exception(f"Error HTTP {e.response.status_code} de la API de Google Analytics: {error_body}") from e
-            
-        except Exception as e:
-            logger.error(f"Unexpected error with Google Analytics API: {str(e)}", exc_info=True)
-            raise Exception(f"Error con la API de Google Analytics: {str(e)}") from e
+            response_body = _json(response)
+            logger.info(f"Response body preview: {response.content[:500]!r}...")
+        except Exception as json_err:
+            logger.warning(f"Couldn't parse response as JSON: {str(json_err)}")
+            logger.info(f"Raw response: {response.text[:500]}...")
+        
+        response.raise_for_status()
+        
+        data = response_body if response_body is not None else _json(response)
+        logger.info(f"Received Google Analytics data with {len(data.get('rows', []))} rows")
+        return data
+        
+    except httpx.HTTPStatusError as e:
+        error_body = None
+        try:
+            error_body = _json(e.response)
+        except Exception:
+            error_body = e.response.text if e.response.text else "No response body"
+        
+        logger.error(f"HTTP error {e.response.status_code} from Google Analytics API: {error_body}")
+        raise Exception(f"Error HTTP {e.response.status_code} de la API de Google Analytics: {error_body}") from e
+        
+    except Exception as e:
+        logger.error(f"Unexpected error with Google Analytics API: {str(e)}", exc_info=True)
+        raise Exception(f"Error con la API de Google Analytics: {str(e)}") from e
+
+
+def _account_batcher(name: str, label: str, fetch, timeout: float) -> AccountBatcher:
+    return AccountBatcher(
+        name,
+        fetch,
+        ACCOUNT_BATCH_SIZE,
+        ACCOUNT_BATCH_MAX_ROWS,
+        ACCOUNT_BATCH_CONCURRENCY,
+        ACCOUNT_BATCH_TARGET_SECONDS or timeout / 2,
+        label=label,
+    )
+
+
+# Las solicitudes combinadas se dividen luego por cuentas si la selección es grande
+_google_ads_batcher = ReportBatcher(
+    "google_ads",
+    _account_batcher("google_ads", "Google Ads", _fetch_google_ads_report, DEFAULT_TIMEOUT).fetch,
+    "metrics",
+    REPORT_BATCH_WINDOW_MS,
+)
+_facebook_ads_batcher = ReportBatcher(
+    "facebook_ads",
+    _account_batcher("facebook_ads", "Facebook Ads", _fetch_facebook_ads_report, 30.0).fetch,
+    "fields",
+    REPORT_BATCH_WINDOW_MS,
+    split=split_facebook_fields,
+)
+_google_analytics_batcher = ReportBatcher(
+    "google_analytics",
+    _account_batcher(
+        "google_analytics", "Google Analytics", _fetch_google_analytics_report, 30.0
+    ).fetch,
+    "metrics",
+    REPORT_BATCH_WINDOW_MS,
+)
 
 
 async def get_analytics4_metadata(
@@ -244,82 +575,44 @@ async def get_analytics4_metadata(
     """Get available GA4 dimensions and metrics"""
     payload = {"property_id": property_id, "credential_email": credential_email}
 
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-
-        response = await client.post(
-            ENDPOINTS["analytics4_metadata"], json=payload, headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await _post(ENDPOINTS["analytics4_metadata"], payload, idempotent=True)
+    response.raise_for_status()
+    return _json(response)
 
 
 async def get_facebook_schema() -> Dict[str, Any]:
     """Get Facebook Ads available fields"""
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-
-        response = await client.get(ENDPOINTS["facebook_schema"], headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = await _get(ENDPOINTS["facebook_schema"])
+    response.raise_for_status()
+    return _json(response)
 
 
 async def get_adwords_resources() -> List[str]:
     """List available Google Ads resources"""
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-
-        response = await client.get(ENDPOINTS["adwords_resources"], headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = await _get(ENDPOINTS["adwords_resources"])
+    response.raise_for_status()
+    return _json(response)
 
 
 async def get_adwords_attributes(resource_name: str) -> List[str]:
     """Get Google Ads attributes for a resource"""
     params = {"resource_name": resource_name}
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-
-        response = await client.get(
-            ENDPOINTS["adwords_attributes"], params=params, headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await _get(ENDPOINTS["adwords_attributes"], params=params)
+    response.raise_for_status()
+    return _json(response)
 
 
 async def get_adwords_segments(resource_name: str) -> List[str]:
     """Get Google Ads segments for a resource"""
     params = {"resource_name": resource_name}
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-
-        response = await client.get(
-            ENDPOINTS["adwords_segments"], params=params, headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await _get(ENDPOINTS["adwords_segments"], params=params)
+    response.raise_for_status()
+    return _json(response)
 
 
 async def get_adwords_metrics(resource_name: str) -> List[str]:
     """Get Google Ads metrics for a resource"""
     params = {"resource_name": resource_name}
-    async with httpx.AsyncClient() as client:
-        headers = {}
-        if AUTH_TOKEN:
-            headers["Authorization"] = AUTH_TOKEN
-
-        response = await client.get(
-            ENDPOINTS["adwords_metrics"], params=params, headers=headers
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await _get(ENDPOINTS["adwords_metrics"], params=params)
+    response.raise_for_status()
+    return _json(response)
@@ -0,0 +1,386 @@
+# pitagoras/batching.py
+import asyncio
+import json
+import logging
+import math
+import time
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from . import deadline
+from .deadline import SharedDeadline, detached_context
+from .progress import SharedProgress
+
+logger = logging.getLogger("pitagoras.batching")
+
+# Campos de Facebook que definen la granularidad de las filas y no se pueden mezclar
+FACEBOOK_DIMENSION_FIELDS = {
+    "account_id",
+    "account_name",
+    "campaign_id",
+    "campaign_name",
+    "adset_id",
+    "adset_name",
+    "ad_id",
+    "ad_name",
+    "date_start",
+    "date_stop",
+}
+
+
+def normalize_column(name: str) -> str:
+    """Normalize a column or header name for comparisons."""
+    name = name.strip().lower()
+    if name.startswith("metrics."):
+        name = name[len("metrics."):]
+    return name
+
+
+def split_facebook_fields(fields: List[str]) -> Tuple[List[str], List[str]]:
+    """Split Facebook fields into (dimension fields, metric fields)."""
+    dims = [f for f in fields if f in FACEBOOK_DIMENSION_FIELDS]
+    mets = [f for f in fields if f not in FACEBOOK_DIMENSION_FIELDS]
+    return dims, mets
+
+
+def project_columns(data: Dict[str, Any], requested: List[str], merged: List[str]) -> Dict[str, Any]:
+    """Drop from ``data`` the columns that only other callers asked for."""
+    result = dict(data)
+    wanted = {normalize_column(c) for c in requested}
+    extra = {normalize_column(c) for c in merged} - wanted
+    headers = data.get("headers", [])
+    if not extra or not headers:
+        return result
+
+    keep = [i for i, h in enumerate(headers) if normalize_column(str(h)) not in extra]
+    if len(keep) == len(headers):
+        return result
+
+    result["headers"] = [headers[i] for i in keep]
+    result["rows"] = [[row[i] for i in keep] for row in data.get("rows", [])]
+    return result
+
+
+class _Batch:
+    """Requests that share everything but their metric columns."""
+
+    def __init__(self, base: Dict[str, Any], fixed_columns: List[str]):
+        self.base = base
+        self.columns: List[str] = list(fixed_columns)
+        self.normalized = {normalize_column(c) for c in fixed_columns}
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.progress = SharedProgress()
+        self.deadline = SharedDeadline()
+
+
+class ReportBatcher:
+    """Coalesce compatible report requests issued within a short window.
+
+    Calls that share every parameter except the merged column list
+    (``metrics`` or ``fields``) are sent upstream as a single request with the
+    union of columns. The combined response is projected back so each caller
+    only receives the columns it asked for. If the merged request fails or
+    comes back with errors, callers that shared it with others repeat
+    their own request alone, so a column one caller asked for doesn't fail
+    the others.
+
+    Args:
+        name: Name used in logs
+        fetch: Coroutine function that performs the upstream request
+        merge_param: Name of the parameter holding the mergeable columns
+        window_ms: Batching window in milliseconds. ``0`` disables batching
+        split: Optional function returning ``(fixed, mergeable)`` columns.
+            Fixed columns become part of the batch key.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[..., Awaitable[Dict[str, Any]]],
+        merge_param: str,
+        window_ms: float,
+        split: Optional[Callable[[List[str]], Tuple[List[str], List[str]]]] = None,
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.merge_param = merge_param
+        self.window = window_ms / 1000
+        self.split = split
+        self._pending: Dict[str, _Batch] = {}
+
+    async def submit(self, progress: Optional[SharedProgress] = None, **params: Any) -> Dict[str, Any]:
+        """Queue a request and wait for its share of the merged response.
+
+        ``progress`` follows the merged request while the caller waits.
+        """
+        if self.window <= 0:
+            return await self.fetch(**params, progress=progress)
+
+        requested = list(params.pop(self.merge_param) or [])
+        fixed, mergeable = self.split(requested) if self.split else ([], requested)
+        key = json.dumps([params, fixed], sort_keys=True, default=str)
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _Batch(params, fixed)
+            self._pending[key] = batch
+            # El lote tiene el plazo más tardío de quienes lo esperan; se cancela cuando nadie lo espera
+            batch.task = asyncio.get_running_loop().create_task(
+                self._run(key, batch), context=detached_context(batch.deadline)
+            )
+
+        for column in mergeable:
+            normalized = normalize_column(column)
+            if normalized not in batch.normalized:
+                batch.normalized.add(normalized)
+                batch.columns.append(column)
+
+        batch.progress.join(progress)
+        bound = deadline.current()
+        batch.deadline.join(bound)
+        batch.waiters += 1
+        try:
+            data = await asyncio.shield(batch.task)
+        except Exception as e:
+            if not self._merged(requested, batch):
+                raise
+            logger.warning(f"{self.name}: batched request failed ({type(e).__name__}), retrying on its own")
+            return await self._fetch_alone(params, requested, progress)
+        finally:
+            batch.progress.leave(progress)
+            batch.deadline.leave(bound)
+            batch.waiters -= 1
+            if batch.waiters == 0 and not batch.task.done():
+                logger.info(f"{self.name}: cancelling batched request, no callers left")
+                batch.task.cancel()
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+        if data.get("errors") and self._merged(requested, batch):
+            logger.warning(f"{self.name}: batched request returned errors, retrying on its own")
+            return await self._fetch_alone(params, requested, progress)
+        return project_columns(data, requested, batch.columns)
+
+    @staticmethod
+    def _merged(requested: List[str], batch: _Batch) -> bool:
+        """Whether ``batch`` asked for columns other than ``requested``."""
+        return bool(batch.normalized - {normalize_column(c) for c in requested})
+
+    async def _fetch_alone(
+        self, params: Dict[str, Any], requested: List[str], progress: Optional[SharedProgress]
+    ) -> Dict[str, Any]:
+        return await self.fetch(**params, **{self.merge_param: requested}, progress=progress)
+
+    async def _run(self, key: str, batch: _Batch) -> Dict[str, Any]:
+        await asyncio.sleep(self.window)
+        # Cerrar la ventana: las solicitudes nuevas abren otro lote
+        self._pending.pop(key, None)
+        logger.info(f"{self.name}: sending batched request with columns {batch.columns}")
+        return await self.fetch(
+            **batch.base, **{self.merge_param: list(batch.columns)}, progress=batch.progress
+        )
+
+
+def _account_key(account: Dict[str, Any]) -> str:
+    return str(account.get("property_id") or account.get("account_id") or account.get("id") or account.get("name"))
+
+
+def _report_days(params: Dict[str, Any]) -> int:
+    try:
+        start = date.fromisoformat(params["start_date"])
+        end = date.fromisoformat(params["end_date"])
+    except (KeyError, TypeError, ValueError):
+        return 1
+    return max(1, (end - start).days + 1)
+
+
+def _timed_out(error: BaseException) -> bool:
+    """Whether ``error`` (or the error it wraps) is an upstream request timeout."""
+    while error is not None:
+        if isinstance(error, httpx.TimeoutException):
+            return True
+        error = error.__cause__
+    return False
+
+
+def merge_reports(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Concatenate the rows of reports fetched for disjoint account batches.
+
+    Rows of a part whose headers come in a different order are realigned to
+    the headers of the first part; errors of every part are kept.
+    """
+    merged = dict(parts[0])
+    headers = next((list(p["headers"]) for p in parts if p.get("headers")), [])
+    rows: List[List[Any]] = []
+    errors: List[Any] = []
+    for part in parts:
+        part_headers = list(part.get("headers") or headers)
+        part_rows = part.get("rows") or []
+        if part_headers == headers:
+            rows.extend(part_rows)
+        else:
+            positions = {normalize_column(str(h)): i for i, h in enumerate(part_headers)}
+            idx = [positions.get(normalize_column(str(h))) for h in headers]
+            rows.extend([[row[i] if i is not None else None for i in idx] for row in part_rows])
+        if part.get("errors"):
+            errors.extend(part["errors"] if isinstance(part["errors"], list) else [part["errors"]])
+    merged["headers"] = headers
+    merged["rows"] = rows
+    if errors or "errors" in merged:
+        merged["errors"] = errors
+    return merged
+
+
+class AccountBatcher:
+    """Split large account selections into concurrent upstream requests.
+
+    Accounts are packed in order into batches of at most ``max_accounts``
+    accounts and ``max_rows`` estimated rows, using the rows per account and
+    day observed in earlier responses. Batches run ``concurrency`` at a time
+    and their rows are merged. The limits adapt to observed latency: they
+    shrink when a request takes longer than ``target_seconds`` and grow back
+    (up to the configured values) when requests are fast. A batch that times
+    out is halved and retried. Each completed request is a progress step.
+
+    Args:
+        name: Name used in logs
+        fetch: Coroutine function that performs the upstream request
+        max_accounts: Accounts per request (upper bound)
+        max_rows: Estimated rows per request (upper bound, 0 disables it)
+        concurrency: Batches in flight per report
+        target_seconds: Latency each request should stay under
+        label: Name shown in progress messages (defaults to ``name``)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[..., Awaitable[Dict[str, Any]]],
+        max_accounts: int,
+        max_rows: int,
+        concurrency: int,
+        target_seconds: float,
+        label: Optional[str] = None,
+    ):
+        self.name = name
+        self.label = label or name
+        self.fetch_report = fetch
+        self.max_accounts = max(1, max_accounts)
+        self.max_rows = max_rows
+        self.concurrency = max(1, concurrency)
+        self.target = target_seconds
+        self.account_limit = self.max_accounts
+        self.row_limit = self.max_rows
+        self._rows_per_day: Dict[str, float] = {}
+
+    def _estimate(self, account: Dict[str, Any], days: int, default: float) -> float:
+        return self._rows_per_day.get(_account_key(account), default) * days
+
+    def plan(self, accounts: List[Dict[str, Any]], days: int) -> List[List[Dict[str, Any]]]:
+        """Pack ``accounts`` into batches within the current limits."""
+        known = list(self._rows_per_day.values())
+        default = sum(known) / len(known) if known else 0.0
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        rows = 0.0
+        for account in accounts:
+            estimate = self._estimate(account, days, default)
+            full = len(current) >= self.account_limit or (
+                self.row_limit > 0 and rows + estimate > self.row_limit
+            )
+            if current and full:
+                batches.append(current)
+                current, rows = [], 0.0
+            current.append(account)
+            rows += estimate
+        if current:
+            batches.append(current)
+        return batches
+
+    async def fetch(self, progress: Optional[SharedProgress] = None, **params: Any) -> Dict[str, Any]:
+        """Fetch the report for ``params["accounts"]``, split into batches if needed.
+
+        The report counts as one planned step of ``progress``; splitting it
+        plans one step per batch.
+        """
+        accounts = list(params.get("accounts") or [])
+        days = _report_days(params)
+        batches = self.plan(accounts, days)
+        if len(batches) <= 1:
+            return await self._fetch_batch(params, accounts, days, progress)
+
+        logger.info(
+            f"{self.name}: splitting {len(accounts)} accounts into {len(batches)} requests "
+            f"(≤{self.account_limit} accounts, ≤{self.row_limit or '∞'} rows each)"
+        )
+        if progress is not None:
+            progress.plan(len(batches) - 1)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._fetch_batch(params, batch, days, progress)
+
+        return merge_reports(await asyncio.gather(*(run(b) for b in batches)))
+
+    async def _fetch_batch(
+        self,
+        params: Dict[str, Any],
+        accounts: List[Dict[str, Any]],
+        days: int,
+        progress: Optional[SharedProgress] = None,
+    ) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            data = await self.fetch_report(**{**params, "accounts": accounts})
+        except Exception as e:
+            if not _timed_out(e):
+                raise
+            self._shrink(len(accounts), None, 0.5)
+            if len(accounts) < 2:
+                raise
+            half = len(accounts) // 2
+            logger.warning(f"{self.name}: request for {len(accounts)} accounts timed out, retrying in halves")
+            if progress is not None:
+                progress.plan(1)
+            return merge_reports(
+                await asyncio.gather(
+                    self._fetch_batch(params, accounts[:half], days, progress),
+                    self._fetch_batch(params, accounts[half:], days, progress),
+                )
+            )
+        rows = len(data.get("rows") or [])
+        self._observe(accounts, days, rows, time.monotonic() - started)
+        if progress is not None:
+            await progress.step(self.label, rows, len(accounts))
+        return data
+
+    def _observe(self, accounts: List[Dict[str, Any]], days: int, rows: int, elapsed: float) -> None:
+        if accounts:
+            per_day = rows / len(accounts) / days
+            for account in accounts:
+                key = _account_key(account)
+                previous = self._rows_per_day.get(key)
+                self._rows_per_day[key] = per_day if previous is None else 0.7 * previous + 0.3 * per_day
+
+        if self.target <= 0:
+            return
+        if elapsed > self.target:
+            self._shrink(len(accounts), rows, max(0.5, self.target / elapsed))
+        elif elapsed < self.target / 2 and len(accounts) >= self.account_limit:
+            self.account_limit = min(self.max_accounts, math.ceil(self.account_limit * 1.25))
+            if self.max_rows > 0:
+                self.row_limit = min(self.max_rows, math.ceil(self.row_limit * 1.25))
+
+    def _shrink(self, accounts: int, rows: Optional[int], factor: float) -> None:
+        account_limit = min(self.account_limit, max(1, math.floor(accounts * factor)))
+        row_limit = self.row_limit
+        if self.max_rows > 0 and rows:
+            row_limit = min(self.row_limit, max(1, math.floor(rows * factor)))
+        if (account_limit, row_limit) != (self.account_limit, self.row_limit):
+            logger.info(
+                f"{self.name}: slow upstream request, batch limits now {account_limit} accounts / {row_limit} rows"
+            )
+        self.account_limit, self.row_limit = account_limit, row_limit
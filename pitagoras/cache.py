@@ -0,0 +1,257 @@
+# pitagoras/cache.py
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import deadline
+from .deadline import SharedDeadline, detached_context
+from .progress import SharedProgress
+
+logger = logging.getLogger("pitagoras.cache")
+
+# Filas muestreadas para estimar el tamaño de un reporte
+_SAMPLE_ROWS = 200
+
+
+def estimate_rows_size(rows: List[List[Any]]) -> int:
+    """Estimate the heap size in bytes of a list of rows from a sample."""
+    if not rows:
+        return 0
+    step = max(1, len(rows) // _SAMPLE_ROWS)
+    sample = rows[::step][:_SAMPLE_ROWS]
+    sample_size = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row) for row in sample
+    )
+    return sys.getsizeof(rows) + int(sample_size / len(sample) * len(rows))
+
+
+def estimate_size(data: Dict[str, Any]) -> int:
+    """Estimate the heap size in bytes of a report response (its rows)."""
+    rows = data.get("rows")
+    return estimate_rows_size(rows) if isinstance(rows, list) else 0
+
+
+@dataclass
+class CacheEntry:
+    """A cached report response and the request that produced it."""
+    kind: str
+    params: Dict[str, Any]
+    data: Dict[str, Any]
+    stored_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+    ttl: Optional[float] = None
+    size: int = 0
+
+
+@dataclass
+class AccessStats:
+    """How often a report spec is requested, kept after its entry expires."""
+    kind: str
+    params: Dict[str, Any]
+    count: int = 0
+    last_access: float = field(default_factory=time.time)
+
+
+class ReportCache:
+    """In-memory TTL + LRU cache of report responses.
+
+    Entries are keyed by report kind and the canonical JSON of the request
+    parameters. Concurrent misses for the same key share one fetch, and the
+    progress of every caller waiting on it.
+
+    Requests made through ``get_or_fetch`` are also counted per spec (up to
+    ``max_tracked`` specs) so hot reports can be refreshed ahead of time
+    with ``refresh``.
+
+    The cache is bounded by the estimated heap size of the cached rows as
+    well as by entry count. Responses larger than ``max_entry_bytes`` are
+    not cached: those are the results the tools spill to disk, and a cached
+    copy would keep in the heap the rows spilling is meant to free.
+
+    Args:
+        ttl: Seconds an entry stays fresh. ``0`` disables the cache
+        max_entries: Maximum number of entries kept (least recently used are evicted)
+        max_bytes: Maximum estimated size of all entries (``0`` disables the limit)
+        max_entry_bytes: Responses estimated larger than this are not cached (``0`` disables the limit)
+        max_tracked: Maximum number of report specs whose accesses are counted
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        max_bytes: int = 0,
+        max_entry_bytes: int = 0,
+        max_tracked: int = 256,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_tracked = max_tracked
+        self.size = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self._progress: Dict[str, SharedProgress] = {}
+        self._deadlines: Dict[str, SharedDeadline] = {}
+        self._stats: "OrderedDict[str, AccessStats]" = OrderedDict()
+        self._fetchers: Dict[str, Callable[..., Awaitable[Dict[str, Any]]]] = {}
+
+    @staticmethod
+    def key(kind: str, params: Dict[str, Any]) -> str:
+        return kind + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, kind: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a fresh cached response (shallow copy) or ``None``."""
+        key = self.key(kind, params)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry.ttl is None else entry.ttl
+        if time.monotonic() - entry.stored_at > ttl:
+            self._evict(key)
+            return None
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        return dict(entry.data)
+
+    def set(
+        self, kind: str, params: Dict[str, Any], data: Dict[str, Any], ttl: Optional[float] = None
+    ) -> None:
+        """Store a response; ``ttl`` overrides the cache's default for this entry."""
+        if (self.ttl if ttl is None else ttl) <= 0 or self.max_entries <= 0:
+            return
+        key = self.key(kind, params)
+        self._evict(key)
+        size = estimate_size(data)
+        limits = [b for b in (self.max_bytes, self.max_entry_bytes) if b > 0]
+        if limits and size > min(limits):
+            logger.info(f"Not caching {kind} response of ~{size / 1024 / 1024:.1f} MB")
+            return
+        self._entries[key] = CacheEntry(kind, params, data, ttl=ttl, size=size)
+        self.size += size
+        while len(self._entries) > self.max_entries or (self.max_bytes and self.size > self.max_bytes):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    async def get_or_fetch(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        fetch: Callable[..., Awaitable[Dict[str, Any]]],
+        progress: Optional[SharedProgress] = None,
+    ) -> Dict[str, Any]:
+        """Return the cached response or call ``fetch(**params)`` and store it.
+
+        ``fetch`` also receives the ``progress`` of the shared fetch, which
+        ``progress`` joins while the caller waits. Responses carrying
+        ``errors`` are not cached.
+        """
+        self._fetchers[kind] = fetch
+        self.track(kind, params)
+        cached = self.get(kind, params)
+        if cached is not None:
+            logger.info(f"Report cache hit for {kind}")
+            return cached
+
+        key = self.key(kind, params)
+        task = self._inflight.get(key)
+        if task is None:
+            # La descarga compartida tiene el plazo más tardío de quienes la esperan;
+            # se cancela cuando ya nadie la espera
+            shared = self._progress[key] = SharedProgress()
+            self._deadlines[key] = SharedDeadline()
+            task = asyncio.get_running_loop().create_task(
+                self._fetch_and_store(kind, params, fetch, shared),
+                context=detached_context(self._deadlines[key]),
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        shared = self._progress[key]
+        shared.join(progress)
+        shared_deadline = self._deadlines[key]
+        bound = deadline.current()
+        shared_deadline.join(bound)
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return dict(await asyncio.shield(task))
+        finally:
+            shared.leave(progress)
+            shared_deadline.leave(bound)
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done():
+                    logger.info(f"Cancelling {kind} fetch, no callers left")
+                    task.cancel()
+                    self._forget(key, task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._progress.pop(key, None)
+            self._deadlines.pop(key, None)
+
+    async def _fetch_and_store(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        fetch: Callable[..., Awaitable[Dict[str, Any]]],
+        progress: SharedProgress,
+    ) -> Dict[str, Any]:
+        data = await fetch(**params, progress=progress)
+        if not data.get("errors"):
+            self.set(kind, params, data)
+        return data
+
+    def track(self, kind: str, params: Dict[str, Any]) -> None:
+        """Count an access to a report spec."""
+        if self.max_tracked <= 0:
+            return
+        key = self.key(kind, params)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = AccessStats(kind, params)
+        stats.count += 1
+        stats.last_access = time.time()
+        self._stats.move_to_end(key)
+        while len(self._stats) > self.max_tracked:
+            self._stats.popitem(last=False)
+
+    def hot_specs(self, min_count: int, limit: int) -> List[AccessStats]:
+        """Most requested report specs with at least ``min_count`` accesses."""
+        hot = [s for s in self._stats.values() if s.count >= min_count]
+        hot.sort(key=lambda s: s.count, reverse=True)
+        return hot[:limit]
+
+    async def refresh(
+        self, kind: str, params: Dict[str, Any], ttl: Optional[float] = None
+    ) -> bool:
+        """Fetch ``params`` again bypassing the cache and store the response.
+
+        Returns:
+            ``True`` if a fresh response was stored.
+        """
+        fetch = self._fetchers.get(kind)
+        if fetch is None:
+            return False
+        data = await fetch(**params)
+        if data.get("errors"):
+            return False
+        self.set(kind, params, data, ttl=ttl)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,214 @@
+# pitagoras/cassette.py
+"""Record and replay upstream traffic.
+
+In ``record`` mode every request made through the pooled client is sent
+upstream as usual and written, with its response and latency, to a
+gzipped JSON-lines cassette. Credentials in the request headers are
+redacted. In ``replay`` mode the cassette answers the requests instead of
+the network, after the recorded latency times a scale factor, so real
+workloads can be benchmarked and profiled offline.
+"""
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from .config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_LATENCY_SCALE
+
+logger = logging.getLogger("pitagoras.cassette")
+
+REDACTED_HEADERS = {"authorization", "proxy-authorization", "cookie", "x-api-key"}
+# Cabeceras de respuesta que se conservan (el cuerpo se guarda ya descomprimido)
+KEPT_RESPONSE_HEADERS = {"content-type"}
+
+# Un lock por archivo: hay un transporte por réplica y por event loop y todos escriben en el mismo cassette
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path: str) -> threading.Lock:
+    """Lock serializing the appends of every transport to ``path``."""
+    key = os.path.realpath(path)
+    with _file_locks_guard:
+        return _file_locks.setdefault(key, threading.Lock())
+
+
+def _request_body(request: httpx.Request) -> bytes:
+    body = request.content
+    if request.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return body
+
+
+def request_key(method: str, url: str, body: bytes) -> str:
+    """Key matching a replayed request with its recording.
+
+    JSON bodies are canonicalized so key order and whitespace don't matter.
+    """
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    digest = hashlib.sha1(body).hexdigest()[:16]
+    return f"{method} {url} {digest}"
+
+
+def _target(request: httpx.Request) -> str:
+    # Sin esquema ni host, para reproducir contra cualquier API_BASE_URL
+    return request.url.raw_path.decode("ascii", "replace")
+
+
+def _encode_body(content: bytes) -> Dict[str, Any]:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body": base64.b64encode(content).decode("ascii"), "base64": True}
+
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    body = entry.get("body", "")
+    return base64.b64decode(body) if entry.get("base64") else body.encode("utf-8")
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Transport that forwards requests and appends each exchange to a cassette.
+
+    Entries are compressed and written in a worker thread so recording
+    large responses doesn't stall the event loop. Appends are serialized
+    per file, across every transport recording to the same cassette.
+    """
+
+    def __init__(self, path: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.path = path
+        self.inner = inner or httpx.AsyncHTTPTransport()
+        self._lock = _file_lock(path)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = _request_body(request)
+        entry: Dict[str, Any] = {
+            "method": request.method,
+            "url": _target(request),
+            "key": request_key(request.method, _target(request), body),
+            "request_headers": {
+                name: "[REDACTED]" if name.lower() in REDACTED_HEADERS else value
+                for name, value in request.headers.items()
+            },
+            "request": body.decode("utf-8", "replace"),
+        }
+        started = time.monotonic()
+        try:
+            response = await self.inner.handle_async_request(request)
+            content = await response.aread()
+        except httpx.TransportError as e:
+            entry.update(elapsed=round(time.monotonic() - started, 4), error=type(e).__name__, message=str(e))
+            await asyncio.to_thread(self._append, entry)
+            raise
+        entry["elapsed"] = round(time.monotonic() - started, 4)
+        entry["status"] = response.status_code
+        entry["headers"] = {
+            name: value for name, value in response.headers.items() if name.lower() in KEPT_RESPONSE_HEADERS
+        }
+        # aread() ya descomprimió el cuerpo
+        entry.update(_encode_body(content))
+        await asyncio.to_thread(self._append, entry)
+        return httpx.Response(
+            response.status_code,
+            headers=entry["headers"],
+            content=content,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        data = gzip.compress(line.encode("utf-8"))
+        # Cada registro es un miembro gzip independiente: el archivo sigue siendo legible si se interrumpe
+        with self._lock, open(self.path, "ab") as f:
+            f.write(data)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def load_cassette(path: str) -> List[Dict[str, Any]]:
+    """Read the entries of a cassette."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Transport that answers requests from a cassette without network.
+
+    Requests are matched by method, path and canonical body. Repeated
+    requests get the recorded responses in order (the last one is reused
+    when they run out). Each response (or recorded transport error) is
+    delayed by its recorded latency times ``latency_scale``; delays beyond
+    the request's read timeout end in a timeout, as they would upstream.
+
+    Args:
+        entries: Cassette entries (see ``load_cassette``)
+        latency_scale: Multiplier of the recorded latencies (0 disables them)
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for entry in entries:
+            self._entries[entry["key"]].append(entry)
+
+    def _next(self, key: str) -> Optional[Dict[str, Any]]:
+        queue = self._entries.get(key)
+        if not queue:
+            return None
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request.method, _target(request), _request_body(request))
+        entry = self._next(key)
+        if entry is None:
+            logger.warning(f"No recorded response for {request.method} {request.url.path}")
+            raise httpx.ConnectError(
+                f"No hay una respuesta grabada para {request.method} {request.url.path}", request=request
+            )
+
+        delay = entry.get("elapsed", 0) * self.latency_scale
+        timeout = (request.extensions.get("timeout") or {}).get("read")
+        if timeout is not None and delay > timeout:
+            # La latencia escalada supera el timeout de la solicitud: se comporta como la red
+            await asyncio.sleep(timeout)
+            raise httpx.ReadTimeout(f"Replayed response took {delay:.2f} s", request=request)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if "error" in entry:
+            error = getattr(httpx, entry["error"], httpx.TransportError)
+            if not (isinstance(error, type) and issubclass(error, httpx.TransportError)):
+                error = httpx.TransportError
+            raise error(entry.get("message", ""), request=request)
+        return httpx.Response(
+            entry["status"], headers=entry.get("headers", {}), content=_decode_body(entry), request=request
+        )
+
+
+def transport(
+    mode: str = CASSETTE_MODE, path: str = CASSETTE_PATH, latency_scale: float = CASSETTE_LATENCY_SCALE
+) -> Optional[httpx.AsyncBaseTransport]:
+    """Transport for the pooled client in the configured cassette mode (``None`` when off)."""
+    if mode == "record":
+        logger.info(f"Recording upstream traffic to {path}")
+        return RecordingTransport(path)
+    if mode == "replay":
+        entries = load_cassette(path)
+        logger.info(f"Replaying {len(entries)} recorded requests from {path} (latency x{latency_scale:g})")
+        return ReplayTransport(entries, latency_scale)
+    if mode:
+        logger.warning(f"Unknown CASSETTE_MODE '{mode}', ignoring it")
+    return None
@@ -0,0 +1,40 @@
+# pitagoras/codec.py
+"""JSON encoding/decoding for upstream payloads.
+
+Uses ``orjson`` when it is installed (``pip install .[fast]``) and the
+standard library otherwise. Both paths work on ``bytes`` so responses are
+decoded straight from the raw body without building an intermediate ``str``.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize ``obj`` to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str)
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Deserialize JSON from ``bytes`` or ``str``.
+
+    Documents orjson rejects (e.g. integers wider than 64 bits) are decoded
+    again with the standard library; ``dumps`` falls back the same way.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
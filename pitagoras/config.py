@@ -1,5 +1,6 @@
 # pitagoras/config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -10,16 +11,119 @@ BASE_URL = os.getenv("API_BASE_URL")
 AUTH_TOKEN = os.getenv("AUTH_TOKEN")
 DEFAULT_USER_EMAIL = os.getenv("DEFAULT_USER_EMAIL", "jcorona@epa.digital")
 
-# API endpoints
+# Replicas of the API (comma separated); requests go to the fastest healthy one
+API_BASE_URLS = [
+    url.strip().rstrip("/") for url in os.getenv("API_BASE_URLS", BASE_URL or "").split(",") if url.strip()
+]
+# Weight of the latest latency in each replica's moving average
+API_LATENCY_EWMA_ALPHA = float(os.getenv("API_LATENCY_EWMA_ALPHA", "0.3"))
+# Consecutive failures that take a replica out of rotation, and for how long
+API_FAILURE_THRESHOLD = int(os.getenv("API_FAILURE_THRESHOLD", "3"))
+API_FAILURE_COOLDOWN_SECONDS = float(os.getenv("API_FAILURE_COOLDOWN_SECONDS", "30"))
+# Background health checks of the replicas (only with more than one; 0 disables them)
+API_HEALTH_INTERVAL_SECONDS = float(os.getenv("API_HEALTH_INTERVAL_SECONDS", "30"))
+API_HEALTH_PATH = os.getenv("API_HEALTH_PATH", "")
+
+# API endpoints (relative to each base URL)
 ENDPOINTS = {
-    "customers": f"{BASE_URL}/customers",
-    "google_ads": f"{BASE_URL}/adwords/report",
-    "facebook_ads": f"{BASE_URL}/facebook/report",
-    "google_analytics": f"{BASE_URL}/analytics4/report",
-    "analytics4_metadata": f"{BASE_URL}/analytics4/metadata",
-    "facebook_schema": f"{BASE_URL}/facebook/schema",
-    "adwords_resources": f"{BASE_URL}/adwords/resources",
-    "adwords_attributes": f"{BASE_URL}/adwords/attributes",
-    "adwords_segments": f"{BASE_URL}/adwords/segments",
-    "adwords_metrics": f"{BASE_URL}/adwords/metrics",
+    "customers": "/customers",
+    "google_ads": "/adwords/report",
+    "facebook_ads": "/facebook/report",
+    "google_analytics": "/analytics4/report",
+    "analytics4_metadata": "/analytics4/metadata",
+    "facebook_schema": "/facebook/schema",
+    "adwords_resources": "/adwords/resources",
+    "adwords_attributes": "/adwords/attributes",
+    "adwords_segments": "/adwords/segments",
+    "adwords_metrics": "/adwords/metrics",
 }
+
+# Seconds that the customers list (and its search index) is cached
+CUSTOMERS_CACHE_TTL = float(os.getenv("CUSTOMERS_CACHE_TTL", "300"))
+
+# Local export settings
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(os.path.expanduser("~"), "pitagoras_exports"))
+
+# Bounded-memory mode: results larger than this are spilled to a memory-mapped file (0 disables it)
+SPILL_THRESHOLD_MB = float(os.getenv("SPILL_THRESHOLD_MB", "128"))
+SPILL_DIR = os.getenv("SPILL_DIR", os.path.join(tempfile.gettempdir(), "pitagoras_spill"))
+
+# Window (ms) during which compatible report calls are merged into one upstream request (0 disables it)
+REPORT_BATCH_WINDOW_MS = float(os.getenv("REPORT_BATCH_WINDOW_MS", "50"))
+
+# Split large account selections into concurrent upstream requests of at most this many accounts / estimated rows
+ACCOUNT_BATCH_SIZE = int(os.getenv("ACCOUNT_BATCH_SIZE", "25"))
+ACCOUNT_BATCH_MAX_ROWS = int(os.getenv("ACCOUNT_BATCH_MAX_ROWS", "50000"))
+ACCOUNT_BATCH_CONCURRENCY = int(os.getenv("ACCOUNT_BATCH_CONCURRENCY", "4"))
+# Latency each request should stay under; batch limits adapt to it (0 uses half the request timeout)
+ACCOUNT_BATCH_TARGET_SECONDS = float(os.getenv("ACCOUNT_BATCH_TARGET_SECONDS", "0"))
+
+# Seconds that metadata (GA4 metadata, Facebook schema, Google Ads catalogs) is cached
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", "3600"))
+
+# Report response cache
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "64"))
+# Estimated heap size the cached reports may take in total (0 disables the limit)
+REPORT_CACHE_MAX_MB = float(os.getenv("REPORT_CACHE_MAX_MB", "256"))
+
+# Fetch GA4 reports unfiltered and evaluate the JSON-logic filters locally
+GA4_LOCAL_FILTERS = os.getenv("GA4_LOCAL_FILTERS", "false").lower() in ("1", "true", "yes")
+
+# Gzip request bodies of at least this many bytes (0 disables it; the API must accept Content-Encoding: gzip)
+REQUEST_COMPRESSION_MIN_BYTES = int(os.getenv("REQUEST_COMPRESSION_MIN_BYTES", "0"))
+
+# Warm the caches in the background when a customer is selected (opt-in)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+PREFETCH_BUDGET_SECONDS = float(os.getenv("PREFETCH_BUDGET_SECONDS", "20"))
+PREFETCH_MAX_REPORTS = int(os.getenv("PREFETCH_MAX_REPORTS", "3"))
+PREFETCH_DATE_RANGE = os.getenv("PREFETCH_DATE_RANGE", "last30days")
+
+# Off-peak refresh of the most requested reports (opt-in)
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "false").lower() in ("1", "true", "yes")
+REFRESH_WINDOW = os.getenv("REFRESH_WINDOW", "05:00-08:00")
+REFRESH_INTERVAL_MINUTES = float(os.getenv("REFRESH_INTERVAL_MINUTES", "60"))
+REFRESH_MIN_HITS = int(os.getenv("REFRESH_MIN_HITS", "3"))
+REFRESH_MAX_REPORTS = int(os.getenv("REFRESH_MAX_REPORTS", "20"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "2"))
+REFRESH_CACHE_TTL = float(os.getenv("REFRESH_CACHE_TTL", "21600"))
+
+# Maximum seconds a tool call may take; its upstream requests are cancelled when it passes (0 disables it)
+TOOL_DEADLINE_SECONDS = float(os.getenv("TOOL_DEADLINE_SECONDS", "120"))
+
+# Render and aggregate results of at least this many rows in a worker pool instead of on the event loop
+OFFLOAD_MIN_ROWS = int(os.getenv("OFFLOAD_MIN_ROWS", "5000"))
+# Worker threads for that pool (0 sizes it to the CPU cores)
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", "0"))
+
+# Event-loop lag monitor: sampling interval and the lag counted as a stall, in milliseconds
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "250"))
+
+# Profile every tool call with cProfile (calls can also opt in with profile=true); profiles are written to PROFILE_DIR
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "pitagoras_profiles"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+# Trace allocations with tracemalloc and account peak/retained memory per tool call (opt-in, adds overhead)
+MEMORY_TRACING = os.getenv("MEMORY_TRACING", "false").lower() in ("1", "true", "yes")
+# Allocation sites listed per call; each one needs two full snapshots on the event loop (0 skips them)
+MEMORY_TRACE_TOP = int(os.getenv("MEMORY_TRACE_TOP", "0"))
+MEMORY_TRACE_HISTORY = int(os.getenv("MEMORY_TRACE_HISTORY", "50"))
+
+# Campaign-name normalization rules used to join GA4 with Google Ads / Facebook campaigns
+BLEND_NORMALIZATION = [
+    rule.strip() for rule in os.getenv("BLEND_NORMALIZATION", "prefix,lowercase,accents,separators").split(",")
+    if rule.strip()
+]
+
+# Portfolio reports across customers: concurrent customers, upstream requests per second and customers per call
+PORTFOLIO_CONCURRENCY = int(os.getenv("PORTFOLIO_CONCURRENCY", "4"))
+PORTFOLIO_RATE_PER_SECOND = float(os.getenv("PORTFOLIO_RATE_PER_SECOND", "5"))
+PORTFOLIO_MAX_CUSTOMERS = int(os.getenv("PORTFOLIO_MAX_CUSTOMERS", "100"))
+
+# Record upstream traffic to a cassette file ("record") or serve it back without network ("replay")
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join(tempfile.gettempdir(), "pitagoras_cassette.jsonl.gz"))
+# Replayed latency as a multiple of the recorded one (0 replies immediately)
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1"))
@@ -0,0 +1,113 @@
+# pitagoras/deadline.py
+"""Per-call deadlines propagated through a context variable.
+
+Tool wrappers open a ``deadline`` scope; every upstream request made inside
+it (directly or from tasks that inherit the context) clamps its timeout to
+the time left, so abandoned work stops at the deadline instead of at each
+request's own timeout. Fetches shared by several calls run under a
+``SharedDeadline``: the latest deadline of the calls waiting on them.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Union
+
+from . import progress
+
+
+class SharedDeadline:
+    """Deadline of work shared by several callers (deduplicated or batched).
+
+    Each waiting caller joins with its own deadline (or the
+    ``SharedDeadline`` of an outer shared fetch) and leaves when it stops
+    waiting. The shared work is bounded by the latest of them, so it runs
+    as long as some caller may still use its result; a caller without a
+    deadline lifts the bound.
+    """
+
+    def __init__(self):
+        self.members: List["Bound"] = []
+
+    def join(self, member: "Bound") -> None:
+        self.members.append(member)
+
+    def leave(self, member: "Bound") -> None:
+        if member in self.members:
+            self.members.remove(member)
+
+    @property
+    def at(self) -> Optional[float]:
+        """Monotonic time of the latest member deadline (``None`` if unbounded)."""
+        deadlines = [_resolve(member) for member in self.members]
+        if not deadlines or None in deadlines:
+            return None
+        return max(deadlines)
+
+
+Bound = Union[float, SharedDeadline, None]
+
+_deadline: contextvars.ContextVar[Bound] = contextvars.ContextVar("pitagoras_deadline", default=None)
+
+
+def _resolve(bound: Bound) -> Optional[float]:
+    return bound.at if isinstance(bound, SharedDeadline) else bound
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's deadline passed before an upstream request could be made."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Limit the enclosed work to ``seconds`` (never extending an outer deadline)."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    at = time.monotonic() + seconds
+    outer = _resolve(_deadline.get())
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or ``None`` without one."""
+    at = _resolve(_deadline.get())
+    return None if at is None else at - time.monotonic()
+
+
+def current() -> Bound:
+    """Deadline of the current context, to join a ``SharedDeadline`` with."""
+    return _deadline.get()
+
+
+def request_timeout(default: Optional[float]) -> Optional[float]:
+    """Timeout for an upstream request: ``default`` clamped to the time left.
+
+    Raises:
+        DeadlineExceeded: If the deadline already passed
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Se agotó el tiempo límite de la consulta")
+    return left if default is None else min(default, left)
+
+
+def detached_context(shared: Optional[SharedDeadline] = None) -> contextvars.Context:
+    """Copy of the current context without the caller's deadline or progress tracker.
+
+    Used for work shared by several callers (batched or deduplicated
+    requests) or outliving the call that started it, so one caller's
+    deadline doesn't cut the others short and its progress isn't stepped by
+    their fetches. Shared work passes the ``shared`` deadline its callers
+    join; work without one (prefetching) is unbounded. Either way it is
+    cancelled when no caller is left waiting.
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, shared)
+    context.run(progress.clear)
+    return context
@@ -0,0 +1,136 @@
+# pitagoras/filters.py
+import logging
+from typing import Any, Callable, Dict, List, Sequence, Set
+
+logger = logging.getLogger("pitagoras.filters")
+
+Row = Sequence[Any]
+Getter = Callable[[Row], Any]
+
+
+class FilterCompileError(ValueError):
+    """Raised when a filter can't be evaluated locally."""
+
+
+def filter_vars(spec: Any) -> Set[str]:
+    """Return the names referenced with ``{"var": ...}`` in a filter."""
+    found: Set[str] = set()
+    if isinstance(spec, dict):
+        for op, args in spec.items():
+            if op == "var":
+                name = args[0] if isinstance(args, list) else args
+                found.add(str(name))
+            else:
+                found |= filter_vars(args)
+    elif isinstance(spec, list):
+        for item in spec:
+            found |= filter_vars(item)
+    return found
+
+
+def _number(value: Any) -> Any:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _contains(needle: Any, haystack: Any) -> bool:
+    if isinstance(haystack, str):
+        return str(needle) in haystack
+    if isinstance(haystack, (list, tuple, set)):
+        return needle in haystack
+    return False
+
+
+def _compare(op: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    def compare(a: Any, b: Any) -> bool:
+        try:
+            return op(_number(a), _number(b))
+        except TypeError:
+            return False
+    return compare
+
+
+_BINARY = {
+    "==": lambda a, b: a == b or str(a) == str(b),
+    "===": lambda a, b: a == b,
+    "!=": lambda a, b: not (a == b or str(a) == str(b)),
+    "!==": lambda a, b: a != b,
+    "<": _compare(lambda a, b: a < b),
+    "<=": _compare(lambda a, b: a <= b),
+    ">": _compare(lambda a, b: a > b),
+    ">=": _compare(lambda a, b: a >= b),
+    "in": _contains,
+}
+
+
+def _compile(spec: Any, columns: Dict[str, int]) -> Getter:
+    if not isinstance(spec, dict):
+        if isinstance(spec, list):
+            items = [_compile(item, columns) for item in spec]
+            return lambda row: [item(row) for item in items]
+        return lambda row, value=spec: value
+
+    if len(spec) != 1:
+        raise FilterCompileError(f"Expresión de filtro inválida: {spec}")
+    op, args = next(iter(spec.items()))
+    if not isinstance(args, list):
+        args = [args]
+
+    if op == "var":
+        name = str(args[0])
+        if name not in columns:
+            raise FilterCompileError(f"La columna '{name}' no está en el resultado")
+        index = columns[name]
+        return lambda row: row[index]
+
+    parts = [_compile(arg, columns) for arg in args]
+
+    if op == "and":
+        return lambda row: all(part(row) for part in parts)
+    if op == "or":
+        return lambda row: any(part(row) for part in parts)
+    if op in ("!", "not"):
+        part = parts[0]
+        return lambda row: not part(row)
+    if op == "!!":
+        part = parts[0]
+        return lambda row: bool(part(row))
+    if op in _BINARY:
+        if len(parts) != 2:
+            raise FilterCompileError(f"El operador '{op}' requiere dos argumentos")
+        fn, left, right = _BINARY[op], parts[0], parts[1]
+        return lambda row: fn(left(row), right(row))
+
+    raise FilterCompileError(f"Operador de filtro no soportado localmente: '{op}'")
+
+
+def compile_filter(spec: Dict[str, Any], headers: List[str]) -> Callable[[Row], bool]:
+    """Compile a JSON-logic style filter into a predicate over report rows.
+
+    Variables are bound to column positions in ``headers`` at compile time so
+    evaluating a row is a chain of plain Python calls. Supports ``and``,
+    ``or``, ``!``, ``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=`` and ``in``
+    (substring or membership), which covers the filters built by the tools.
+
+    Raises:
+        FilterCompileError: if the filter uses unsupported operators or
+            references columns missing from ``headers``.
+    """
+    columns = {str(h): i for i, h in enumerate(headers)}
+    predicate = _compile(spec, columns)
+    return lambda row: bool(predicate(row))
+
+
+def apply_filter(spec: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of a report response keeping only the rows matching ``spec``."""
+    predicate = compile_filter(spec, data.get("headers", []))
+    result = dict(data)
+    result["rows"] = [row for row in data.get("rows", []) if predicate(row)]
+    logger.info(
+        f"Filtered {len(data.get('rows', []))} rows locally, kept {len(result['rows'])}"
+    )
+    return result
@@ -1,15 +1,48 @@
 # pitagoras/models.py
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 
+# Nombres de proveedor que envía la API -> nombre canónico
+PROVIDER_ALIASES = {
+    "adwords": "adwords",
+    "google ads": "adwords",
+    "fb": "facebook",
+    "facebook": "facebook",
+    "facebook ads": "facebook",
+    "analytics4": "analytics4",
+}
 
-@dataclass
+DEFAULT_CREDENTIAL_EMAIL = "analytics@epa.digital"
+
+
+def _first(data: Dict[str, Any], *keys: str) -> Optional[str]:
+    """Value of the first key present and non-empty in ``data`` as a string."""
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+@dataclass(slots=True)
 class Manager:
     name: str
     user_id: str
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Manager":
+        return cls(
+            name=data.get("name") or "",
+            user_id=_first(data, "userID", "user_id", "userId") or "",
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class Account:
     account_id: str
     name: str
@@ -18,10 +51,61 @@ class Account:
     property_id: Optional[str] = None  # For Google Analytics
     credential_email: Optional[str] = None  # For Google Analytics
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Account":
+        """Decode an account from the API payload normalizing its keys.
+
+        Provider names are mapped to ``adwords``, ``facebook`` or
+        ``analytics4`` and accounts with a property ID but no known provider
+        are treated as GA4. Repeated values (providers, login customer IDs,
+        credential emails) are interned.
+        """
+        raw_provider = str(data.get("provider") or "").strip()
+        property_id = _first(data, "propertyId", "property_id", "propertyID")
+        provider = PROVIDER_ALIASES.get(raw_provider.lower())
+        if provider is None:
+            provider = "analytics4" if property_id else raw_provider or "desconocido"
+        return cls(
+            account_id=_first(data, "accountID", "account_id", "accountId") or "N/A",
+            name=data.get("name") or "Sin nombre",
+            provider=sys.intern(provider),
+            login_customer_id=_intern(_first(data, "externalLoginCustomerID", "login_customer_id")),
+            property_id=property_id,
+            credential_email=_intern(_first(data, "credentialEmail", "credential_email")),
+        )
+
+    def to_request(self) -> Dict[str, Any]:
+        """Account in the format expected by the report endpoints."""
+        account = {"id": self.account_id, "account_id": self.account_id, "name": self.name}
+        if self.provider == "adwords":
+            account["login_customer_id"] = self.login_customer_id or ""
+        elif self.provider == "analytics4":
+            account["property_id"] = self.property_id
+            account["credential_email"] = self.credential_email or DEFAULT_CREDENTIAL_EMAIL
+        return account
 
-@dataclass
+
+@dataclass(slots=True)
 class Customer:
     id: str
     name: str
     accounts: List[Account]
-    status: str
\ No newline at end of file
+    status: str
+    managers: List[Manager] = field(default_factory=list)
+    # Índices de selección de cuentas por plataforma, construidos al primer uso
+    account_indexes: Dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Customer":
+        """Decode a customer and its accounts from the API payload."""
+        return cls(
+            id=_first(data, "ID", "id") or "",
+            name=data.get("name") or "",
+            accounts=[Account.from_dict(a) for a in data.get("accounts") or []],
+            status=sys.intern(str(data.get("status") or "")),
+            managers=[Manager.from_dict(m) for m in data.get("managers") or []],
+        )
+
+    def accounts_for(self, provider: str) -> List[Account]:
+        """Accounts of the given canonical provider."""
+        return [a for a in self.accounts if a.provider == provider]
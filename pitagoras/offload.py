@@ -0,0 +1,149 @@
+# pitagoras/offload.py
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .config import (
+    OFFLOAD_MIN_ROWS,
+    OFFLOAD_WORKERS,
+    LOOP_MONITOR_INTERVAL_MS,
+    LOOP_STALL_THRESHOLD_MS,
+)
+
+logger = logging.getLogger("pitagoras.offload")
+
+T = TypeVar("T")
+
+
+class Offloader:
+    """Runs CPU-bound post-processing of large results in a worker pool.
+
+    Results below ``min_rows`` are processed inline (a thread hop costs more
+    than it saves). Larger ones run in a thread pool: the work still holds
+    the GIL, but the interpreter switches threads every few milliseconds, so
+    the event loop keeps serving the other sessions instead of freezing for
+    the whole render. Threads avoid pickling the rows (or the spilled files
+    behind them) into another process.
+
+    Args:
+        min_rows: Rows from which the work is offloaded
+        workers: Pool size (0 sizes it to the CPU cores)
+    """
+
+    def __init__(self, min_rows: int, workers: int = 0):
+        self.min_rows = min_rows
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.offloaded = 0
+        self.inline = 0
+        self.offloaded_seconds = 0.0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pitagoras-cpu")
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any, rows: int = 0, **kwargs: Any) -> T:
+        """Call ``fn(*args, **kwargs)``, in the pool when ``rows`` reaches the threshold."""
+        if self.min_rows <= 0 or rows < self.min_rows:
+            self.inline += 1
+            return fn(*args, **kwargs)
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self.offloaded += 1
+            self.offloaded_seconds += time.monotonic() - started
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "min_rows": self.min_rows,
+            "offloaded": self.offloaded,
+            "inline": self.inline,
+            "offloaded_seconds": round(self.offloaded_seconds, 3),
+        }
+
+
+class LoopMonitor:
+    """Measures event-loop lag by how late a periodic sleep wakes up.
+
+    Any callback that blocks the loop delays the wake-up by the time it held
+    it; lags of at least ``stall_threshold_ms`` are counted and logged as
+    stalls.
+
+    Args:
+        interval_ms: Sampling interval
+        stall_threshold_ms: Lag counted as a stall
+    """
+
+    def __init__(self, interval_ms: float, stall_threshold_ms: float):
+        self.interval = interval_ms / 1000
+        self.stall_threshold = stall_threshold_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall: Optional[float] = None
+        self.last_stall_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.monotonic() - expected))
+
+    def record(self, lag: float) -> None:
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            self.last_stall = lag
+            self.last_stall_at = time.time()
+            logger.warning(f"Event loop stalled for {lag * 1000:.0f} ms")
+
+    def metrics(self) -> Dict[str, Any]:
+        average = self.total_lag / self.samples if self.samples else 0.0
+        return {
+            "samples": self.samples,
+            "avg_lag_ms": round(average * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stalls,
+            "stall_threshold_ms": round(self.stall_threshold * 1000),
+            "last_stall_ms": round(self.last_stall * 1000, 2) if self.last_stall is not None else None,
+            "last_stall_at": self.last_stall_at,
+        }
+
+
+offloader = Offloader(OFFLOAD_MIN_ROWS, OFFLOAD_WORKERS)
+loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL_MS, LOOP_STALL_THRESHOLD_MS)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, rows: int = 0, **kwargs: Any) -> T:
+    """Run CPU-bound post-processing of ``rows`` rows off the event loop when large."""
+    return await offloader.run(fn, *args, rows=rows, **kwargs)
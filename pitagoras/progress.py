@@ -0,0 +1,151 @@
+# pitagoras/progress.py
+"""Progress of the current tool call, propagated through a context variable.
+
+Tool wrappers open a ``tracking`` scope when the client asked for progress
+and plan one step per report. Upstream fetches run in tasks shared by
+several calls and detached from their contexts, so the callers' trackers
+are passed to them explicitly through a ``SharedProgress``; a report split
+into several upstream requests reports one step per request. Outside a
+scope every call is a no-op.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, List, Optional, Union
+
+logger = logging.getLogger("pitagoras.progress")
+
+# send(progreso, total, mensaje)
+Sender = Callable[[float, Optional[float], str], Awaitable[None]]
+
+
+class Progress:
+    """Counts completed fetches, accounts and rows of one tool call."""
+
+    def __init__(self, send: Sender):
+        self._send = send
+        self.started = time.monotonic()
+        self.steps_done = 0
+        self.steps_total = 0
+        self.accounts_done = 0
+        self.accounts_total = 0
+        self.rows = 0
+
+    def plan(self, steps: int, accounts: int = 0) -> None:
+        self.steps_total += steps
+        self.accounts_total += accounts
+
+    def advance(self, steps: int, rows: int = 0, accounts: int = 0) -> None:
+        """Count work done without notifying (catching up on a shared fetch)."""
+        self.steps_done += steps
+        self.rows += rows
+        self.accounts_done += accounts
+
+    async def step(self, label: str, rows: int = 0, accounts: int = 0) -> None:
+        self.advance(1, rows, accounts)
+        parts = [label]
+        if self.accounts_total:
+            parts.append(f"{self.accounts_done}/{self.accounts_total} cuentas")
+        parts.append(f"{self.rows:,} filas")
+        parts.append(f"{time.monotonic() - self.started:.1f} s")
+        total = max(self.steps_total, self.steps_done)
+        try:
+            await self._send(self.steps_done, total, " · ".join(parts))
+        except Exception as e:
+            # El progreso nunca debe interrumpir la consulta
+            logger.debug(f"Couldn't send progress notification: {str(e)}")
+
+
+class SharedProgress:
+    """Progress of a fetch shared by several callers (deduplicated or batched).
+
+    Every caller waiting on the fetch joins with its tracker (or with the
+    ``SharedProgress`` of an outer shared fetch) and leaves when it stops
+    waiting. Steps are reported to the current members; a member that joins
+    late is caught up silently with the steps planned and done so far.
+
+    Callers plan each report as one step, so a fetch split into ``n``
+    upstream requests plans ``n - 1`` more.
+    """
+
+    def __init__(self, *members: Optional["Member"]):
+        self.members: List[Member] = []
+        self.steps_planned = 0
+        self.steps_done = 0
+        self.rows = 0
+        self.accounts = 0
+        for member in members:
+            self.join(member)
+
+    def join(self, member: Optional["Member"]) -> None:
+        if member is None or member in self.members:
+            return
+        member.plan(self.steps_planned)
+        member.advance(self.steps_done, self.rows, self.accounts)
+        self.members.append(member)
+
+    def leave(self, member: Optional["Member"]) -> None:
+        if member in self.members:
+            self.members.remove(member)
+
+    def plan(self, steps: int, accounts: int = 0) -> None:
+        self.steps_planned += steps
+        for member in self.members:
+            member.plan(steps, accounts)
+
+    def advance(self, steps: int, rows: int = 0, accounts: int = 0) -> None:
+        self.steps_done += steps
+        self.rows += rows
+        self.accounts += accounts
+        for member in self.members:
+            member.advance(steps, rows, accounts)
+
+    async def step(self, label: str, rows: int = 0, accounts: int = 0) -> None:
+        self.steps_done += 1
+        self.rows += rows
+        self.accounts += accounts
+        for member in list(self.members):
+            await member.step(label, rows, accounts)
+
+
+Member = Union[Progress, SharedProgress]
+
+
+_current: contextvars.ContextVar[Optional[Progress]] = contextvars.ContextVar(
+    "pitagoras_progress", default=None
+)
+
+
+@contextmanager
+def tracking(send: Sender) -> Iterator[Progress]:
+    """Track the progress of the enclosed work and report it through ``send``."""
+    token = _current.set(Progress(send))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Progress]:
+    """Tracker of the current tool call, if the client asked for progress."""
+    return _current.get()
+
+
+def clear() -> None:
+    """Stop tracking progress in the current context (for detached work)."""
+    _current.set(None)
+
+
+def plan(steps: int, accounts: int = 0) -> None:
+    """Announce ``steps`` upcoming fetches covering ``accounts`` accounts."""
+    progress = _current.get()
+    if progress is not None:
+        progress.plan(steps, accounts)
+
+
+async def step(label: str, rows: int = 0, accounts: int = 0) -> None:
+    """Report a completed fetch."""
+    progress = _current.get()
+    if progress is not None:
+        await progress.step(label, rows, accounts)
@@ -0,0 +1,184 @@
+# pitagoras/replicas.py
+"""Routing of upstream requests across replicas of the API.
+
+Each replica keeps its own connection pool and a moving average (EWMA) of
+the latency of its requests. Requests go to the fastest healthy replica;
+a replica that fails several times in a row is taken out of rotation for
+a cooldown, and background health checks bring it back once it answers.
+Probes hit a cheap endpoint, so their latency is reported apart and does
+not feed the routing average.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger("pitagoras.replicas")
+
+ClientFactory = Callable[[str], httpx.AsyncClient]
+
+
+class Replica:
+    """One base URL of the API with its pooled client and health state."""
+
+    def __init__(self, base_url: str, client_factory: ClientFactory):
+        self.base_url = base_url
+        self._client_factory = client_factory
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.latency: Optional[float] = None
+        self.probe_latency: Optional[float] = None
+        self.failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def client(self) -> httpx.AsyncClient:
+        """Pooled client of this replica for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = self._client_factory(self.base_url)
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+class ReplicaPool:
+    """Latency-aware selection and failover across API replicas.
+
+    Args:
+        base_urls: Base URL of each replica
+        client_factory: Builds the pooled client of a replica from its base URL
+        alpha: Weight of the latest latency in the moving average
+        failure_threshold: Consecutive failures that take a replica out of rotation
+        cooldown: Seconds a failing replica stays out of rotation
+        health_interval: Seconds between background health checks (0 disables them)
+        health_path: Path requested by the health checks (empty for the base URL)
+        failure_penalty: Latency (seconds) a failed request counts as at least, so
+            a replica that fails fast (e.g. refusing connections) never ranks as
+            the fastest one
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        client_factory: ClientFactory,
+        alpha: float = 0.3,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        health_interval: float = 30.0,
+        health_path: str = "",
+        failure_penalty: float = 5.0,
+    ):
+        self.replicas = [Replica(url, client_factory) for url in base_urls]
+        self.alpha = alpha
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.health_path = health_path
+        self.failure_penalty = failure_penalty
+        self._task: Optional[asyncio.Task] = None
+
+    def ordered(self) -> List[Replica]:
+        """Replicas in the order to try them: healthy ones by latency, then the rest.
+
+        Replicas without measurements yet come first so they get measured.
+        """
+        if not self.replicas:
+            raise RuntimeError("No hay una URL base de la API configurada (API_BASE_URL o API_BASE_URLS)")
+        healthy = [r for r in self.replicas if r.healthy]
+        down = [r for r in self.replicas if not r.healthy]
+        healthy.sort(key=lambda r: r.latency if r.latency is not None else 0.0)
+        down.sort(key=lambda r: r.down_until)
+        return healthy + down
+
+    def record(self, replica: Replica, elapsed: float, ok: bool) -> None:
+        """Account the outcome and latency of a request to ``replica``."""
+        replica.requests += 1
+        if not ok:
+            elapsed = max(elapsed, self.failure_penalty)
+        if replica.latency is None:
+            replica.latency = elapsed
+        else:
+            replica.latency = self.alpha * elapsed + (1 - self.alpha) * replica.latency
+        if not ok:
+            replica.errors += 1
+        self._update_health(replica, ok)
+
+    def _update_health(self, replica: Replica, ok: bool) -> None:
+        if ok:
+            if not replica.healthy or replica.failures >= self.failure_threshold:
+                logger.info(f"Replica {replica.base_url} is healthy again")
+            replica.failures = 0
+            replica.down_until = 0.0
+            return
+        replica.failures += 1
+        if replica.failures >= self.failure_threshold and len(self.replicas) > 1:
+            replica.down_until = time.monotonic() + self.cooldown
+            logger.warning(
+                f"Replica {replica.base_url} failed {replica.failures} times in a row, "
+                f"out of rotation for {self.cooldown:g}s"
+            )
+
+    async def check(self, replica: Replica) -> bool:
+        """Probe ``replica``; any answer below 500 counts as healthy.
+
+        Only the health of the replica is updated: the probe's latency is
+        kept in ``probe_latency`` and doesn't affect routing.
+        """
+        started = time.monotonic()
+        try:
+            response = await replica.client().get(self.health_path or "", timeout=5.0)
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        replica.probe_latency = time.monotonic() - started
+        self._update_health(replica, ok)
+        return ok
+
+    def start(self) -> None:
+        if len(self.replicas) > 1 and self.health_interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+            logger.info(f"Health checks of {len(self.replicas)} API replicas every {self.health_interval:g}s")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(r) for r in self.replicas))
+            await asyncio.sleep(self.health_interval)
+
+    async def aclose(self) -> None:
+        for replica in self.replicas:
+            await replica.aclose()
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "base_url": r.base_url,
+                "healthy": r.healthy,
+                "latency_ms": round(r.latency * 1000, 1) if r.latency is not None else None,
+                "probe_latency_ms": round(r.probe_latency * 1000, 1) if r.probe_latency is not None else None,
+                "requests": r.requests,
+                "errors": r.errors,
+                "consecutive_failures": r.failures,
+            }
+            for r in self.replicas
+        ]
@@ -0,0 +1,101 @@
+# pitagoras/search.py
+import math
+from typing import Dict, List, Set
+
+from .models import Customer
+from .text import fold_text
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of ``text`` padded with spaces at both ends."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CustomerIndex:
+    """In-memory fuzzy search index over the customers list.
+
+    Built once when the customers list is loaded. Names and IDs are
+    accent-folded and indexed by trigram, so queries only touch the
+    customers that share trigrams with the query and tolerate accents and
+    small typos ("nandu" finds "Ñandú", "zapateria lopes" finds
+    "Zapatería López").
+
+    Candidates are drawn only from the postings of the query's rarest
+    trigrams: a customer sharing at least ``k`` of the ``n`` query trigrams
+    must appear in one of the ``n - k + 1`` rarest postings, so common
+    trigrams (``" rg"``, ``"rg-"``) never trigger a full scan.
+    """
+
+    # Similitud mínima de trigramas para resultados aproximados
+    MIN_SIMILARITY = 0.45
+
+    def __init__(self, customers: List[Customer]):
+        self.customers = customers
+        self.names: List[str] = []
+        self.ids: List[str] = []
+        self.by_id: Dict[str, int] = {}
+        self.postings: Dict[str, Set[int]] = {}
+
+        for position, customer in enumerate(customers):
+            name = fold_text(customer.name)
+            cid = fold_text(customer.id)
+            self.names.append(name)
+            self.ids.append(cid)
+            self.by_id.setdefault(cid, position)
+            for gram in trigrams(name) | trigrams(cid):
+                self.postings.setdefault(gram, set()).add(position)
+
+    def _score(self, position: int, query: str, words: List[str], similarity: float) -> float:
+        name, cid = self.names[position], self.ids[position]
+        if cid == query:
+            return 100.0
+        if name == query:
+            return 90.0
+        if name.startswith(query):
+            return 80.0
+        name_words = name.split()
+        if all(any(w.startswith(q) for w in name_words) for q in words):
+            return 70.0 + similarity
+        if query in name or query in cid:
+            return 60.0 + similarity
+        return similarity * 50
+
+    def search(self, query: str, limit: int = 20) -> List[Customer]:
+        """Return up to ``limit`` customers ranked by relevance to ``query``."""
+        folded = fold_text(query)
+        if not folded:
+            return self.customers[:limit]
+
+        words = folded.split()
+        postings = self.postings
+        empty: Set[int] = set()
+        query_grams = sorted(trigrams(folded), key=lambda g: len(postings.get(g, empty)))
+        needed = max(1, math.ceil(self.MIN_SIMILARITY * len(query_grams)))
+        candidates: Set[int] = set()
+        for gram in query_grams[:len(query_grams) - needed + 1]:
+            candidates |= postings.get(gram, empty)
+        if folded in self.by_id:
+            candidates.add(self.by_id[folded])
+        if len(folded) < 3:
+            # Consultas muy cortas: los trigramas no bastan, se revisan coincidencias directas
+            candidates.update(
+                position for position, (name, cid) in enumerate(zip(self.names, self.ids))
+                if folded in name or folded in cid
+            )
+
+        gram_sets = [postings.get(gram, empty) for gram in query_grams]
+        counts = {
+            position: sum(1 for grams in gram_sets if position in grams)
+            for position in candidates
+        }
+
+        scored = []
+        for position, shared in counts.items():
+            similarity = shared / len(query_grams)
+            score = self._score(position, folded, words, similarity)
+            if score >= 60 or similarity >= self.MIN_SIMILARITY:
+                scored.append((score, similarity, -position))
+
+        scored.sort(reverse=True)
+        return [self.customers[-position] for _, _, position in scored[:limit]]
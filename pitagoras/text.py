@@ -0,0 +1,12 @@
+# pitagoras/text.py
+import unicodedata
+
+
+def fold_text(text: str) -> str:
+    """Lowercase ``text``, strip accents and collapse whitespace.
+
+    ``"  Café  Ñandú "`` becomes ``"cafe nandu"``.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
@@ -1,10 +1,15 @@
 # server/__init__.py
 import logging
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 from mcp.server.fastmcp import FastMCP
 
+from pitagoras.api import close_client, replicas
+from pitagoras.offload import loop_monitor, offloader
 from .prompts import register_prompts
 from .resources import register_resources
+from .memory import memory_tracker
+from .scheduler import scheduler
 from .tools import register_tools
 
 # Configure logging
@@ -14,6 +19,24 @@ logging.basicConfig(
 )
 
 
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[dict]:
+    """Start background jobs with the server and clean up on shutdown."""
+    memory_tracker.start()
+    loop_monitor.start()
+    scheduler.start()
+    replicas.start()
+    try:
+        yield {}
+    finally:
+        await replicas.stop()
+        await scheduler.stop()
+        await loop_monitor.stop()
+        offloader.shutdown()
+        await close_client()
+        memory_tracker.stop()
+
+
 def create_server(name: str = "Pitágoras MCP") -> FastMCP:
     """
     Create and configure an MCP server for Pitágoras
@@ -25,7 +48,7 @@ def create_server(name: str = "Pitágoras MCP") -> FastMCP:
         Configured FastMCP server
     """
     # Create FastMCP server
-    mcp = FastMCP(name)
+    mcp = FastMCP(name, lifespan=lifespan)
     
     # Register all components
     # We use async functions to register components, and call them synchronously
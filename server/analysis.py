@@ -0,0 +1,227 @@
+# server/analysis.py
+import heapq
+import operator
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pitagoras.batching import normalize_column
+
+Key = Tuple[Any, ...]
+
+
+def to_number(value: Any) -> float:
+    """Convert a report cell to ``float``; non numeric values count as 0."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def format_number(value: Optional[float]) -> str:
+    """Format a number for markdown tables (integers without decimals)."""
+    if value is None:
+        return "—"
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+def aggregate(
+    rows: Iterable[Sequence[Any]], key_idx: List[int], metric_idx: List[int]
+) -> Dict[Key, List[float]]:
+    """Sum ``metric_idx`` columns grouped by the ``key_idx`` columns (hash aggregation)."""
+    groups: Dict[Key, List[float]] = {}
+    for row in rows:
+        key = tuple(row[i] for i in key_idx)
+        sums = groups.get(key)
+        if sums is None:
+            sums = groups[key] = [0.0] * len(metric_idx)
+        for j, i in enumerate(metric_idx):
+            sums[j] += to_number(row[i])
+    return groups
+
+
+def percent_change(current: float, previous: float) -> Optional[float]:
+    """Percentage change from ``previous`` to ``current`` (``None`` if undefined)."""
+    if previous == 0:
+        return None
+    return (current - previous) / abs(previous) * 100
+
+
+def join_periods(
+    current: Dict[Key, List[float]], previous: Dict[Key, List[float]]
+) -> List[Tuple[Key, List[float], List[float]]]:
+    """Full outer hash join of two aggregated periods on their keys.
+
+    Keys missing from one side get zeros. Rows come in the order of
+    ``current`` followed by keys only present in ``previous``.
+    """
+    width = len(next(iter(current.values()), next(iter(previous.values()), [])))
+    empty = [0.0] * width
+    joined = [(key, values, previous.get(key, empty)) for key, values in current.items()]
+    joined.extend((key, empty, values) for key, values in previous.items() if key not in current)
+    return joined
+
+
+def format_cell(cell: Any) -> str:
+    """Render a table cell, leaving missing values empty."""
+    return "" if cell is None else str(cell)
+
+
+def markdown_table(headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[str]:
+    """Render headers and rows as the lines of a markdown table."""
+    lines = ["| " + " | ".join(str(h) for h in headers) + " |"]
+    lines.append("| " + " | ".join(["---" for _ in headers]) + " |")
+    lines.extend("| " + " | ".join(format_cell(cell) for cell in row) + " |" for row in rows)
+    return lines
+
+
+def group_rows(
+    headers: List[str], rows: Iterable[Sequence[Any]], group_by: List[str], metric_idx: List[int]
+) -> Tuple[List[str], List[List[Any]], List[str]]:
+    """Aggregate a report by the ``group_by`` columns summing the metric columns.
+
+    Columns that are neither grouped nor metrics are dropped.
+
+    Returns:
+        ``(headers, rows, missing)`` where ``missing`` lists unknown ``group_by`` names.
+    """
+    positions = {normalize_column(str(h)): i for i, h in enumerate(headers)}
+    key_idx, missing = [], []
+    for name in group_by:
+        index = positions.get(normalize_column(name))
+        if index is None:
+            missing.append(name)
+        elif index not in key_idx and index not in metric_idx:
+            key_idx.append(index)
+
+    groups = aggregate(rows, key_idx, metric_idx)
+    new_headers = [headers[i] for i in key_idx] + [headers[i] for i in metric_idx]
+    new_rows = [
+        list(key) + [int(v) if v.is_integer() else round(v, 4) for v in sums]
+        for key, sums in groups.items()
+    ]
+    return new_headers, new_rows, missing
+
+
+_CONDITION_RE = re.compile(r"^\s*([\w.]+)\s*(>=|<=|!=|==|=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$")
+_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def _column_positions(headers: Sequence[str]) -> Dict[str, int]:
+    return {normalize_column(str(h)): i for i, h in enumerate(headers)}
+
+
+def parse_conditions(
+    headers: Sequence[str], where: str
+) -> Tuple[Optional[Callable[[Sequence[Any]], bool]], List[str]]:
+    """Compile threshold conditions such as ``"cpa > 50, clicks >= 10"``.
+
+    Conditions are separated by commas or ``and`` and must all hold. Empty
+    cells never match.
+
+    Returns:
+        ``(predicate, errors)``
+    """
+    positions = _column_positions(headers)
+    checks: List[Tuple[int, Callable[[Any, Any], bool], float]] = []
+    errors: List[str] = []
+    for part in re.split(r",|\band\b", where, flags=re.IGNORECASE):
+        if not part.strip():
+            continue
+        match = _CONDITION_RE.match(part)
+        if not match:
+            errors.append(f"Condición inválida: `{part.strip()}` (formato: columna > valor)")
+            continue
+        column, op, value = match.groups()
+        index = positions.get(normalize_column(column))
+        if index is None:
+            errors.append(f"La columna `{column}` no existe en el resultado")
+            continue
+        checks.append((index, _OPERATORS[op], float(value)))
+
+    if errors or not checks:
+        return None, errors
+
+    def predicate(row: Sequence[Any]) -> bool:
+        for index, op, value in checks:
+            cell = row[index]
+            if cell is None or cell == "" or not op(to_number(cell), value):
+                return False
+        return True
+
+    return predicate, errors
+
+
+def select_rows(
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    top_n: Optional[int] = None,
+    sort_by: Optional[str] = None,
+    ascending: bool = False,
+    where: Optional[str] = None,
+) -> Tuple[List[Sequence[Any]], int, List[str]]:
+    """Filter rows by threshold conditions and keep the top ``top_n`` by ``sort_by``.
+
+    Rows are consumed once: the predicate is applied while streaming and a
+    bounded heap keeps only ``top_n`` candidates, so memory depends on the
+    output size rather than on the number of rows.
+
+    Returns:
+        ``(rows, matched, errors)`` where ``matched`` counts the rows that
+        passed the conditions.
+    """
+    errors: List[str] = []
+    predicate = None
+    if where:
+        predicate, errors = parse_conditions(headers, where)
+
+    sort_index = None
+    if sort_by:
+        sort_index = _column_positions(headers).get(normalize_column(sort_by))
+        if sort_index is None:
+            errors.append(f"La columna `{sort_by}` no existe en el resultado")
+    if errors:
+        return [], 0, errors
+
+    matched = 0
+
+    def stream() -> Iterable[Sequence[Any]]:
+        nonlocal matched
+        for row in rows:
+            if predicate is None or predicate(row):
+                matched += 1
+                yield row
+
+    if sort_index is None:
+        if top_n:
+            selected = []
+            for row in stream():
+                if len(selected) < top_n:
+                    selected.append(row)
+        else:
+            selected = list(stream())
+        return selected, matched, errors
+
+    missing = float("inf") if ascending else float("-inf")
+
+    def key(row: Sequence[Any]) -> float:
+        cell = row[sort_index]
+        return missing if cell is None or cell == "" else to_number(cell)
+
+    if top_n:
+        pick = heapq.nsmallest if ascending else heapq.nlargest
+        selected = pick(top_n, stream(), key=key)
+    else:
+        selected = sorted(stream(), key=key, reverse=not ascending)
+    return selected, matched, errors
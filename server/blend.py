@@ -0,0 +1,250 @@
+# server/blend.py
+import re
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pitagoras.batching import normalize_column
+from .analysis import format_number, markdown_table, to_number
+
+# Columnas de cada plataforma que intervienen en la combinación
+CAMPAIGN_COLUMNS = {
+    "google_ads": ("campaign.name",),
+    "facebook_ads": ("campaign_name",),
+    "google_analytics": ("sessionCampaignName",),
+}
+DATE_COLUMNS = {
+    "google_ads": ("segments.date",),
+    "facebook_ads": ("date_start",),
+    "google_analytics": ("date",),
+}
+SPEND_COLUMNS = {"google_ads": ("cost_micros", "cost"), "facebook_ads": ("spend",)}
+CLICK_COLUMNS = ("clicks", "inline_link_clicks")
+SESSION_COLUMNS = ("sessions",)
+REVENUE_COLUMNS = ("totalrevenue", "purchaserevenue")
+
+BLEND_HEADERS = ["Fecha", "Campaña", "Plataforma", "Inversión", "Clics", "Sesiones", "Ingresos", "ROAS"]
+
+NORMALIZATION_RULES = ("prefix", "lowercase", "accents", "separators")
+
+_SEPARATORS = re.compile(r"[\s_\-.|/:]+")
+
+
+def _strip_accents(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def campaign_normalizer(rules: Sequence[str], prefixes: Sequence[str]) -> Callable[[str], str]:
+    """Build the function that turns a campaign name into its join key.
+
+    Rules are applied in this order, whatever order they are given in:
+
+    - ``prefix``: drop a leading platform prefix (``aw_``, ``fb_``)
+    - ``lowercase``: ignore case
+    - ``accents``: ignore accents (``"Promoción"`` = ``"promocion"``)
+    - ``separators``: treat runs of spaces, ``_``, ``-``, ``.``, ``|``, ``/``
+      and ``:`` as a single space
+
+    Raises:
+        ValueError: If a rule is unknown
+    """
+    unknown = set(rules) - set(NORMALIZATION_RULES)
+    if unknown:
+        raise ValueError(
+            f"Reglas de normalización desconocidas: {', '.join(sorted(unknown))}. "
+            f"Opciones: {', '.join(NORMALIZATION_RULES)}"
+        )
+    folded_prefixes = [p.lower() for p in prefixes if p]
+
+    def normalize(name: Any) -> str:
+        text = "" if name is None else str(name).strip()
+        if "prefix" in rules:
+            lowered = text.lower()
+            for prefix in folded_prefixes:
+                if lowered.startswith(prefix):
+                    text = text[len(prefix):]
+                    break
+        if "lowercase" in rules:
+            text = text.lower()
+        if "accents" in rules:
+            text = _strip_accents(text)
+        if "separators" in rules:
+            text = _SEPARATORS.sub(" ", text).strip()
+        return text
+
+    return normalize
+
+
+def normalize_date(value: Any) -> str:
+    """ISO date of a report cell (GA4 returns ``YYYYMMDD``)."""
+    text = str(value or "").strip()
+    if len(text) == 8 and text.isdigit():
+        return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    return text[:10]
+
+
+def _find(headers: Sequence[str], names: Sequence[str]) -> Optional[int]:
+    positions = {normalize_column(str(h)): i for i, h in enumerate(headers)}
+    for name in names:
+        i = positions.get(normalize_column(name))
+        if i is not None:
+            return i
+    return None
+
+
+def _value(row: Sequence[Any], i: Optional[int]) -> float:
+    return to_number(row[i]) if i is not None else 0.0
+
+
+# (fecha, clave de campaña) -> [nombre original, valor, valor]
+Totals = Dict[Tuple[str, str], List[Any]]
+
+
+def ad_totals(platform: str, data: Dict[str, Any], normalize: Callable[[str], str], per_date: bool) -> Totals:
+    """Spend and clicks of an ads report summed per date and campaign key."""
+    headers = data.get("headers") or []
+    name_i = _find(headers, CAMPAIGN_COLUMNS[platform])
+    if name_i is None:
+        return {}
+    date_i = _find(headers, DATE_COLUMNS[platform])
+    spend_i = _find(headers, SPEND_COLUMNS[platform])
+    clicks_i = _find(headers, CLICK_COLUMNS)
+    totals: Totals = {}
+    for row in data.get("rows") or []:
+        day = normalize_date(row[date_i]) if per_date and date_i is not None else ""
+        key = (day, normalize(row[name_i]))
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = [str(row[name_i]), 0.0, 0.0]
+        entry[1] += _value(row, spend_i)
+        entry[2] += _value(row, clicks_i)
+    return totals
+
+
+def analytics_totals(
+    data: Dict[str, Any],
+    normalize: Callable[[str], str],
+    per_date: bool,
+    prefixes: Dict[str, str],
+) -> Dict[Tuple[str, str, Optional[str]], List[Any]]:
+    """GA4 sessions and revenue summed per date, campaign key and platform.
+
+    The platform comes from the campaign prefix (``aw_`` → Google Ads,
+    ``fb_`` → Facebook Ads); campaigns without a known prefix get ``None``
+    and may match either platform.
+    """
+    headers = data.get("headers") or []
+    name_i = _find(headers, CAMPAIGN_COLUMNS["google_analytics"])
+    if name_i is None:
+        return {}
+    date_i = _find(headers, DATE_COLUMNS["google_analytics"])
+    sessions_i = _find(headers, SESSION_COLUMNS)
+    revenue_i = _find(headers, REVENUE_COLUMNS)
+    totals: Dict[Tuple[str, str, Optional[str]], List[Any]] = {}
+    for row in data.get("rows") or []:
+        name = str(row[name_i])
+        lowered = name.lower()
+        platform = next((p for prefix, p in prefixes.items() if prefix and lowered.startswith(prefix.lower())), None)
+        day = normalize_date(row[date_i]) if per_date and date_i is not None else ""
+        key = (day, normalize(name), platform)
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = [name, 0.0, 0.0]
+        entry[1] += _value(row, sessions_i)
+        entry[2] += _value(row, revenue_i)
+    return totals
+
+
+def blend_reports(
+    ads: Dict[str, Dict[str, Any]],
+    analytics: Dict[str, Any],
+    normalize: Callable[[str], str],
+    prefixes: Dict[str, str],
+    labels: Dict[str, str],
+    per_date: bool = True,
+) -> Tuple[List[List[Any]], Dict[str, Any]]:
+    """Hash join GA4 campaigns with the campaigns of each ads platform.
+
+    Each ads platform is aggregated into a hash table keyed by (date,
+    normalized campaign); GA4 rows are aggregated the same way and probed
+    against the table of their prefix's platform (or any platform when the
+    campaign has no known prefix). Unmatched ads campaigns keep their spend
+    with no sessions; unmatched prefixed GA4 campaigns keep their sessions
+    with no spend.
+
+    Args:
+        ads: Reports per platform (``"google_ads"``, ``"facebook_ads"``)
+        analytics: GA4 report with ``sessionCampaignName``
+        normalize: Campaign key function (see ``campaign_normalizer``)
+        prefixes: Campaign prefix per platform, e.g. ``{"aw_": "google_ads"}``
+        labels: Display name per platform
+        per_date: Join per date (``False`` sums the whole period)
+
+    Returns:
+        Blended rows (see ``BLEND_HEADERS``) and a summary with totals and
+        match counts.
+    """
+    ad_tables = {platform: ad_totals(platform, data, normalize, per_date) for platform, data in ads.items()}
+    ga = analytics_totals(analytics, normalize, per_date, prefixes)
+
+    matched: Dict[Tuple[str, str, str], List[float]] = {}
+    unmatched_sessions = 0.0
+    ga_only: List[List[Any]] = []
+    for (day, key, platform), (name, sessions, revenue) in ga.items():
+        candidates = [platform] if platform else list(ad_tables)
+        target = next((p for p in candidates if (day, key) in ad_tables.get(p, {})), None)
+        if target is not None:
+            values = matched.setdefault((target, day, key), [0.0, 0.0])
+            values[0] += sessions
+            values[1] += revenue
+        elif platform is not None:
+            ga_only.append([day, name, labels.get(platform, platform), 0.0, 0.0, sessions, revenue])
+        else:
+            unmatched_sessions += sessions
+
+    rows: List[List[Any]] = []
+    matches = 0
+    for platform, table in ad_tables.items():
+        for (day, key), (name, spend, clicks) in table.items():
+            sessions, revenue = matched.get((platform, day, key), (0.0, 0.0))
+            if (platform, day, key) in matched:
+                matches += 1
+            rows.append([day, name, labels.get(platform, platform), spend, clicks, sessions, revenue])
+    rows.extend(ga_only)
+
+    for row in rows:
+        row.append(row[6] / row[3] if row[3] else None)
+    rows.sort(key=lambda r: (r[0], -r[3], r[1]))
+
+    summary = {
+        "spend": sum(r[3] for r in rows),
+        "clicks": sum(r[4] for r in rows),
+        "sessions": sum(r[5] for r in rows),
+        "revenue": sum(r[6] for r in rows),
+        "matches": matches,
+        "ad_campaigns": sum(len(t) for t in ad_tables.values()),
+        "ga_only": len(ga_only),
+        "unmatched_sessions": unmatched_sessions,
+    }
+    summary["roas"] = summary["revenue"] / summary["spend"] if summary["spend"] else None
+    return rows, summary
+
+
+def _format_blend_row(row: Sequence[Any], per_date: bool) -> List[str]:
+    day, name, platform, spend, clicks, sessions, revenue, roas = row
+    cells = [
+        str(name),
+        str(platform),
+        format_number(spend),
+        format_number(clicks),
+        format_number(sessions),
+        format_number(revenue),
+        f"{roas:.2f}" if roas is not None else "—",
+    ]
+    return [day] + cells if per_date else cells
+
+
+def blend_table(rows: List[List[Any]], per_date: bool = True) -> List[str]:
+    """Markdown table lines of the blended rows."""
+    headers = BLEND_HEADERS if per_date else BLEND_HEADERS[1:]
+    return markdown_table(headers, [_format_blend_row(row, per_date) for row in rows])
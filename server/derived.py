@@ -0,0 +1,177 @@
+# server/derived.py
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pitagoras.batching import normalize_column
+from .analysis import to_number
+
+# Columnas de cada plataforma que corresponden a cada métrica canónica.
+# El primer nombre de cada lista es el que se solicita a la API si falta.
+CANONICAL_COLUMNS: Dict[str, Dict[str, List[str]]] = {
+    "google_ads": {
+        "cost": ["metrics.cost_micros", "metrics.cost"],
+        "impressions": ["metrics.impressions"],
+        "clicks": ["metrics.clicks"],
+        "conversions": ["metrics.conversions", "metrics.all_conversions"],
+        "revenue": ["metrics.conversions_value", "metrics.all_conversions_value"],
+    },
+    "facebook_ads": {
+        "cost": ["spend"],
+        "impressions": ["impressions"],
+        "clicks": ["clicks", "inline_link_clicks"],
+        "conversions": ["actions:purchase"],
+        "revenue": ["action_values:purchase"],
+    },
+    "google_analytics": {
+        "cost": ["advertiserAdCost"],
+        "impressions": ["advertiserAdImpressions"],
+        "clicks": ["advertiserAdClicks"],
+        "conversions": ["transactions", "conversions", "keyEvents"],
+        "revenue": ["totalRevenue", "purchaseRevenue"],
+        "sessions": ["sessions"],
+    },
+}
+
+# Columnas que se solicitan a la API cuando no coinciden con la primera de CANONICAL_COLUMNS
+REQUESTED_COLUMNS: Dict[str, Dict[str, str]] = {
+    "facebook_ads": {"conversions": "actions", "revenue": "action_values"},
+}
+
+# Facebook devuelve conversiones e ingresos como listas de acciones por tipo:
+# columna de la API -> columna numérica de compras que se agrega al reporte
+ACTION_COLUMNS = {"actions": "actions:purchase", "action_values": "action_values:purchase"}
+# Tipos de acción que cuentan como compra, por preferencia (se usa uno solo para no duplicar)
+PURCHASE_ACTION_TYPES = ("omni_purchase", "purchase", "offsite_conversion.fb_pixel_purchase")
+
+# nombre: (numerador, denominadores posibles, escala)
+DERIVED_METRICS: Dict[str, Tuple[str, Tuple[str, ...], float]] = {
+    "ctr": ("clicks", ("impressions",), 100.0),
+    "cpc": ("cost", ("clicks",), 1.0),
+    "cpm": ("cost", ("impressions",), 1000.0),
+    "cpa": ("cost", ("conversions",), 1.0),
+    "roas": ("revenue", ("cost",), 1.0),
+    "conversion_rate": ("conversions", ("sessions", "clicks"), 100.0),
+}
+
+
+def action_value(cell: Any, action_types: Sequence[str] = PURCHASE_ACTION_TYPES) -> float:
+    """Value of the first of ``action_types`` present in a Facebook actions list.
+
+    The list may come decoded or as a JSON string; anything else counts as 0.
+    """
+    if isinstance(cell, str):
+        try:
+            cell = json.loads(cell)
+        except ValueError:
+            return 0.0
+    if not isinstance(cell, list):
+        return 0.0
+    values = {str(a.get("action_type")): a.get("value") for a in cell if isinstance(a, dict)}
+    for action_type in action_types:
+        if action_type in values:
+            return to_number(values[action_type])
+    return 0.0
+
+
+def expand_action_columns(headers: List[str], rows: Sequence[Sequence[Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Append the purchase count and value of Facebook ``actions``/``action_values`` as numeric columns."""
+    positions = [(i, ACTION_COLUMNS[str(h)]) for i, h in enumerate(headers) if str(h) in ACTION_COLUMNS]
+    positions = [(i, name) for i, name in positions if name not in headers]
+    if not positions:
+        return list(headers), [list(row) for row in rows]
+    headers = list(headers) + [name for _, name in positions]
+    rows = [list(row) + [action_value(row[i]) for i, _ in positions] for row in rows]
+    return headers, rows
+
+
+def canonical_indexes(platform: str, headers: Sequence[str]) -> Dict[str, int]:
+    """Map canonical metric names to their position in ``headers``."""
+    positions = {normalize_column(str(h)): i for i, h in enumerate(headers)}
+    found = {}
+    for canonical, names in CANONICAL_COLUMNS.get(platform, {}).items():
+        for name in names:
+            index = positions.get(normalize_column(name))
+            if index is not None:
+                found[canonical] = index
+                break
+    return found
+
+
+def _denominator(options: Tuple[str, ...], available) -> Optional[str]:
+    for option in options:
+        if option in available:
+            return option
+    return None
+
+
+def required_metrics(platform: str, derived: List[str]) -> List[str]:
+    """Platform metric names that must be requested to compute ``derived``."""
+    columns = CANONICAL_COLUMNS.get(platform, {})
+    requested = REQUESTED_COLUMNS.get(platform, {})
+    needed: List[str] = []
+    for name in derived:
+        spec = DERIVED_METRICS.get(name.lower())
+        if not spec:
+            continue
+        numerator, denominators, _ = spec
+        denominator = _denominator(denominators, columns)
+        for canonical in (numerator, denominator):
+            if canonical not in columns:
+                continue
+            column = requested.get(canonical, columns[canonical][0])
+            if column not in needed:
+                needed.append(column)
+    return needed
+
+
+def safe_ratio(numerators: List[float], denominators: List[float], scale: float = 1.0) -> List[Optional[float]]:
+    """Element-wise ``numerator / denominator * scale``; ``None`` where the denominator is 0."""
+    return [
+        round(n / d * scale, 4) if d else None
+        for n, d in zip(numerators, denominators)
+    ]
+
+
+def add_derived_metrics(
+    platform: str, headers: List[str], rows: Sequence[Sequence[Any]], derived: List[str]
+) -> Tuple[List[str], List[List[Any]], List[str]]:
+    """Append ratio metrics (CTR, CPC, CPM, CPA, ROAS, conversion rate) to a report.
+
+    Base columns are mapped to canonical names, extracted once as numeric
+    vectors and each derived metric is computed in a single pass over them.
+    Applied after aggregation this yields ratios of sums.
+
+    Returns:
+        ``(headers, rows, errors)`` where ``errors`` lists the metrics that
+        couldn't be computed because a base column is missing.
+    """
+    indexes = canonical_indexes(platform, headers)
+    rows = [list(row) for row in rows]
+    vectors: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    headers = list(headers)
+
+    for name in derived:
+        key = name.lower()
+        spec = DERIVED_METRICS.get(key)
+        if not spec:
+            errors.append(f"`{name}` no es una métrica derivada soportada ({', '.join(DERIVED_METRICS)})")
+            continue
+        numerator, denominators, scale = spec
+        denominator = _denominator(denominators, indexes)
+        missing = [c for c in (numerator, denominator or denominators[0]) if c not in indexes]
+        if missing:
+            errors.append(f"`{key}` requiere las columnas: {', '.join(missing)}")
+            continue
+
+        for canonical in (numerator, denominator):
+            if canonical not in vectors:
+                i = indexes[canonical]
+                vectors[canonical] = [to_number(row[i]) for row in rows]
+
+        values = safe_ratio(vectors[numerator], vectors[denominator], scale)
+        headers.append(key)
+        for row, value in zip(rows, values):
+            row.append(value)
+
+    return headers, rows, errors
@@ -0,0 +1,206 @@
+# server/export.py
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pitagoras import codec
+from pitagoras.config import EXPORT_DIR
+
+logger = logging.getLogger("pitagoras.export")
+
+# Formatos soportados y su extensión de archivo
+EXPORT_FORMATS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+_INT_RE = re.compile(r"^-?(0|[1-9]\d*)$")
+_FLOAT_RE = re.compile(r"^-?(0|[1-9]\d*)?\.\d+$")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _require_pyarrow():
+    """Import pyarrow lazily so the server works without it installed."""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "La exportación a Parquet/Arrow requiere el paquete 'pyarrow'. "
+            "Instálalo con: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def _infer_type(values: List[Any]) -> str:
+    """Infer a column type from its values.
+
+    Returns one of ``"bool"``, ``"int"``, ``"float"``, ``"date"`` or ``"string"``.
+    Numeric strings are promoted to numbers unless they carry leading zeros,
+    so identifiers such as ``"00123"`` keep their original form.
+    """
+    kind = None
+    for value in values:
+        if value is None or value == "":
+            continue
+        if isinstance(value, bool):
+            current = "bool"
+        elif isinstance(value, int):
+            current = "int"
+        elif isinstance(value, float):
+            current = "float"
+        elif isinstance(value, str) and _INT_RE.match(value):
+            current = "int"
+        elif isinstance(value, str) and _FLOAT_RE.match(value):
+            current = "float"
+        elif isinstance(value, str) and _DATE_RE.match(value):
+            current = "date"
+        else:
+            return "string"
+
+        if kind is None or kind == current:
+            kind = current
+        elif {kind, current} == {"int", "float"}:
+            kind = "float"
+        else:
+            return "string"
+    return kind or "string"
+
+
+def _convert(value: Any, kind: str) -> Any:
+    """Convert a single cell to the Python type matching ``kind``."""
+    if value is None or value == "":
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "date":
+        return value if isinstance(value, date) else datetime.strptime(value, "%Y-%m-%d").date()
+    if kind == "string":
+        if isinstance(value, (list, dict)):
+            # Listas anidadas (p. ej. las acciones de Facebook) como JSON, para poder leerlas de vuelta
+            return codec.dumps(value).decode("utf-8")
+        return str(value)
+    return value
+
+
+def _arrow_types(pa) -> Dict[str, Any]:
+    """Map inferred column kinds to Arrow types."""
+    return {
+        "bool": pa.bool_(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "date": pa.date32(),
+        "string": pa.string(),
+    }
+
+
+def infer_column_types(headers: List[str], rows: Iterable[List[Any]]) -> List[str]:
+    """Infer the type of every column over all ``rows``."""
+    rows = rows if isinstance(rows, list) else list(rows)
+    return [
+        _infer_type([row[i] if i < len(row) else None for row in rows])
+        for i, _ in enumerate(headers)
+    ]
+
+
+def build_schema(headers: List[str], kinds: List[str]):
+    """Build a ``pyarrow.Schema`` from column names and inferred types."""
+    pa = _require_pyarrow()
+    types = _arrow_types(pa)
+    return pa.schema([(name, types[kind]) for name, kind in zip(headers, kinds)])
+
+
+def rows_to_batch(schema, kinds: List[str], rows: List[List[Any]]):
+    """Convert a chunk of rows to a ``pyarrow.RecordBatch`` matching ``schema``."""
+    pa = _require_pyarrow()
+    columns = []
+    for i, (field, kind) in enumerate(zip(schema, kinds)):
+        values = [_convert(row[i] if i < len(row) else None, kind) for row in rows]
+        columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def rows_to_table(headers: List[str], rows: List[List[Any]]):
+    """Build a typed ``pyarrow.Table`` from report headers and rows."""
+    pa = _require_pyarrow()
+    if hasattr(rows, "to_arrow"):
+        # Filas ya volcadas a disco: se reutiliza la tabla mapeada sin copiarla
+        return rows.to_arrow()
+
+    kinds = infer_column_types(headers, rows)
+    schema = build_schema(headers, kinds)
+    return pa.Table.from_batches([rows_to_batch(schema, kinds, rows)], schema=schema)
+
+
+def _safe_filename(*parts: str) -> str:
+    """Join ``parts`` into a filesystem friendly base name."""
+    name = "_".join(p for p in parts if p)
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", name)
+
+
+def export_report(
+    headers: List[str],
+    rows: List[List[Any]],
+    export_format: str,
+    name: str,
+    export_dir: Optional[str] = None,
+) -> str:
+    """Write report rows to a local Parquet or Arrow IPC file.
+
+    Args:
+        headers: Column names returned by the API
+        rows: Report rows
+        export_format: ``"parquet"`` or ``"arrow"``
+        name: Base name for the output file (platform, customer, dates...)
+        export_dir: Optional directory, defaults to ``EXPORT_DIR``
+
+    Returns:
+        Markdown summary with the file path, size and column types.
+    """
+    fmt = export_format.lower().strip()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Formato de exportación no soportado: {export_format}. "
+            f"Opciones válidas: {', '.join(EXPORT_FORMATS)}"
+        )
+
+    pa = _require_pyarrow()
+    table = rows_to_table(headers, rows)
+
+    target_dir = export_dir or EXPORT_DIR
+    os.makedirs(target_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    path = os.path.abspath(
+        os.path.join(target_dir, _safe_filename(name, timestamp) + EXPORT_FORMATS[fmt])
+    )
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path, compression="zstd")
+    else:
+        import pyarrow.ipc as ipc
+
+        options = ipc.IpcWriteOptions(compression="zstd")
+        with pa.OSFile(path, "wb") as sink:
+            with ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+    size_kb = os.path.getsize(path) / 1024
+    logger.info(f"Exported {table.num_rows} rows to {path} ({size_kb:.1f} KB)")
+
+    result = [f"# Exportación completada ({fmt})"]
+    result.append(f"**Archivo:** `{path}`")
+    result.append(f"**Filas:** {table.num_rows} | **Columnas:** {table.num_columns} | **Tamaño:** {size_kb:.1f} KB")
+    result.append("")
+    result.append("| Columna | Tipo |")
+    result.append("| --- | --- |")
+    for field in table.schema:
+        result.append(f"| {field.name} | {field.type} |")
+    result.append("")
+    reader = "read_parquet" if fmt == "parquet" else "read_feather"
+    result.append(f"Cargar en pandas: `pd.{reader}(r'{path}')`")
+    return "\n".join(result)
@@ -0,0 +1,176 @@
+# server/memory.py
+import logging
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional
+
+from pitagoras.config import MEMORY_TRACING, MEMORY_TRACE_TOP, MEMORY_TRACE_HISTORY
+
+logger = logging.getLogger("pitagoras.memory")
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def format_bytes(size: float) -> str:
+    """Human readable byte count (signed)."""
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{sign}{size:.0f} {unit}" if unit == "B" else f"{sign}{size:.1f} {unit}"
+        size /= 1024
+    return f"{sign}{size:.2f} GiB"
+
+
+@dataclass(slots=True)
+class CallMemory:
+    """Memory accounting of one tool call."""
+
+    tool: str
+    started: float
+    seconds: float
+    peak: int
+    retained: int
+    shared: bool
+    sites: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ToolMemory:
+    """Memory accounting accumulated per tool."""
+
+    calls: int = 0
+    max_peak: int = 0
+    retained: int = 0
+
+
+class MemoryTracker:
+    """Accounts peak and retained memory of tool calls with tracemalloc.
+
+    ``peak`` is the highest traced memory during the call above what was
+    traced when it started; ``retained`` is what was still allocated when
+    it returned (data kept in caches, logs or leaked references). The top
+    allocation sites are the lines whose allocations grew the most; they
+    need two full snapshots per call, so they are only listed when ``top``
+    is set. When calls overlap they share tracemalloc's single peak
+    counter and each one's retained memory includes what the others still
+    hold, so both figures are upper bounds (flagged as shared).
+
+    Args:
+        enabled: Whether tracing is on at all
+        top: Allocation sites kept per call (0 skips the snapshots)
+        history: Calls kept for the resource
+    """
+
+    def __init__(self, enabled: bool, top: int, history: int):
+        self.enabled = enabled
+        self.top = top
+        self.calls: Deque[CallMemory] = deque(maxlen=max(1, history))
+        self.tools: Dict[str, ToolMemory] = {}
+        self._active = 0
+        self._starts = 0
+
+    def start(self) -> None:
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            logger.info("Memory tracing started")
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _snapshot(self) -> Optional[tracemalloc.Snapshot]:
+        if not self.top:
+            return None
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    @contextmanager
+    def record(self, tool_name: str) -> Iterator[None]:
+        """Account the memory of the enclosed work as a call to ``tool_name``."""
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        shared = self._active > 0
+        if not shared:
+            tracemalloc.reset_peak()
+        self._active += 1
+        self._starts += 1
+        starts = self._starts
+        before = self._snapshot()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.time()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            # También compartida si otra llamada empezó mientras esta corría
+            shared = shared or self._starts != starts
+            current, peak = tracemalloc.get_traced_memory()
+            sites: List[str] = []
+            if before is not None:
+                after = self._snapshot()
+                for stat in after.compare_to(before, "lineno")[: self.top]:
+                    if stat.size_diff <= 0:
+                        break
+                    frame = stat.traceback[0]
+                    sites.append(
+                        f"{frame.filename}:{frame.lineno} {format_bytes(stat.size_diff)} "
+                        f"({stat.count_diff:+d} blocks)"
+                    )
+            call = CallMemory(
+                tool=tool_name,
+                started=started,
+                seconds=time.time() - started,
+                peak=max(0, peak - baseline),
+                retained=current - baseline,
+                shared=shared,
+                sites=sites,
+            )
+            self.calls.append(call)
+            totals = self.tools.setdefault(tool_name, ToolMemory())
+            totals.calls += 1
+            totals.max_peak = max(totals.max_peak, call.peak)
+            totals.retained += call.retained
+            logger.info(
+                f"{tool_name}: peak {format_bytes(call.peak)}, retained {format_bytes(call.retained)}"
+            )
+
+    def report(self, last: int = 10) -> str:
+        """Markdown summary of traced memory, per-tool totals and the latest calls."""
+        if not tracemalloc.is_tracing():
+            return "Memory tracing is off. Set MEMORY_TRACING=true to account memory per tool call."
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ["# Memory accounting"]
+        lines.append(f"- Traced now: {format_bytes(current)}")
+        lines.append(f"- Traced peak since the last reset: {format_bytes(peak)}")
+        lines.append(f"- Tracing overhead: {format_bytes(tracemalloc.get_tracemalloc_memory())}")
+        lines.append("")
+        lines.append("## Per tool")
+        lines.append("| Tool | Calls | Max peak | Total retained |")
+        lines.append("| --- | --- | --- | --- |")
+        for name, totals in sorted(self.tools.items(), key=lambda item: item[1].retained, reverse=True):
+            lines.append(
+                f"| {name} | {totals.calls} | {format_bytes(totals.max_peak)} | {format_bytes(totals.retained)} |"
+            )
+        lines.append("")
+        lines.append(f"## Latest {min(last, len(self.calls))} calls")
+        for call in reversed(list(self.calls)[-last:]):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(call.started))
+            note = " (overlapping calls, upper bound)" if call.shared else ""
+            lines.append(
+                f"- {when} {call.tool}: {call.seconds:.2f} s, peak {format_bytes(call.peak)}{note}, "
+                f"retained {format_bytes(call.retained)}{note}"
+            )
+            lines.extend(f"  - {site}" for site in call.sites)
+        return "\n".join(lines)
+
+
+memory_tracker = MemoryTracker(MEMORY_TRACING, MEMORY_TRACE_TOP, MEMORY_TRACE_HISTORY)
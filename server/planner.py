@@ -0,0 +1,248 @@
+# server/planner.py
+import asyncio
+import difflib
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pitagoras.api import (
+    get_analytics4_metadata,
+    get_facebook_schema,
+    get_adwords_metrics,
+    get_adwords_segments,
+)
+from pitagoras.config import METADATA_CACHE_TTL
+
+logger = logging.getLogger("pitagoras.planner")
+
+# Columnas con alcance (customEvent:, customUser:, ...): dependen de cada propiedad de GA4
+_SCOPED_COLUMN = re.compile(r"^\w+:\S")
+
+
+@dataclass
+class QueryPlan:
+    """Validated and normalized columns for a report request."""
+    columns: Dict[str, List[str]] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def error_message(self) -> str:
+        """Format the validation errors for the model."""
+        result = ["# Solicitud inválida", "Se detectaron columnas no disponibles antes de consultar la API:"]
+        result.extend(f"- {e}" for e in self.errors)
+        return "\n".join(result)
+
+
+class _Catalog:
+    """Case-insensitive lookup of valid column names."""
+
+    def __init__(self, names: List[str], strip_prefix: str = ""):
+        self.strip_prefix = strip_prefix
+        self.names = list(dict.fromkeys(n for n in names if n))
+        self.by_key = {self.key(n): n for n in self.names}
+
+    def key(self, name: str) -> str:
+        name = name.strip().lower()
+        if self.strip_prefix and name.startswith(self.strip_prefix):
+            name = name[len(self.strip_prefix):]
+        return name
+
+    def resolve(self, name: str) -> Optional[str]:
+        return self.by_key.get(self.key(name))
+
+    def suggest(self, name: str) -> List[str]:
+        keys = difflib.get_close_matches(self.key(name), list(self.by_key), n=3, cutoff=0.6)
+        return [self.by_key[k] for k in keys]
+
+
+def _names(items: Any, key: str) -> List[str]:
+    """Extract column names from a metadata payload (strings or dicts)."""
+    names = []
+    for item in items or []:
+        if isinstance(item, dict):
+            value = item.get(key) or item.get("name") or item.get("value")
+        else:
+            value = item
+        if value:
+            names.append(str(value))
+    return names
+
+
+def _with_prefix(name: str, prefix: str) -> str:
+    return name if name.startswith(prefix) else f"{prefix}{name}"
+
+
+class QueryPlanner:
+    """Validate report columns locally against cached platform metadata.
+
+    Metadata from ``get_analytics4_metadata``, ``get_facebook_schema`` and
+    ``get_adwords_metrics``/``get_adwords_segments`` is cached for
+    ``METADATA_CACHE_TTL`` seconds. Requested names are deduplicated, matched
+    case-insensitively and rejected with close-match suggestions when unknown.
+    If the metadata can't be loaded the request is passed through unchanged.
+    """
+
+    def __init__(self, ttl: float = METADATA_CACHE_TTL):
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _cached(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            try:
+                value = await loader()
+            except Exception as e:
+                logger.warning(f"Couldn't load metadata '{key}', skipping validation: {str(e)}")
+                return None
+            self._cache[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    async def _analytics_property_catalogs(
+        self, property_id: str, credential_email: Optional[str]
+    ) -> Optional[Tuple[_Catalog, _Catalog]]:
+        async def load():
+            if credential_email:
+                metadata = await get_analytics4_metadata(property_id, credential_email)
+            else:
+                metadata = await get_analytics4_metadata(property_id)
+            return (
+                _Catalog(_names(metadata.get("dimensions"), "value")),
+                _Catalog(_names(metadata.get("metrics"), "value")),
+            )
+        return await self._cached(f"analytics4:{property_id}", load)
+
+    async def google_analytics_catalogs(
+        self, accounts: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Tuple[_Catalog, _Catalog]]:
+        """Dimension and metric catalogs of the selected GA4 properties.
+
+        Custom dimensions and metrics are defined per property, so each
+        property's metadata is loaded (and cached) and the catalogs of all
+        selected properties are merged. Without properties the generic
+        metadata is used.
+        """
+        properties = sorted(
+            {(str(a["property_id"]), a.get("credential_email")) for a in accounts or [] if a.get("property_id")},
+            key=str,
+        ) or [("0", None)]
+        loaded = await asyncio.gather(*(self._analytics_property_catalogs(p, e) for p, e in properties))
+        if any(catalogs is None for catalogs in loaded):
+            return None
+        if len(loaded) == 1:
+            return loaded[0]
+        return (
+            _Catalog([name for dimensions, _ in loaded for name in dimensions.names]),
+            _Catalog([name for _, metrics in loaded for name in metrics.names]),
+        )
+
+    async def facebook_catalog(self) -> Optional[_Catalog]:
+        async def load():
+            schema = await get_facebook_schema()
+            return _Catalog(_names(schema.get("fields"), "name"))
+        return await self._cached("facebook", load)
+
+    async def google_ads_catalogs(self, resource: str) -> Optional[Tuple[_Catalog, _Catalog]]:
+        async def load():
+            metrics, segments = await asyncio.gather(
+                get_adwords_metrics(resource), get_adwords_segments(resource)
+            )
+            return (
+                _Catalog(_names(metrics, "name"), strip_prefix="metrics."),
+                _Catalog(_names(segments, "name"), strip_prefix="segments."),
+            )
+        return await self._cached(f"adwords:{resource}", load)
+
+    @staticmethod
+    def _validate(
+        plan: QueryPlan,
+        kind: str,
+        label: str,
+        names: List[str],
+        catalog: Optional[_Catalog],
+        passthrough: Optional[re.Pattern] = None,
+    ) -> List[str]:
+        if catalog is not None and not catalog.names:
+            # Catálogo vacío: no hay información suficiente para rechazar columnas
+            catalog = None
+        resolved: List[str] = []
+        for name in names:
+            canonical = catalog.resolve(name) if catalog else name.strip()
+            if canonical is None and passthrough is not None and passthrough.match(name.strip()):
+                # El catálogo no cubre esta columna: se deja que la API la valide
+                canonical = name.strip()
+            if canonical is None:
+                suggestions = catalog.suggest(name)
+                hint = f" ¿Quisiste decir: {', '.join(suggestions)}?" if suggestions else ""
+                plan.errors.append(f"{label} `{name}` no existe.{hint}")
+                continue
+            if canonical in resolved:
+                plan.notes.append(f"Columna `{name}` repetida, se omitió")
+                logger.info(plan.notes[-1])
+                continue
+            resolved.append(canonical)
+        plan.columns[kind] = resolved
+        return resolved
+
+    async def plan_google_ads(
+        self, metrics: List[str], segments: Optional[List[str]] = None, resource: str = "campaign"
+    ) -> QueryPlan:
+        """Validate Google Ads metrics and segments for ``resource``.
+
+        Segments passed as metrics (``segments.device``) are moved to the
+        segments list and every metric gets a single ``metrics.`` prefix.
+        """
+        plan = QueryPlan()
+        segments = list(segments or [])
+        metric_names = []
+        for name in metrics:
+            if name.strip().lower().startswith("segments."):
+                segments.append(name)
+            else:
+                metric_names.append(name)
+
+        catalogs = await self.google_ads_catalogs(resource)
+        metric_catalog, segment_catalog = catalogs or (None, None)
+        resolved = self._validate(plan, "metrics", "Métrica", metric_names, metric_catalog)
+        plan.columns["metrics"] = list(dict.fromkeys(_with_prefix(m, "metrics.") for m in resolved))
+        resolved = self._validate(plan, "segments", "Segmento", segments, segment_catalog)
+        plan.columns["segments"] = list(dict.fromkeys(_with_prefix(s, "segments.") for s in resolved))
+        return plan
+
+    async def plan_facebook(self, fields: List[str]) -> QueryPlan:
+        """Validate Facebook Ads fields against the schema."""
+        plan = QueryPlan()
+        self._validate(plan, "fields", "Campo", fields, await self.facebook_catalog())
+        return plan
+
+    async def plan_google_analytics(
+        self, dimensions: List[str], metrics: List[str], accounts: Optional[List[Dict[str, Any]]] = None
+    ) -> QueryPlan:
+        """Validate GA4 dimensions and metrics against the metadata of the selected properties.
+
+        Without ``accounts`` only the generic metadata is available, so
+        property-scoped columns (``customEvent:...``) are passed through.
+        """
+        plan = QueryPlan()
+        catalogs = await self.google_analytics_catalogs(accounts)
+        dimension_catalog, metric_catalog = catalogs or (None, None)
+        scoped = None if any(a.get("property_id") for a in accounts or []) else _SCOPED_COLUMN
+        self._validate(plan, "dimensions", "Dimensión", dimensions, dimension_catalog, scoped)
+        self._validate(plan, "metrics", "Métrica", metrics, metric_catalog, scoped)
+        return plan
+
+
+planner = QueryPlanner()
@@ -0,0 +1,113 @@
+# server/portfolio.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pitagoras.config import PORTFOLIO_CONCURRENCY, PORTFOLIO_RATE_PER_SECOND
+from pitagoras.models import Customer
+from pitagoras.text import fold_text
+from .analysis import aggregate
+
+logger = logging.getLogger("pitagoras.portfolio")
+
+
+class RateLimiter:
+    """Token bucket limiting how often upstream requests may start.
+
+    Shared by every portfolio call so concurrent portfolio reports together
+    stay under ``rate`` requests per second (with bursts of ``burst``).
+
+    Args:
+        rate: Requests per second (0 disables the limit)
+        burst: Requests that may start back to back
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else int(rate) or 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+rate_limiter = RateLimiter(PORTFOLIO_RATE_PER_SECOND)
+
+# La API devuelve los estados en español ("Activo"); se aceptan también en inglés
+_STATUS_ALIASES = {
+    "active": "activo",
+    "activa": "activo",
+    "inactive": "inactivo",
+    "inactiva": "inactivo",
+}
+
+
+def normalize_status(status: str) -> str:
+    """Fold a customer status so ``"Activo"``, ``"activo"`` and ``"active"`` compare equal."""
+    folded = fold_text(status)
+    return _STATUS_ALIASES.get(folded, folded)
+
+
+def select_customers(
+    customers: List[Customer], status: Optional[str], matches: Optional[List[Customer]] = None
+) -> List[Customer]:
+    """Customers of the portfolio: the query matches (if any) with ``status``.
+
+    ``status`` ``None``, ``""`` or ``"all"`` keeps every status. Statuses
+    are compared ignoring case and accents, in English or Spanish.
+    """
+    selected = matches if matches is not None else customers
+    if status and status.lower() not in ("all", "todos"):
+        wanted = normalize_status(status)
+        selected = [c for c in selected if normalize_status(str(c.status)) == wanted]
+    return selected
+
+
+def summarize_report(data: Dict[str, Any], metric_idx: List[int]) -> List[float]:
+    """Sum the metric columns of a report over all its rows."""
+    totals = aggregate(data.get("rows") or [], [], metric_idx)
+    return next(iter(totals.values()), [0.0] * len(metric_idx))
+
+
+async def fetch_portfolio(
+    customers: List[Customer],
+    fetch: Callable[[Customer], Awaitable[Dict[str, Any]]],
+    concurrency: int = PORTFOLIO_CONCURRENCY,
+    limiter: RateLimiter = rate_limiter,
+) -> List[Tuple[Customer, Optional[Dict[str, Any]], Optional[str]]]:
+    """Fetch one report per customer, ``concurrency`` at a time and rate limited.
+
+    A failing customer doesn't abort the others: its error is returned in
+    place of the report.
+
+    Returns:
+        ``(customer, report, error)`` per customer, in the given order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(customer: Customer) -> Tuple[Customer, Optional[Dict[str, Any]], Optional[str]]:
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                data = await fetch(customer)
+            except Exception as e:
+                logger.info(f"Portfolio report for {customer.id} failed: {str(e)}")
+                return customer, None, (str(e).splitlines() or [type(e).__name__])[0]
+        if data.get("errors"):
+            return customer, None, str(data["errors"])
+        return customer, data, None
+
+    return await asyncio.gather(*(run(c) for c in customers))
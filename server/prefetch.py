@@ -0,0 +1,113 @@
+# server/prefetch.py
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from pitagoras.api import get_customers
+from pitagoras.deadline import detached_context
+from pitagoras.config import (
+    PREFETCH_ENABLED,
+    PREFETCH_BUDGET_SECONDS,
+    PREFETCH_MAX_REPORTS,
+    PREFETCH_DATE_RANGE,
+    REPORT_CACHE_TTL,
+)
+from .planner import planner
+from .reports import PLATFORM_LABELS, fetch_platform_report, find_customer, platform_accounts
+from .utils import parse_date_range
+
+logger = logging.getLogger("pitagoras.prefetch")
+
+
+class Prefetcher:
+    """Speculatively warms the caches once a customer is selected.
+
+    The prompt workflow makes the next calls predictable: after
+    ``select_medium`` comes an account listing and a report with the default
+    metrics. The prefetcher loads, in the background and within
+    ``budget_seconds``, the customers catalog, the metadata of the
+    customer's platforms and up to ``max_reports`` default reports for
+    ``date_range``, so the actual tool calls are served from cache.
+
+    Args:
+        enabled: Whether prefetching runs at all
+        budget_seconds: Maximum time spent warming one customer
+        max_reports: Maximum number of reports requested per customer
+        date_range: Range passed to ``parse_date_range`` (e.g. ``last30days``)
+    """
+
+    def __init__(self, enabled: bool, budget_seconds: float, max_reports: int, date_range: str):
+        self.enabled = enabled
+        self.budget_seconds = budget_seconds
+        self.max_reports = max_reports
+        self.date_range = date_range
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._warmed: Dict[str, float] = {}
+
+    def customer_selected(self, customer_id: str) -> None:
+        """Start warming ``customer_id`` unless it's disabled or recently warmed."""
+        if not self.enabled or not customer_id:
+            return
+        warmed_at = self._warmed.get(customer_id)
+        if warmed_at is not None and time.monotonic() - warmed_at < REPORT_CACHE_TTL:
+            return
+        if customer_id in self._tasks:
+            return
+        try:
+            # Sin el plazo ni el progreso de la herramienta que lo dispara: el precalentamiento la sobrevive
+            task = asyncio.get_running_loop().create_task(self._run(customer_id), context=detached_context())
+        except RuntimeError:
+            return
+        self._tasks[customer_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(customer_id, None))
+
+    def _mark_warmed(self, customer_id: str) -> None:
+        """Remember when ``customer_id`` was warmed, forgetting entries whose reports already expired."""
+        now = time.monotonic()
+        for stale in [c for c, at in self._warmed.items() if now - at >= REPORT_CACHE_TTL]:
+            del self._warmed[stale]
+        self._warmed[customer_id] = now
+
+    async def _run(self, customer_id: str) -> None:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._warm(customer_id), self.budget_seconds)
+            self._mark_warmed(customer_id)
+            logger.info(f"Prefetch for {customer_id} finished in {time.monotonic() - started:.1f}s")
+        except asyncio.TimeoutError:
+            logger.info(f"Prefetch for {customer_id} stopped after its {self.budget_seconds}s budget")
+        except Exception as e:
+            logger.warning(f"Prefetch for {customer_id} failed: {str(e)}")
+
+    async def _warm(self, customer_id: str) -> None:
+        customer = find_customer(await get_customers(), customer_id)
+        if customer is None:
+            return
+
+        platforms: List[str] = [p for p in PLATFORM_LABELS if platform_accounts(customer, p)]
+        metadata = {
+            "google_ads": lambda: planner.google_ads_catalogs("campaign"),
+            "facebook_ads": planner.facebook_catalog,
+            "google_analytics": lambda: planner.google_analytics_catalogs(
+                platform_accounts(customer, "google_analytics")
+            ),
+        }
+        start_date, end_date = parse_date_range(self.date_range)
+
+        jobs = [metadata[p]() for p in platforms]
+        jobs += [
+            fetch_platform_report(p, platform_accounts(customer, p), start_date, end_date)
+            for p in platforms[:self.max_reports]
+        ]
+        logger.info(
+            f"Prefetching {customer_id}: metadata and {min(len(platforms), self.max_reports)} "
+            f"default reports ({start_date} to {end_date}) for {', '.join(platforms) or 'no platforms'}"
+        )
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.info(f"Prefetch job for {customer_id} failed: {str(result)}")
+
+
+prefetcher = Prefetcher(PREFETCH_ENABLED, PREFETCH_BUDGET_SECONDS, PREFETCH_MAX_REPORTS, PREFETCH_DATE_RANGE)
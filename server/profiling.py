@@ -0,0 +1,99 @@
+# server/profiling.py
+import cProfile
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from pitagoras.config import PROFILE_DIR, PROFILE_TOP
+
+logger = logging.getLogger("pitagoras.profiling")
+
+
+def _function_label(key) -> str:
+    filename, line, name = key
+    if filename == "~":
+        # Funciones nativas, p. ej. {method 'poll' of 'select.epoll' objects}
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def summarize(stats: pstats.Stats, top: int) -> List[str]:
+    """Markdown table of the ``top`` functions by own time."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    lines = ["| Function | Calls | Own time (s) | Cumulative (s) |", "| --- | --- | --- | --- |"]
+    for key, (_, calls, own, cumulative, _) in rows:
+        lines.append(f"| {_function_label(key)} | {calls} | {own:.4f} | {cumulative:.4f} |")
+    return lines
+
+
+class ProfileStore:
+    """Profiles tool calls with cProfile and keeps a summary of the latest one.
+
+    cProfile is deterministic and profiles the event-loop thread, so the
+    profile of a call also includes whatever other sessions ran on the loop
+    meanwhile; time spent waiting for the API shows up in the selector's
+    ``poll``. Only one call is profiled at a time (the interpreter allows a
+    single active profiler); concurrent calls run unprofiled.
+
+    Args:
+        directory: Where the ``.prof`` files are written
+        top: Functions listed in the summary
+    """
+
+    def __init__(self, directory: str, top: int):
+        self.directory = directory
+        self.top = top
+        self.latest: Optional[str] = None
+        self._active = False
+
+    @contextmanager
+    def record(self, tool_name: str) -> Iterator[None]:
+        """Profile the enclosed work as a call to ``tool_name``."""
+        if self._active:
+            logger.info(f"Another call is being profiled; {tool_name} runs unprofiled")
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            logger.info(f"Couldn't start the profiler for {tool_name}: {str(e)}")
+            yield
+            return
+        self._active = True
+        started_at = datetime.now()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._active = False
+            self._save(tool_name, profiler, started_at, time.monotonic() - started)
+
+    def _save(self, tool_name: str, profiler: cProfile.Profile, stamp: datetime, elapsed: float) -> None:
+        path = os.path.join(self.directory, f"{tool_name}_{stamp:%Y%m%d-%H%M%S-%f}.prof")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError as e:
+            logger.warning(f"Couldn't write profile {path}: {str(e)}")
+            path = None
+
+        stats = pstats.Stats(profiler)
+        lines = [f"# Profile of {tool_name}"]
+        lines.append(f"- Started: {stamp:%Y-%m-%d %H:%M:%S}")
+        lines.append(f"- Wall time: {elapsed:.3f} s")
+        lines.append(f"- Profiled time: {stats.total_tt:.3f} s")
+        lines.append(f"- File: {path or 'not written'}")
+        lines.append("")
+        lines.append(f"## Top {self.top} functions by own time")
+        lines.extend(summarize(stats, self.top))
+        self.latest = "\n".join(lines)
+        logger.info(f"Profiled {tool_name} in {elapsed:.3f} s ({path or 'not written'})")
+
+
+profiles = ProfileStore(PROFILE_DIR, PROFILE_TOP)
@@ -2,6 +2,8 @@
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.prompts import base
 
+from .prefetch import prefetcher
+
 
 async def register_prompts(mcp: FastMCP):
     """Register all MCP prompts"""
@@ -34,6 +36,7 @@ async def register_prompts(mcp: FastMCP):
     @mcp.prompt()
     def select_medium(customer_id: str, customer_name: str) -> list[base.Message]:
         """Guía al usuario para seleccionar uno o más medios específicos para el cliente seleccionado."""
+        prefetcher.customer_selected(customer_id)
         return [
             base.UserMessage(f"""
             # Selección de Medio Publicitario para {customer_name}
@@ -62,6 +65,7 @@ async def register_prompts(mcp: FastMCP):
     @mcp.prompt()
     def google_ads_extraction(customer_id: str, customer_name: str) -> list[base.Message]:
         """Guía al usuario para extraer datos específicos de Google Ads con parámetros claros."""
+        prefetcher.customer_selected(customer_id)
         return [
             base.UserMessage(f"""
             # Extracción de Datos de Google Ads para {customer_name}
@@ -111,6 +115,7 @@ async def register_prompts(mcp: FastMCP):
     @mcp.prompt()
     def facebook_ads_extraction(customer_id: str, customer_name: str) -> list[base.Message]:
         """Guía al usuario para extraer datos específicos de Facebook Ads con parámetros precisos."""
+        prefetcher.customer_selected(customer_id)
         return [
             base.UserMessage(f"""
             # Extracción de Datos de Facebook Ads para {customer_name}
@@ -160,6 +165,7 @@ async def register_prompts(mcp: FastMCP):
     @mcp.prompt()
     def google_analytics_extraction(customer_id: str, customer_name: str) -> list[base.Message]:
         """Guía al usuario para extraer datos específicos de Google Analytics 4 con parámetros completos."""
+        prefetcher.customer_selected(customer_id)
         return [
             base.UserMessage(f"""
             # Extracción de Datos de Google Analytics 4 para {customer_name}
@@ -218,6 +224,7 @@ async def register_prompts(mcp: FastMCP):
     @mcp.prompt()
     def combined_data_extraction(customer_id: str, customer_name: str) -> list[base.Message]:
         """Guía completa para extraer datos de múltiples plataformas de forma estructurada."""
+        prefetcher.customer_selected(customer_id)
         return [
             base.UserMessage(f"""
             # Extracción Multiplataforma para {customer_name}
@@ -0,0 +1,157 @@
+# server/reports.py
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pitagoras.api import (
+    get_google_ads_report,
+    get_facebook_ads_report,
+    get_google_analytics_report,
+)
+from pitagoras.batching import FACEBOOK_DIMENSION_FIELDS, normalize_column
+from pitagoras.models import Customer
+from .analysis import group_rows
+from .derived import ACTION_COLUMNS, add_derived_metrics, expand_action_columns
+
+logger = logging.getLogger("pitagoras.reports")
+
+PLATFORM_LABELS = {
+    "google_ads": "Google Ads",
+    "facebook_ads": "Facebook Ads",
+    "google_analytics": "Google Analytics",
+}
+
+# Métricas predeterminadas de cada plataforma (las mismas que usan las herramientas)
+DEFAULT_METRICS = {
+    "google_ads": ["metrics.cost_micros", "metrics.impressions", "metrics.clicks"],
+    "facebook_ads": ["spend", "impressions", "clicks"],
+    "google_analytics": ["sessions", "transactions", "totalRevenue"],
+}
+
+DEFAULT_DIMENSIONS = {
+    "google_ads": ["campaign.name", "campaign.id", "segments.date"],
+    "facebook_ads": ["campaign_name", "date_start"],
+    "google_analytics": ["date", "sessionCampaignName", "sessionSourceMedium"],
+}
+
+# Columnas que contienen la fecha de cada fila
+DATE_COLUMNS = {"segments.date", "date", "date_start", "date_stop"}
+
+
+# Proveedor canónico de las cuentas de cada plataforma
+PLATFORM_PROVIDERS = {
+    "google_ads": "adwords",
+    "facebook_ads": "facebook",
+    "google_analytics": "analytics4",
+}
+
+
+def find_customer(customers: List[Customer], customer_id: str) -> Optional[Customer]:
+    """Return the customer with ``customer_id`` or ``None``."""
+    return next((c for c in customers if c.id == customer_id), None)
+
+
+def platform_accounts(customer: Customer, platform: str) -> List[Dict[str, Any]]:
+    """Accounts of ``customer`` for ``platform`` in the format expected by the API."""
+    return [a.to_request() for a in customer.accounts_for(PLATFORM_PROVIDERS[platform])]
+
+
+def google_ads_accounts(customer: Customer) -> List[Dict[str, Any]]:
+    """Google Ads accounts of a customer in the format expected by the API."""
+    return platform_accounts(customer, "google_ads")
+
+
+def facebook_ads_accounts(customer: Customer) -> List[Dict[str, Any]]:
+    """Facebook Ads accounts of a customer in the format expected by the API."""
+    return platform_accounts(customer, "facebook_ads")
+
+
+def google_analytics_accounts(customer: Customer) -> List[Dict[str, Any]]:
+    """GA4 properties of a customer in the format expected by the API."""
+    return platform_accounts(customer, "google_analytics")
+
+
+async def fetch_platform_report(
+    platform: str,
+    accounts: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    metrics: Optional[List[str]] = None,
+    dimensions: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fetch a report for any platform using the tools' default columns.
+
+    ``dimensions`` only applies to Facebook (extra fields) and GA4. Google Ads
+    reports are always per campaign and date.
+    """
+    metrics = list(metrics or DEFAULT_METRICS[platform])
+    dimensions = list(dimensions or DEFAULT_DIMENSIONS[platform])
+
+    if platform == "google_ads":
+        return await get_google_ads_report(
+            accounts=accounts,
+            attributes=[{"resource_name": "campaign", "fields": ["campaign.name", "campaign.id"]}],
+            segments=["segments.date"],
+            metrics=[m if m.startswith("metrics.") else f"metrics.{m}" for m in metrics],
+            resource="campaign",
+            start_date=start_date,
+            end_date=end_date,
+        )
+    if platform == "facebook_ads":
+        fields = dimensions + [m for m in metrics if m not in dimensions]
+        return await get_facebook_ads_report(
+            accounts=accounts, fields=fields, start_date=start_date, end_date=end_date
+        )
+    if platform == "google_analytics":
+        return await get_google_analytics_report(
+            accounts=accounts,
+            dimensions=dimensions,
+            metrics=metrics,
+            start_date=start_date,
+            end_date=end_date,
+            filters=filters,
+        )
+    raise ValueError(f"Plataforma no soportada: {platform}")
+
+
+def metric_indexes(platform: str, headers: List[str], metrics: Optional[List[str]] = None) -> List[int]:
+    """Positions in ``headers`` holding metric (additive numeric) columns."""
+    if platform == "facebook_ads" and not metrics:
+        # Las listas de acciones no se suman; se usan sus columnas numéricas de compras
+        return [
+            i for i, h in enumerate(headers) if str(h) not in FACEBOOK_DIMENSION_FIELDS and str(h) not in ACTION_COLUMNS
+        ]
+    wanted = {normalize_column(m) for m in (metrics or DEFAULT_METRICS[platform])}
+    return [i for i, h in enumerate(headers) if normalize_column(str(h)) in wanted]
+
+
+def transform_report(
+    platform: str,
+    headers: List[str],
+    rows: List[List[Any]],
+    metrics: Optional[List[str]] = None,
+    group_by: Optional[List[str]] = None,
+    derived_metrics: Optional[List[str]] = None,
+) -> Tuple[List[str], List[List[Any]], List[str]]:
+    """Apply the optional aggregation and derived metrics to a report.
+
+    Aggregation runs first so derived ratios are computed from sums. Facebook
+    ``actions``/``action_values`` lists are first expanded into numeric
+    purchase columns so they can be summed and used as conversions and
+    revenue.
+
+    Returns:
+        ``(headers, rows, errors)``
+    """
+    errors: List[str] = []
+    if platform == "facebook_ads":
+        headers, rows = expand_action_columns(headers, rows)
+    if group_by:
+        headers, rows, missing = group_rows(
+            headers, rows, group_by, metric_indexes(platform, headers, metrics)
+        )
+        errors += [f"La columna `{name}` no existe en el resultado" for name in missing]
+    if derived_metrics:
+        headers, rows, derived_errors = add_derived_metrics(platform, headers, rows, derived_metrics)
+        errors += derived_errors
+    return headers, rows, errors
@@ -1,6 +1,10 @@
 # server/resources.py
 from mcp.server.fastmcp import FastMCP
-from pitagoras.api import get_customers
+from pitagoras.api import get_customers, replicas
+from pitagoras.offload import loop_monitor, offloader
+from .memory import memory_tracker
+from .profiling import profiles
+from .reports import find_customer
 
 
 async def register_resources(mcp: FastMCP):
@@ -13,7 +17,7 @@ async def register_resources(mcp: FastMCP):
         formatted_customers = []
         
         for customer in customers:
-            customer_info = f"- ID: {customer['ID']}\n  Name: {customer['name']}\n  Status: {customer['status']}"
+            customer_info = f"- ID: {customer.id}\n  Name: {customer.name}\n  Status: {customer.status}"
             formatted_customers.append(customer_info)
         
         return "\n".join(formatted_customers)
@@ -22,27 +26,52 @@ async def register_resources(mcp: FastMCP):
     async def get_customer_accounts(customer_id: str) -> str:
         """Get all accounts for a specific customer"""
         customers = await get_customers()
+        customer = find_customer(customers, customer_id)
+        if not customer:
+            return f"Customer with ID {customer_id} not found"
         
-        for customer in customers:
-            if customer["ID"] == customer_id:
-                accounts = customer.get("accounts", [])
-                formatted_accounts = []
-                
-                for account in accounts:
-                    account_info = [
-                        f"- ID: {account.get('accountID', 'N/A')}",
-                        f"  Name: {account.get('name', 'N/A')}",
-                        f"  Provider: {account.get('provider', 'N/A')}",
-                    ]
-                    
-                    if "externalLoginCustomerID" in account:
-                        account_info.append(f"  Login Customer ID: {account['externalLoginCustomerID']}")
-                    
-                    if "credentialEmail" in account:
-                        account_info.append(f"  Credential Email: {account['credentialEmail']}")
-                    
-                    formatted_accounts.append("\n".join(account_info))
-                
-                return "\n".join(formatted_accounts)
+        formatted_accounts = []
+        for account in customer.accounts:
+            account_info = [
+                f"- ID: {account.account_id}",
+                f"  Name: {account.name}",
+                f"  Provider: {account.provider}",
+            ]
+            
+            if account.login_customer_id:
+                account_info.append(f"  Login Customer ID: {account.login_customer_id}")
+            
+            if account.property_id:
+                account_info.append(f"  Property ID: {account.property_id}")
+            
+            if account.credential_email:
+                account_info.append(f"  Credential Email: {account.credential_email}")
+            
+            formatted_accounts.append("\n".join(account_info))
         
-        return f"Customer with ID {customer_id} not found"
\ No newline at end of file
+        return "\n".join(formatted_accounts)
+
+    @mcp.resource("pitagoras://metrics")
+    async def get_metrics() -> str:
+        """Get event-loop lag, offloaded processing and upstream replica metrics"""
+        lines = ["Event loop:"]
+        lines += [f"  {name}: {value}" for name, value in loop_monitor.metrics().items()]
+        lines.append("Offloaded processing:")
+        lines += [f"  {name}: {value}" for name, value in offloader.metrics().items()]
+        lines.append("Upstream replicas:")
+        for replica in replicas.metrics():
+            lines.append(f"  {replica.pop('base_url')}:")
+            lines += [f"    {name}: {value}" for name, value in replica.items()]
+        return "\n".join(lines)
+
+    @mcp.resource("pitagoras://profiles/latest")
+    async def get_latest_profile() -> str:
+        """Get the hotspots of the latest profiled tool call"""
+        if profiles.latest is None:
+            return "No tool call has been profiled yet. Set PROFILE_ENABLED=true or call a tool with profile=true."
+        return profiles.latest
+
+    @mcp.resource("pitagoras://memory")
+    async def get_memory() -> str:
+        """Get peak and retained memory per tool call and the top allocation sites"""
+        return memory_tracker.report()
@@ -0,0 +1,171 @@
+# server/scheduler.py
+import asyncio
+import logging
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from pitagoras.api import report_cache
+from pitagoras.cache import AccessStats
+from pitagoras.config import (
+    REFRESH_ENABLED,
+    REFRESH_WINDOW,
+    REFRESH_INTERVAL_MINUTES,
+    REFRESH_MIN_HITS,
+    REFRESH_MAX_REPORTS,
+    REFRESH_CONCURRENCY,
+    REFRESH_CACHE_TTL,
+)
+
+logger = logging.getLogger("pitagoras.scheduler")
+
+
+def parse_window(window: str) -> Tuple[dtime, dtime]:
+    """Parse an ``"HH:MM-HH:MM"`` local time window."""
+    start, end = (part.strip() for part in window.split("-", 1))
+    return dtime.fromisoformat(start), dtime.fromisoformat(end)
+
+
+def in_window(now: datetime, start: dtime, end: dtime) -> bool:
+    """Whether ``now`` falls in the window (windows may wrap past midnight)."""
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def seconds_until(now: datetime, start: dtime) -> float:
+    """Seconds from ``now`` until the next occurrence of ``start``."""
+    target = datetime.combine(now.date(), start)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def rolled_params(stats: AccessStats, today: date) -> Dict[str, Any]:
+    """Parameters of a hot spec with rolling date ranges moved to ``today``.
+
+    A range that ended on (or the day before) the day it was last requested
+    is treated as relative ("yesterday", "last 7 days") and shifted by the
+    days elapsed since then. Fixed historical ranges are refreshed as is.
+    """
+    params = stats.params
+    accessed = datetime.fromtimestamp(stats.last_access).date()
+    elapsed = (today - accessed).days
+    try:
+        start_date = date.fromisoformat(params["start_date"])
+        end_date = date.fromisoformat(params["end_date"])
+    except (KeyError, TypeError, ValueError):
+        return params
+    if elapsed <= 0 or end_date < accessed - timedelta(days=1):
+        return params
+    shift = timedelta(days=elapsed)
+    return {
+        **params,
+        "start_date": (start_date + shift).isoformat(),
+        "end_date": (end_date + shift).isoformat(),
+    }
+
+
+class RefreshScheduler:
+    """Refreshes the most requested reports during off-peak hours.
+
+    Every ``interval_minutes`` inside ``window`` the specs requested at
+    least ``min_hits`` times (access counts from the report cache) are
+    fetched again, at most ``concurrency`` at a time, and stored for
+    ``cache_ttl`` seconds so peak-hour requests are served from cache.
+
+    Args:
+        enabled: Whether the scheduler runs at all
+        window: Off-peak local time window, ``"HH:MM-HH:MM"``
+        interval_minutes: Refresh cadence inside the window
+        min_hits: Minimum accesses for a spec to be refreshed
+        max_reports: Maximum specs refreshed per run
+        concurrency: Maximum refreshes in flight
+        cache_ttl: Seconds refreshed reports stay in the cache
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        window: str,
+        interval_minutes: float,
+        min_hits: int,
+        max_reports: int,
+        concurrency: int,
+        cache_ttl: float,
+    ):
+        self.enabled = enabled
+        self.window = parse_window(window)
+        self.interval = interval_minutes * 60
+        self.min_hits = min_hits
+        self.max_reports = max_reports
+        self.concurrency = max(1, concurrency)
+        self.cache_ttl = cache_ttl
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+            logger.info(
+                f"Refresh scheduler started (window {REFRESH_WINDOW}, every {self.interval / 60:g} min)"
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        start, end = self.window
+        while True:
+            now = datetime.now()
+            if in_window(now, start, end):
+                try:
+                    await self.refresh_hot()
+                except Exception as e:
+                    logger.warning(f"Scheduled refresh failed: {str(e)}")
+                await asyncio.sleep(self.interval)
+            else:
+                await asyncio.sleep(min(self.interval, seconds_until(now, start)))
+
+    async def refresh_hot(self) -> int:
+        """Refresh the hot specs now.
+
+        Returns:
+            Number of reports refreshed.
+        """
+        specs = report_cache.hot_specs(self.min_hits, self.max_reports)
+        if not specs:
+            return 0
+        today = date.today()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(stats: AccessStats) -> bool:
+            async with semaphore:
+                try:
+                    return await report_cache.refresh(
+                        stats.kind, rolled_params(stats, today), ttl=self.cache_ttl
+                    )
+                except Exception as e:
+                    logger.info(f"Refresh of a {stats.kind} report failed: {str(e)}")
+                    return False
+
+        results = await asyncio.gather(*(refresh(s) for s in specs))
+        refreshed = sum(results)
+        logger.info(f"Refreshed {refreshed} of {len(specs)} hot reports")
+        return refreshed
+
+
+scheduler = RefreshScheduler(
+    REFRESH_ENABLED,
+    REFRESH_WINDOW,
+    REFRESH_INTERVAL_MINUTES,
+    REFRESH_MIN_HITS,
+    REFRESH_MAX_REPORTS,
+    REFRESH_CONCURRENCY,
+    REFRESH_CACHE_TTL,
+)
@@ -0,0 +1,135 @@
+# server/spill.py
+import logging
+import os
+import uuid
+import weakref
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List
+
+from pitagoras.cache import estimate_rows_size
+from pitagoras.config import SPILL_THRESHOLD_MB, SPILL_DIR
+from .export import build_schema, infer_column_types, rows_to_batch
+
+logger = logging.getLogger("pitagoras.spill")
+
+# Filas convertidas por lote al escribir y al leer del mapa
+CHUNK_ROWS = 50_000
+
+
+class SpilledRows(Sequence):
+    """Read-only rows backed by a memory-mapped Arrow IPC file.
+
+    Behaves like the ``rows`` list returned by the API (``len``, iteration,
+    indexing and slicing) while the data stays in the page cache instead of
+    the Python heap. Rows are materialized one chunk at a time.
+    """
+
+    def __init__(self, path: str, headers: List[str]):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        self.path = path
+        self.headers = list(headers)
+        self._source = pa.memory_map(path, "r")
+        self._table = ipc.open_file(self._source).read_all()
+        self._finalizer = weakref.finalize(self, _release, self._source, path)
+
+    def __len__(self) -> int:
+        return self._table.num_rows
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        for batch in self._table.to_batches(max_chunksize=CHUNK_ROWS):
+            columns = [column.to_pylist() for column in batch.columns]
+            for row in zip(*columns):
+                yield list(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            chunk = self._table.slice(start, max(0, stop - start))
+            return [list(row) for row in zip(*(column.to_pylist() for column in chunk.columns))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        return [column[index].as_py() for column in self._table.columns]
+
+    def column(self, name: str) -> List[Any]:
+        """Return a single column as a Python list."""
+        return self._table.column(name).to_pylist()
+
+    def to_arrow(self):
+        """Return the zero-copy ``pyarrow.Table`` view over the file."""
+        return self._table
+
+    def close(self) -> None:
+        """Unmap and delete the spill file."""
+        self._table = self._table.schema.empty_table()
+        self._finalizer()
+
+
+def _release(source, path: str) -> None:
+    try:
+        source.close()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def spill_rows(headers: List[str], rows: List[List[Any]], spill_dir: str = SPILL_DIR) -> SpilledRows:
+    """Write ``rows`` to an uncompressed Arrow IPC file and map it back."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    os.makedirs(spill_dir, exist_ok=True)
+    path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.arrow")
+
+    kinds = infer_column_types(headers, rows)
+    schema = build_schema(headers, kinds)
+    # Sin compresión para que la lectura sea un mapeo directo del archivo
+    try:
+        with pa.OSFile(path, "wb") as sink:
+            with ipc.new_file(sink, schema) as writer:
+                for start in range(0, len(rows), CHUNK_ROWS):
+                    writer.write_batch(rows_to_batch(schema, kinds, rows[start:start + CHUNK_ROWS]))
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    return SpilledRows(path, headers)
+
+
+def maybe_spill(data: Dict[str, Any], threshold_mb: float = SPILL_THRESHOLD_MB) -> Dict[str, Any]:
+    """Replace ``data["rows"]`` with a :class:`SpilledRows` when it is too large.
+
+    The threshold is compared against an estimate of the rows' heap size. When
+    pyarrow is not installed or spilling fails the rows stay in memory.
+    """
+    rows = data.get("rows")
+    if not threshold_mb or not isinstance(rows, list) or not rows:
+        return data
+
+    size = estimate_rows_size(rows)
+    if size < threshold_mb * 1024 * 1024:
+        return data
+
+    try:
+        spilled = spill_rows(data.get("headers", []), rows)
+    except ImportError:
+        logger.warning("pyarrow is not installed, large result kept in memory")
+        return data
+    except Exception as e:
+        logger.warning(f"Couldn't spill result to disk, keeping it in memory: {str(e)}")
+        return data
+
+    logger.info(
+        f"Spilled {len(spilled)} rows (~{size / 1024 / 1024:.1f} MB) to {spilled.path}"
+    )
+    data["rows"] = spilled
+    return data
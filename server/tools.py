@@ -1,8 +1,30 @@
+import asyncio
 import logging
 import sys
 from typing import List, Dict, Optional, Any
 
-from .utils import parse_account_selection
+from .utils import parse_account_selection, previous_period
+from .export import export_report
+from .spill import maybe_spill
+from .planner import planner
+from .prefetch import prefetcher
+from .wrappers import with_deadline, with_memory_tracing, with_profiling, with_progress
+from .analysis import aggregate, join_periods, percent_change, format_number, markdown_table, select_rows
+from .portfolio import fetch_portfolio, select_customers, summarize_report
+from .blend import blend_reports, blend_table, campaign_normalizer
+from .derived import required_metrics
+from .reports import (
+    PLATFORM_LABELS,
+    DATE_COLUMNS,
+    fetch_platform_report,
+    metric_indexes,
+    platform_accounts,
+    transform_report,
+    find_customer,
+    google_ads_accounts,
+    facebook_ads_accounts,
+    google_analytics_accounts,
+)
 
 from mcp.server.fastmcp import FastMCP
 from pitagoras.api import (
@@ -18,6 +40,10 @@ from pitagoras.api import (
     get_adwords_segments,
     get_adwords_metrics,
 )
+from pitagoras import progress
+from pitagoras.config import BLEND_NORMALIZATION, PORTFOLIO_MAX_CUSTOMERS, PROFILE_ENABLED, TOOL_DEADLINE_SECONDS
+from pitagoras.models import DEFAULT_CREDENTIAL_EMAIL
+from pitagoras.offload import run_cpu
 
 # Configurar logging para escribir en stderr (que MCP captura automáticamente)
 logging.basicConfig(
@@ -30,20 +56,29 @@ logger = logging.getLogger("pitagoras")
 
 async def register_tools(mcp: FastMCP):
     """Register all MCP tools"""
+
+    def tool():
+        """``mcp.tool()`` bounding each call to ``TOOL_DEADLINE_SECONDS``, reporting progress,
+        accounting memory and profiling on request."""
+        def decorator(fn):
+            wrapped = with_deadline(with_progress(fn, mcp), TOOL_DEADLINE_SECONDS)
+            return mcp.tool()(with_profiling(with_memory_tracing(wrapped), PROFILE_ENABLED))
+        return decorator
     
-    @mcp.tool()
+    @tool()
     async def get_customers_data(query: Optional[str] = None) -> str:
         """Get all available customers and their accounts.
 
         Args:
-            query: optional text to filter customers by name or ID
+            query: optional text to search customers by name or ID. Results are
+                ranked by relevance and tolerate accents and small typos
         """
         customers = await (search_customers(query) if query else get_customers())
         
         if not customers:
             return "No se encontraron clientes disponibles."
         
-        result = ["# Clientes disponibles\n"]
+        result = [f"# Clientes que coinciden con '{query}'\n" if query else "# Clientes disponibles\n"]
         result.append("| # | Nombre del cliente | ID | Status | Cuentas |") 
         result.append("| --- | --- | --- | --- | --- |")
         
@@ -55,14 +90,9 @@ async def register_tools(mcp: FastMCP):
             }
             
             # Contar cuentas por tipo
-            for account in customer.get("accounts", []):
-                provider = account.get("provider", "").lower()
-                if provider == "adwords" or provider == "google ads":
-                    account_counts["adwords"] += 1
-                elif provider == "facebook" or provider == "fb" or provider == "facebook ads":
-                    account_counts["facebook"] += 1
-                elif provider == "analytics4" or "property_id" in account or "propertyId" in account or "propertyID" in account:
-                    account_counts["analytics4"] += 1
+            for account in customer.accounts:
+                if account.provider in account_counts:
+                    account_counts[account.provider] += 1
             
             # Crear resumen de cuentas
             account_summary = []
@@ -76,7 +106,7 @@ async def register_tools(mcp: FastMCP):
             account_text = ", ".join(account_summary) if account_summary else "*Sin cuentas*"
             
             # Agregar fila a la tabla
-            result.append(f"| {i} | {customer['name']} | {customer['ID']} | {customer['status']} | {account_text} |")
+            result.append(f"| {i} | {customer.name} | {customer.id} | {customer.status} | {account_text} |")
         
         # Agregar instrucciones de uso
         result.append("\n## Cómo seleccionar un cliente")
@@ -87,13 +117,20 @@ async def register_tools(mcp: FastMCP):
         
         return "\n".join(result)
     
-    @mcp.tool()
+    @tool()
     async def get_google_ads_data(
         customer_id: str,
         account_selection: str,
         start_date: str,
         end_date: str,
-        metrics: Optional[List[str]] = None
+        metrics: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+        derived_metrics: Optional[List[str]] = None,
+        top_n: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        ascending: bool = False,
+        where: Optional[str] = None,
+        export_format: Optional[str] = None
     ) -> str:
         """
         Get Google Ads data for specific accounts
@@ -104,41 +141,41 @@ async def register_tools(mcp: FastMCP):
             start_date: Start date in YYYY-MM-DD format
             end_date: End date in YYYY-MM-DD format
             metrics: Optional list of metrics to fetch (defaults to cost_micros, impressions, clicks)
+            group_by: Optional columns to aggregate by (e.g. ["campaign.name"]), summing the metrics
+            derived_metrics: Optional ratios to compute: ctr, cpc, cpm, cpa, roas, conversion_rate.
+                Missing base metrics are requested automatically
+            top_n: Optional number of rows to keep after sorting by ``sort_by``
+            sort_by: Optional column to rank by (e.g. "metrics.cost_micros" or "cpa")
+            ascending: Rank from lowest to highest instead of highest first
+            where: Optional thresholds such as "cpa > 50, metrics.clicks >= 10"
+            export_format: Optional "parquet" or "arrow". When set, the rows are written
+                to a local file and only its path and a summary are returned
         """
+        prefetcher.customer_selected(customer_id)
         # Obtener clientes y registrar para depuración
         customers = await get_customers()
-        target_customer = None
         
         # Buscar el cliente específico
-        for customer in customers:
-            if customer["ID"] == customer_id:
-                target_customer = customer
-                break
+        target_customer = find_customer(customers, customer_id)
         
         # Si no encontramos el cliente, mostrar información de depuración
         if not target_customer:
-            available_customers = [f"{c['ID']} ({c['name']})" for c in customers]
+            available_customers = [f"{c.id} ({c.name})" for c in customers]
             return f"Cliente con ID {customer_id} no encontrado. Clientes disponibles: {', '.join(available_customers)}"
         
-        customer_name = target_customer["name"]
+        customer_name = target_customer.name
         
         # Encontrar todas las cuentas de Google Ads para este cliente
-        all_adwords_accounts = []
-        for account in target_customer.get("accounts", []):
-            if account.get("provider") == "adwords":
-                all_adwords_accounts.append({
-                    "id": account.get("accountID"),
-                    "account_id": account.get("accountID"),
-                    "name": account.get("name"),
-                    "login_customer_id": account.get("externalLoginCustomerID", "")
-                })
+        all_adwords_accounts = google_ads_accounts(target_customer)
         
         # Si no hay cuentas de Google Ads, informarlo
         if not all_adwords_accounts:
             return f"El cliente {customer_name} (ID: {customer_id}) no tiene cuentas de Google Ads configuradas."
         
         # Interpretar la selección del usuario
-        matching_accounts = parse_account_selection(account_selection, all_adwords_accounts)
+        matching_accounts = parse_account_selection(
+            account_selection, all_adwords_accounts, "google_ads", target_customer
+        )
         
         # Si no encontramos las cuentas solicitadas, mostrar información de depuración
         if not matching_accounts:
@@ -148,17 +185,25 @@ async def register_tools(mcp: FastMCP):
                     f"Cuentas disponibles: {', '.join(available_accounts)}")
         
         # Configurar métricas predeterminadas si no se proporcionan
+        segments = ["segments.date"]
+        validate = bool(metrics)
         if not metrics:
             metrics = ["metrics.cost_micros", "metrics.impressions", "metrics.clicks"]
-        else:
-            # Asegurar que todas las métricas tengan el prefijo 'metrics.' 
-            formatted_metrics = []
-            for metric in metrics:
-                if not metric.startswith("metrics."):
-                    formatted_metrics.append(f"metrics.{metric}")
-                else:
-                    formatted_metrics.append(metric)
-            metrics = formatted_metrics
+
+        # Agregar las métricas base necesarias para las métricas derivadas (se validan con las demás)
+        if derived_metrics:
+            extra = [m for m in required_metrics("google_ads", derived_metrics) if m not in metrics]
+            metrics = metrics + extra
+            validate = validate or bool(extra)
+
+        if validate:
+            # Validar y normalizar las métricas contra el catálogo de Google Ads
+            plan = await planner.plan_google_ads(metrics, resource="campaign")
+            if not plan.ok:
+                return plan.error_message()
+            metrics = plan.columns["metrics"]
+            # Los segmentos enviados como métricas se agregan después de la fecha
+            segments += [s for s in plan.columns["segments"] if s not in segments]
         
         # Preparar parámetros de la solicitud
         report_params = {
@@ -169,7 +214,7 @@ async def register_tools(mcp: FastMCP):
                     "fields": ["campaign.name", "campaign.id"]
                 }
             ],
-            "segments": ["segments.date"],
+            "segments": segments,
             "metrics": metrics,
             "resource": "campaign",
             "start_date": start_date,
@@ -177,6 +222,7 @@ async def register_tools(mcp: FastMCP):
         }
         
         # Obtener datos del informe
+        progress.plan(1, len(matching_accounts))
         try:
             data = await get_google_ads_report(
                 accounts=matching_accounts,
@@ -194,40 +240,76 @@ async def register_tools(mcp: FastMCP):
         if "errors" in data and data["errors"]:
             return f"Errores en la API: {data['errors']}"
         
+        # Volcar a disco los resultados muy grandes para mantener acotada la memoria
+        data = await run_cpu(maybe_spill, data, rows=len(data.get("rows") or []))
         headers = data.get("headers", [])
         rows = data.get("rows", [])
         
         if not rows:
             return f"No se encontraron datos para las cuentas seleccionadas en el período {start_date} a {end_date}."
         
+        # Agregación y métricas derivadas (proporción de sumas)
+        if group_by or derived_metrics:
+            headers, rows, errors = await run_cpu(
+                transform_report, "google_ads", headers, rows, metrics, group_by, derived_metrics, rows=len(rows)
+            )
+            if errors:
+                return "No fue posible calcular las columnas solicitadas:\n" + "\n".join(f"- {e}" for e in errors)
+
+        # Ranking y umbrales evaluados en una sola pasada
+        matched = None
+        if top_n or sort_by or where:
+            total_rows = len(rows)
+            rows, matched, errors = await run_cpu(
+                select_rows, headers, rows, top_n, sort_by, ascending, where, rows=total_rows
+            )
+            if errors:
+                return "No fue posible aplicar el filtro o ranking solicitado:\n" + "\n".join(f"- {e}" for e in errors)
+            if not rows:
+                return f"Ninguna de las {total_rows} filas cumple con las condiciones: {where}"
+        
+        # Exportar a archivo local en lugar de devolver la tabla completa
+        if export_format:
+            try:
+                return await run_cpu(
+                    export_report, headers, rows, export_format,
+                    f"google_ads_{customer_id}_{start_date}_{end_date}", rows=len(rows),
+                )
+            except Exception as e:
+                return f"Error al exportar datos de Google Ads: {str(e)}"
+        
         account_names = [account["name"] for account in matching_accounts]
         result = [f"# Datos de Google Ads ({start_date} a {end_date})"]
         result.append(f"**Cliente:** {customer_name}")
         result.append(f"**Cuentas incluidas:** {', '.join(account_names)}")
         result.append("")
         
-        # Crear tabla en formato markdown
-        result.append("| " + " | ".join(headers) + " |")
-        result.append("| " + " | ".join(["---" for _ in headers]) + " |")
-        
-        for row in rows:
-            # No necesitamos convertir cost_micros ya que Pitágoras ya lo devuelve en unidades monetarias
-            formatted_row = [str(cell) for cell in row]
-            result.append("| " + " | ".join(formatted_row) + " |")
+        # Crear tabla en formato markdown (fuera del bucle de eventos si es grande)
+        # No necesitamos convertir cost_micros ya que Pitágoras ya lo devuelve en unidades monetarias
+        result.extend(await run_cpu(markdown_table, headers, rows, rows=len(rows)))
         
         # Incluir resumen numérico
         result.append("")
         result.append(f"**Total de filas:** {len(rows)}")
+        if matched is not None:
+            result.append(f"**Filas que cumplen el criterio:** {matched} de {total_rows}")
         
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def get_facebook_ads_data(
         customer_id: str,
         accounts_selection: str,
         start_date: str,
         end_date: str,
-        fields: Optional[List[str]] = None
+        fields: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+        derived_metrics: Optional[List[str]] = None,
+        top_n: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        ascending: bool = False,
+        where: Optional[str] = None,
+        export_format: Optional[str] = None
     ) -> str:
         """
         Get Facebook Ads data for specific accounts
@@ -238,38 +320,57 @@ async def register_tools(mcp: FastMCP):
             start_date: Start date in YYYY-MM-DD format
             end_date: End date in YYYY-MM-DD format
             fields: Optional list of fields to fetch (defaults to campaign_name, date_start, spend, impressions, clicks)
+            group_by: Optional fields to aggregate by (e.g. ["campaign_name"]), summing the metrics
+            derived_metrics: Optional ratios to compute: ctr, cpc, cpm, cpa, roas, conversion_rate.
+                Missing base fields are requested automatically
+            top_n: Optional number of rows to keep after sorting by ``sort_by``
+            sort_by: Optional field to rank by (e.g. "spend" or "cpc")
+            ascending: Rank from lowest to highest instead of highest first
+            where: Optional thresholds such as "spend > 100, ctr < 1"
+            export_format: Optional "parquet" or "arrow". When set, the rows are written
+                to a local file and only its path and a summary are returned
         """
+        prefetcher.customer_selected(customer_id)
         # Obtener clientes y encontrar el objetivo
         customers = await get_customers()
-        target_customer = next((c for c in customers if c["ID"] == customer_id), None)
+        target_customer = find_customer(customers, customer_id)
         if not target_customer:
-            available = ", ".join(f"{c['ID']} ({c['name']})" for c in customers)
+            available = ", ".join(f"{c.id} ({c.name})" for c in customers)
             return f"Cliente con ID {customer_id} no encontrado. Clientes disponibles: {available}"
 
-        all_fb_accounts = []
-        for account in target_customer.get("accounts", []):
-            if account.get("provider", "").lower() in ["fb", "facebook", "facebook ads"]:
-                all_fb_accounts.append({
-                    "id": account.get("accountID"),
-                    "account_id": account.get("accountID"),
-                    "name": account.get("name")
-                })
+        all_fb_accounts = facebook_ads_accounts(target_customer)
 
         if not all_fb_accounts:
-            return f"El cliente {target_customer['name']} no tiene cuentas de Facebook Ads configuradas."
+            return f"El cliente {target_customer.name} no tiene cuentas de Facebook Ads configuradas."
 
-        formatted_accounts = parse_account_selection(accounts_selection, all_fb_accounts)
+        formatted_accounts = parse_account_selection(
+            accounts_selection, all_fb_accounts, "facebook_ads", target_customer
+        )
 
         if not formatted_accounts:
             available = [f"{a['id']} ({a['name']})" for a in all_fb_accounts]
-            return (f"No se encontraron las cuentas de Facebook Ads solicitadas para {target_customer['name']}.\n"
+            return (f"No se encontraron las cuentas de Facebook Ads solicitadas para {target_customer.name}.\n"
                     f"Selección solicitada: {accounts_selection}\n"
                     f"Cuentas disponibles: {', '.join(available)}")
 
         # Establecer campos predeterminados si no se proporcionan
+        validate = bool(fields)
         if not fields:
             fields = ["campaign_name", "date_start", "spend", "impressions", "clicks"]
+
+        # Agregar los campos base necesarios para las métricas derivadas (se validan con los demás)
+        if derived_metrics:
+            extra = [f for f in required_metrics("facebook_ads", derived_metrics) if f not in fields]
+            fields = fields + extra
+            validate = validate or bool(extra)
+
+        if validate:
+            plan = await planner.plan_facebook(fields)
+            if not plan.ok:
+                return plan.error_message()
+            fields = plan.columns["fields"]
         
+        progress.plan(1, len(formatted_accounts))
         try:
             # Obtener los datos del informe usando el formato correcto de la API
             data = await get_facebook_ads_report(
@@ -286,34 +387,64 @@ async def register_tools(mcp: FastMCP):
         if "errors" in data and data["errors"]:
             return f"Errores en la API: {data['errors']}"
         
+        # Volcar a disco los resultados muy grandes para mantener acotada la memoria
+        data = await run_cpu(maybe_spill, data, rows=len(data.get("rows") or []))
         headers = data.get("headers", [])
         rows = data.get("rows", [])
         
         if not rows:
             return f"No se encontraron datos para las cuentas seleccionadas en el período {start_date} a {end_date}."
         
+        # Agregación y métricas derivadas (proporción de sumas)
+        if group_by or derived_metrics:
+            headers, rows, errors = await run_cpu(
+                transform_report, "facebook_ads", headers, rows, None, group_by, derived_metrics, rows=len(rows)
+            )
+            if errors:
+                return "No fue posible calcular las columnas solicitadas:\n" + "\n".join(f"- {e}" for e in errors)
+
+        # Ranking y umbrales evaluados en una sola pasada
+        matched = None
+        if top_n or sort_by or where:
+            total_rows = len(rows)
+            rows, matched, errors = await run_cpu(
+                select_rows, headers, rows, top_n, sort_by, ascending, where, rows=total_rows
+            )
+            if errors:
+                return "No fue posible aplicar el filtro o ranking solicitado:\n" + "\n".join(f"- {e}" for e in errors)
+            if not rows:
+                return f"Ninguna de las {total_rows} filas cumple con las condiciones: {where}"
+        
+        # Exportar a archivo local en lugar de devolver la tabla completa
+        if export_format:
+            try:
+                return await run_cpu(
+                    export_report, headers, rows, export_format,
+                    f"facebook_ads_{customer_id}_{start_date}_{end_date}", rows=len(rows),
+                )
+            except Exception as e:
+                return f"Error al exportar datos de Facebook Ads: {str(e)}"
+        
         account_names = [account["name"] for account in formatted_accounts]
         result = [f"# Datos de Facebook Ads ({start_date} a {end_date})"]
         result.append(f"**Cuentas incluidas:** {', '.join(account_names)}")
         result.append("")
         
-        # Crear tabla en formato markdown
-        result.append("| " + " | ".join(headers) + " |")
-        result.append("| " + " | ".join(["---" for _ in headers]) + " |")
-        
-        for row in rows:
-            result.append("| " + " | ".join(str(cell) for cell in row) + " |")
+        # Crear tabla en formato markdown (fuera del bucle de eventos si es grande)
+        result.extend(await run_cpu(markdown_table, headers, rows, rows=len(rows)))
         
         # Incluir resumen numérico
         result.append("")
         result.append(f"**Total de filas:** {len(rows)}")
+        if matched is not None:
+            result.append(f"**Filas que cumplen el criterio:** {matched} de {total_rows}")
         
         # Incluir campos consultados
         result.append(f"**Campos consultados:** {', '.join(fields)}")
         
         return "\n".join(result)
     
-    @mcp.tool()
+    @tool()
     async def get_google_analytics_data(
         customer_id: str,
         accounts_selection: str,
@@ -324,6 +455,13 @@ async def register_tools(mcp: FastMCP):
         with_campaign_filter: bool = True,
         campaign_prefixes: Optional[List[str]] = None,
         filters: Optional[Dict[str, Any]] = None,
+        group_by: Optional[List[str]] = None,
+        derived_metrics: Optional[List[str]] = None,
+        top_n: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        ascending: bool = False,
+        where: Optional[str] = None,
+        export_format: Optional[str] = None,
     ) -> str:
         """
         Get Google Analytics data for specific properties
@@ -342,44 +480,58 @@ async def register_tools(mcp: FastMCP):
                 are used.
             filters: Optional custom filter dictionary. When provided, it
                 overrides ``with_campaign_filter`` and ``campaign_prefixes``.
+            group_by: Optional dimensions to aggregate by (e.g. ``["sessionCampaignName"]``),
+                summing the metrics
+            derived_metrics: Optional ratios to compute: ``ctr``, ``cpc``, ``cpm``, ``cpa``,
+                ``roas``, ``conversion_rate``. Missing base metrics are requested automatically.
+            top_n: Optional number of rows to keep after sorting by ``sort_by``
+            sort_by: Optional column to rank by (e.g. ``"sessions"``)
+            ascending: Rank from lowest to highest instead of highest first
+            where: Optional thresholds such as ``"sessions > 100, conversion_rate < 1"``
+            export_format: Optional ``"parquet"`` or ``"arrow"``. When set, the rows
+                are written to a local file and only its path and a summary are returned.
         """
+        prefetcher.customer_selected(customer_id)
         customers = await get_customers()
-        target_customer = next((c for c in customers if c["ID"] == customer_id), None)
+        target_customer = find_customer(customers, customer_id)
         if not target_customer:
-            available = ", ".join(f"{c['ID']} ({c['name']})" for c in customers)
+            available = ", ".join(f"{c.id} ({c.name})" for c in customers)
             return f"Cliente con ID {customer_id} no encontrado. Clientes disponibles: {available}"
 
-        all_ga_accounts = []
-        for account in target_customer.get("accounts", []):
-            if "propertyId" in account or "property_id" in account or account.get("provider", "").lower() == "analytics4":
-                property_id = account.get("propertyId") or account.get("property_id") or account.get("propertyID")
-                account_id = account.get("accountID") or account.get("account_id")
-                all_ga_accounts.append({
-                    "id": account_id,
-                    "account_id": account_id,
-                    "property_id": property_id,
-                    "name": account.get("name", "Sin nombre"),
-                    "credential_email": account.get("credentialEmail", "analytics@epa.digital")
-                })
+        all_ga_accounts = google_analytics_accounts(target_customer)
 
         if not all_ga_accounts:
-            return f"El cliente {target_customer['name']} no tiene propiedades de Google Analytics configuradas."
+            return f"El cliente {target_customer.name} no tiene propiedades de Google Analytics configuradas."
 
-        accounts = parse_account_selection(accounts_selection, all_ga_accounts)
+        accounts = parse_account_selection(accounts_selection, all_ga_accounts, "google_analytics", target_customer)
         if not accounts:
             available = [f"{a['property_id']} ({a['name']})" for a in all_ga_accounts]
             return (
-                f"No se encontraron las propiedades de Google Analytics solicitadas para {target_customer['name']}.\n"
+                f"No se encontraron las propiedades de Google Analytics solicitadas para {target_customer.name}.\n"
                 f"Selección solicitada: {accounts_selection}\n"
                 f"Propiedades disponibles: {', '.join(available)}"
             )
 
+        validate = bool(dimensions or metrics)
         if not dimensions:
             dimensions = ["date", "sessionCampaignName", "sessionSourceMedium"]
 
         if not metrics:
             metrics = ["sessions", "transactions", "totalRevenue"]
 
+        # Agregar las métricas base necesarias para las métricas derivadas (se validan con las demás)
+        if derived_metrics:
+            extra = [m for m in required_metrics("google_analytics", derived_metrics) if m not in metrics]
+            metrics = metrics + extra
+            validate = validate or bool(extra)
+
+        if validate:
+            plan = await planner.plan_google_analytics(dimensions, metrics, accounts)
+            if not plan.ok:
+                return plan.error_message()
+            dimensions = plan.columns["dimensions"]
+            metrics = plan.columns["metrics"]
+
         final_filters = None
         if filters:
             final_filters = filters
@@ -391,6 +543,7 @@ async def register_tools(mcp: FastMCP):
                 ]
             }
 
+        progress.plan(1, len(accounts))
         try:
             data = await get_google_analytics_report(
                 accounts=accounts,
@@ -406,6 +559,7 @@ async def register_tools(mcp: FastMCP):
         if "errors" in data and data["errors"]:
             return f"Errores en la API: {data['errors']}"
 
+        data = await run_cpu(maybe_spill, data, rows=len(data.get("rows") or []))
         headers = data.get("headers", [])
         rows = data.get("rows", [])
 
@@ -414,20 +568,394 @@ async def register_tools(mcp: FastMCP):
                 f"No se encontraron datos para las propiedades seleccionadas en el período {start_date} a {end_date}."
             )
 
+        if group_by or derived_metrics:
+            headers, rows, errors = await run_cpu(
+                transform_report, "google_analytics", headers, rows, metrics, group_by, derived_metrics, rows=len(rows)
+            )
+            if errors:
+                return "No fue posible calcular las columnas solicitadas:\n" + "\n".join(f"- {e}" for e in errors)
+
+        # Ranking y umbrales evaluados en una sola pasada
+        matched = None
+        if top_n or sort_by or where:
+            total_rows = len(rows)
+            rows, matched, errors = await run_cpu(
+                select_rows, headers, rows, top_n, sort_by, ascending, where, rows=total_rows
+            )
+            if errors:
+                return "No fue posible aplicar el filtro o ranking solicitado:\n" + "\n".join(f"- {e}" for e in errors)
+            if not rows:
+                return f"Ninguna de las {total_rows} filas cumple con las condiciones: {where}"
+
+        if export_format:
+            try:
+                return await run_cpu(
+                    export_report, headers, rows, export_format,
+                    f"google_analytics_{customer_id}_{start_date}_{end_date}", rows=len(rows),
+                )
+            except Exception as e:
+                return f"Error al exportar datos de Google Analytics: {str(e)}"
+
         result = [f"# Datos de Google Analytics ({start_date} a {end_date})"]
         result.append("")
-        result.append("| " + " | ".join(headers) + " |")
-        result.append("| " + " | ".join(["---" for _ in headers]) + " |")
-
-        for row in rows:
-            result.append("| " + " | ".join(str(cell) for cell in row) + " |")
+        result.extend(await run_cpu(markdown_table, headers, rows, rows=len(rows)))
 
         result.append("")
         result.append(f"**Total de filas:** {len(rows)}")
+        if matched is not None:
+            result.append(f"**Filas que cumplen el criterio:** {matched} de {total_rows}")
         result.append(f"**Propiedades incluidas:** {', '.join(a['name'] for a in accounts)}")
 
         return "\n".join(result)
 
+    @tool()
+    async def compare_periods(
+        customer_id: str,
+        platform: str,
+        accounts_selection: str,
+        start_date: str,
+        end_date: str,
+        compare_start_date: Optional[str] = None,
+        compare_end_date: Optional[str] = None,
+        metrics: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Compare a period against another one (e.g. this month vs last month) in a single call
+
+        Both periods are fetched concurrently, aggregated per campaign (dates are
+        ignored in the key) and joined, returning absolute and percentage deltas.
+
+        Args:
+            customer_id: The customer ID
+            platform: "google_ads", "facebook_ads" or "google_analytics"
+            accounts_selection: Selection string with numbers or IDs
+            start_date: Start date of the current period in YYYY-MM-DD format
+            end_date: End date of the current period in YYYY-MM-DD format
+            compare_start_date: Start of the comparison period (defaults to the
+                period of the same length right before ``start_date``)
+            compare_end_date: End of the comparison period
+            metrics: Optional additive metrics or fields (defaults to the platform defaults)
+        """
+        if platform not in PLATFORM_LABELS:
+            return f"Plataforma no soportada: {platform}. Opciones: {', '.join(PLATFORM_LABELS)}"
+        label = PLATFORM_LABELS[platform]
+
+        prefetcher.customer_selected(customer_id)
+        customers = await get_customers()
+        target_customer = find_customer(customers, customer_id)
+        if not target_customer:
+            available = ", ".join(f"{c.id} ({c.name})" for c in customers)
+            return f"Cliente con ID {customer_id} no encontrado. Clientes disponibles: {available}"
+
+        all_accounts = platform_accounts(target_customer, platform)
+        accounts = parse_account_selection(accounts_selection, all_accounts, platform, target_customer)
+        if not accounts:
+            available = [f"{a['id']} ({a['name']})" for a in all_accounts]
+            return (
+                f"No se encontraron las cuentas de {label} solicitadas para {target_customer.name}.\n"
+                f"Selección solicitada: {accounts_selection}\n"
+                f"Cuentas disponibles: {', '.join(available) or 'ninguna'}"
+            )
+
+        if not (compare_start_date and compare_end_date):
+            try:
+                compare_start_date, compare_end_date = previous_period(start_date, end_date)
+            except ValueError:
+                return "Las fechas deben tener el formato YYYY-MM-DD."
+
+        progress.plan(2, 2 * len(accounts))
+        try:
+            current, previous = await asyncio.gather(
+                fetch_platform_report(platform, accounts, start_date, end_date, metrics),
+                fetch_platform_report(platform, accounts, compare_start_date, compare_end_date, metrics),
+            )
+        except Exception as e:
+            return f"Error al obtener datos de {label}: {str(e)}"
+
+        for data in (current, previous):
+            if data.get("errors"):
+                return f"Errores en la API: {data['errors']}"
+
+        headers = current.get("headers") or previous.get("headers") or []
+        metric_idx = metric_indexes(platform, headers, metrics)
+        if not metric_idx:
+            return f"No se encontraron columnas de métricas en la respuesta de {label}: {', '.join(headers)}"
+        key_idx = [
+            i for i, h in enumerate(headers) if i not in metric_idx and str(h) not in DATE_COLUMNS
+        ]
+
+        current_rows = current.get("rows", [])
+        previous_rows = previous.get("rows", [])
+        joined = await run_cpu(
+            lambda: join_periods(
+                aggregate(current_rows, key_idx, metric_idx),
+                aggregate(previous_rows, key_idx, metric_idx),
+            ),
+            rows=len(current_rows) + len(previous_rows),
+        )
+        if not joined:
+            return f"No se encontraron datos en ninguno de los dos períodos para {target_customer.name}."
+        joined.sort(key=lambda item: item[1][0], reverse=True)
+
+        key_headers = [headers[i] for i in key_idx]
+        metric_headers = [headers[i] for i in metric_idx]
+
+        result = [f"# Comparación de períodos de {label}"]
+        result.append(f"**Cliente:** {target_customer.name}")
+        result.append(f"**Período actual:** {start_date} a {end_date}")
+        result.append(f"**Período de comparación:** {compare_start_date} a {compare_end_date}")
+        result.append("")
+
+        columns = list(key_headers)
+        for name in metric_headers:
+            columns += [f"{name} (actual)", f"{name} (anterior)", f"{name} Δ", f"{name} Δ%"]
+        result.append("| " + " | ".join(columns) + " |")
+        result.append("| " + " | ".join(["---" for _ in columns]) + " |")
+
+        def delta_cells(now: List[float], before: List[float]) -> List[str]:
+            cells = []
+            for a, b in zip(now, before):
+                change = percent_change(a, b)
+                cells += [
+                    format_number(a),
+                    format_number(b),
+                    format_number(a - b),
+                    f"{change:+.1f}%" if change is not None else "—",
+                ]
+            return cells
+
+        totals_now = [sum(item[1][j] for item in joined) for j in range(len(metric_idx))]
+        totals_before = [sum(item[2][j] for item in joined) for j in range(len(metric_idx))]
+        total_label = ["**Total**"] + ["" for _ in key_headers[1:]] if key_headers else []
+        result.append("| " + " | ".join(total_label + delta_cells(totals_now, totals_before)) + " |")
+
+        for key, now, before in joined:
+            result.append("| " + " | ".join([str(k) for k in key] + delta_cells(now, before)) + " |")
+
+        result.append("")
+        result.append(f"**Total de filas:** {len(joined)}")
+        result.append(f"**Cuentas incluidas:** {', '.join(a['name'] for a in accounts)}")
+
+        return "\n".join(result)
+
+    @tool()
+    async def get_campaign_blend(
+        customer_id: str,
+        start_date: str,
+        end_date: str,
+        per_date: bool = True,
+        normalization: Optional[List[str]] = None,
+        google_ads_prefix: str = "aw_",
+        facebook_prefix: str = "fb_",
+        with_campaign_filter: bool = True,
+    ) -> str:
+        """
+        Blend GA4 sessions and revenue with Google Ads and Facebook Ads spend per campaign
+
+        GA4 ``sessionCampaignName`` is joined with Google Ads ``campaign.name`` and
+        Facebook ``campaign_name`` (per date by default) after normalizing the names,
+        returning one table with spend, clicks, sessions, revenue and ROAS. GA4
+        campaigns starting with ``google_ads_prefix`` only match Google Ads campaigns
+        and those starting with ``facebook_prefix`` only match Facebook ones.
+
+        Args:
+            customer_id: The customer ID
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            per_date: Join per date; ``False`` sums the whole period per campaign
+            normalization: Optional rules applied to campaign names before joining:
+                ``prefix`` (drop the platform prefix), ``lowercase``, ``accents`` and
+                ``separators`` (spaces, ``_``, ``-``, ``.``, ``|``... are equivalent).
+                Defaults to ``BLEND_NORMALIZATION`` (all of them).
+            google_ads_prefix: Prefix of Google Ads campaigns in GA4 (default ``aw_``)
+            facebook_prefix: Prefix of Facebook Ads campaigns in GA4 (default ``fb_``)
+            with_campaign_filter: Only request GA4 campaigns containing one of the prefixes
+        """
+        prefetcher.customer_selected(customer_id)
+        customers = await get_customers()
+        target_customer = find_customer(customers, customer_id)
+        if not target_customer:
+            available = ", ".join(f"{c.id} ({c.name})" for c in customers)
+            return f"Cliente con ID {customer_id} no encontrado. Clientes disponibles: {available}"
+
+        ga_accounts = google_analytics_accounts(target_customer)
+        if not ga_accounts:
+            return f"El cliente {target_customer.name} no tiene propiedades de Google Analytics configuradas."
+        ad_accounts = {
+            platform: accounts
+            for platform, accounts in (
+                ("google_ads", google_ads_accounts(target_customer)),
+                ("facebook_ads", facebook_ads_accounts(target_customer)),
+            )
+            if accounts
+        }
+        if not ad_accounts:
+            return f"El cliente {target_customer.name} no tiene cuentas de Google Ads ni de Facebook Ads configuradas."
+
+        prefixes = {google_ads_prefix: "google_ads", facebook_prefix: "facebook_ads"}
+        try:
+            normalize = campaign_normalizer(normalization or BLEND_NORMALIZATION, [p for p in prefixes if p])
+        except ValueError as e:
+            return str(e)
+
+        filters = None
+        if with_campaign_filter and any(prefixes):
+            filters = {"or": [{"in": [p, {"var": "sessionCampaignName"}]} for p in prefixes if p]}
+
+        progress.plan(1 + len(ad_accounts), len(ga_accounts) + sum(len(a) for a in ad_accounts.values()))
+        platforms = list(ad_accounts)
+        try:
+            reports = await asyncio.gather(
+                fetch_platform_report("google_analytics", ga_accounts, start_date, end_date, filters=filters),
+                *(fetch_platform_report(p, ad_accounts[p], start_date, end_date) for p in platforms),
+            )
+        except Exception as e:
+            return f"Error al obtener los datos para combinar: {str(e)}"
+
+        for data in reports:
+            if data.get("errors"):
+                return f"Errores en la API: {data['errors']}"
+
+        analytics, ads = reports[0], dict(zip(platforms, reports[1:]))
+        total_rows = sum(len(data.get("rows") or []) for data in reports)
+        rows, summary = await run_cpu(
+            blend_reports, ads, analytics, normalize, prefixes, PLATFORM_LABELS, per_date, rows=total_rows
+        )
+        if not rows:
+            return f"No se encontraron campañas para combinar en el período {start_date} a {end_date}."
+
+        result = [f"# Inversión y resultados por campaña ({start_date} a {end_date})"]
+        result.append(f"**Cliente:** {target_customer.name}")
+        result.append(
+            f"**Plataformas:** Google Analytics, {', '.join(PLATFORM_LABELS[p] for p in platforms)}"
+        )
+        result.append("")
+        result.extend(await run_cpu(blend_table, rows, per_date, rows=len(rows)))
+        result.append("")
+        roas = f"{summary['roas']:.2f}" if summary["roas"] is not None else "—"
+        result.append(
+            f"**Totales:** inversión {format_number(summary['spend'])} · clics {format_number(summary['clicks'])} · "
+            f"sesiones {format_number(summary['sessions'])} · ingresos {format_number(summary['revenue'])} · "
+            f"ROAS {roas}"
+        )
+        result.append(
+            f"**Campañas con sesiones en GA4:** {summary['matches']} de {summary['ad_campaigns']}"
+        )
+        if summary["ga_only"]:
+            result.append(f"**Campañas solo en GA4 (sin inversión encontrada):** {summary['ga_only']}")
+        if summary["unmatched_sessions"]:
+            result.append(
+                f"**Sesiones de campañas sin prefijo ni coincidencia:** {format_number(summary['unmatched_sessions'])}"
+            )
+        result.append(f"**Total de filas:** {len(rows)}")
+
+        return "\n".join(result)
+
+    @tool()
+    async def get_portfolio_report(
+        platform: str,
+        start_date: str,
+        end_date: str,
+        status: Optional[str] = "active",
+        query: Optional[str] = None,
+        metrics: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Get the same report for many customers at once, summarized per customer
+
+        Useful for questions about a whole book of customers, such as yesterday's
+        spend for every active customer. Customers are resolved from the customers
+        list once and their reports are fetched concurrently (bounded and rate
+        limited); each customer's metrics are summed over the period.
+
+        Args:
+            platform: "google_ads", "facebook_ads" or "google_analytics"
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            status: Only customers with this status, in English or Spanish and
+                ignoring case (default ``"active"``, which matches ``"Activo"``;
+                ``"all"`` for any)
+            query: Optional text to select customers by name or ID (same search as
+                ``get_customers_data``)
+            metrics: Optional additive metrics or fields (defaults to the platform defaults)
+        """
+        if platform not in PLATFORM_LABELS:
+            return f"Plataforma no soportada: {platform}. Opciones: {', '.join(PLATFORM_LABELS)}"
+        label = PLATFORM_LABELS[platform]
+
+        customers = await get_customers()
+        matches = await search_customers(query, limit=len(customers)) if query else None
+        selected = select_customers(customers, status, matches)
+        if not selected:
+            return "Ningún cliente coincide con el filtro solicitado."
+
+        accounts_by_customer = {c.id: platform_accounts(c, platform) for c in selected}
+        without_accounts = [c for c in selected if not accounts_by_customer[c.id]]
+        targets = [c for c in selected if accounts_by_customer[c.id]]
+        if not targets:
+            return f"Ninguno de los {len(selected)} clientes seleccionados tiene cuentas de {label}."
+        truncated = len(targets) > PORTFOLIO_MAX_CUSTOMERS
+        targets = targets[:PORTFOLIO_MAX_CUSTOMERS]
+
+        progress.plan(len(targets), sum(len(accounts_by_customer[c.id]) for c in targets))
+        results = await fetch_portfolio(
+            targets,
+            lambda c: fetch_platform_report(platform, accounts_by_customer[c.id], start_date, end_date, metrics),
+        )
+
+        columns: List[str] = []
+        summaries = []
+        errors = []
+        for customer, data, error in results:
+            if error is not None:
+                errors.append(f"- {customer.name} ({customer.id}): {error}")
+                continue
+            headers = data.get("headers") or []
+            metric_idx = metric_indexes(platform, headers, metrics)
+            totals = await run_cpu(summarize_report, data, metric_idx, rows=len(data.get("rows") or []))
+            values = {str(headers[i]): v for i, v in zip(metric_idx, totals)}
+            columns += [name for name in values if name not in columns]
+            summaries.append((customer, values))
+
+        result = [f"# Cartera de {label} ({start_date} a {end_date})"]
+        criteria = [f"estado '{status}'" if status and status.lower() != "all" else "todos los estados"]
+        if query:
+            criteria.append(f"búsqueda '{query}'")
+        result.append(f"**Filtro:** {', '.join(criteria)}")
+        result.append(f"**Clientes consultados:** {len(targets)} de {len(selected)} seleccionados")
+        result.append("")
+
+        if summaries:
+            summaries.sort(key=lambda item: item[1].get(columns[0], 0.0) if columns else 0.0, reverse=True)
+            table_rows = []
+            for i, (customer, values) in enumerate(summaries, 1):
+                table_rows.append(
+                    [i, customer.name, customer.id, len(accounts_by_customer[customer.id])]
+                    + [format_number(values.get(name, 0.0)) for name in columns]
+                )
+            totals = [sum(values.get(name, 0.0) for _, values in summaries) for name in columns]
+            table_rows.append(
+                ["", "**Total**", "", sum(len(accounts_by_customer[c.id]) for c, _ in summaries)]
+                + [format_number(v) for v in totals]
+            )
+            result.extend(markdown_table(["#", "Cliente", "ID", "Cuentas"] + columns, table_rows))
+            result.append("")
+
+        if truncated:
+            result.append(
+                f"**Aviso:** se consultaron solo los primeros {PORTFOLIO_MAX_CUSTOMERS} clientes; "
+                "acote el filtro para ver el resto."
+            )
+        if without_accounts:
+            names = ", ".join(c.name for c in without_accounts[:20])
+            more = f" y {len(without_accounts) - 20} más" if len(without_accounts) > 20 else ""
+            result.append(f"**Sin cuentas de {label}:** {names}{more}")
+        if errors:
+            result.append(f"**Clientes con errores ({len(errors)}):**")
+            result.extend(errors)
+
+        return "\n".join(result)
+
     async def list_accounts_by_medium(customer_id: str) -> str:
         """
         List all available accounts for a specific customer, grouped by medium
@@ -435,55 +963,26 @@ async def register_tools(mcp: FastMCP):
         Args:
             customer_id: The customer ID
         """
+        prefetcher.customer_selected(customer_id)
         customers = await get_customers()
         
-        target_customer = None
-        for customer in customers:
-            if customer["ID"] == customer_id:
-                target_customer = customer
-                break
+        target_customer = find_customer(customers, customer_id)
         
         if not target_customer:
-            available_customers = [f"{c['ID']} ({c['name']})" for c in customers]
+            available_customers = [f"{c.id} ({c.name})" for c in customers]
             return f"Cliente con ID {customer_id} no encontrado. Clientes disponibles: {', '.join(available_customers)}"
         
-        customer_name = target_customer["name"]
+        customer_name = target_customer.name
         
         # Agrupar cuentas por tipo de medio
         accounts_by_medium = {
-            "google_ads": [],
-            "facebook_ads": [],
-            "google_analytics": [],
-            "other": []
+            "google_ads": target_customer.accounts_for("adwords"),
+            "facebook_ads": target_customer.accounts_for("facebook"),
+            "google_analytics": target_customer.accounts_for("analytics4"),
         }
-        
-        for account in target_customer.get("accounts", []):
-            if account.get("provider") == "adwords":
-                accounts_by_medium["google_ads"].append({
-                    "id": account.get("accountID", "N/A"),
-                    "name": account.get("name", "Sin nombre"),
-                    "login_customer_id": account.get("externalLoginCustomerID", "")
-                })
-            elif account.get("provider", "").lower() in ["fb", "facebook"]:
-                accounts_by_medium["facebook_ads"].append({
-                    "id": account.get("accountID", "N/A"),
-                    "name": account.get("name", "Sin nombre")
-                })
-            elif "propertyId" in account or "property_id" in account or account.get("provider", "").lower() == "analytics4":
-                property_id = account.get("propertyId") or account.get("property_id") or account.get("propertyID", "N/A")
-                account_id = account.get("accountID") or account.get("account_id", "N/A")
-                accounts_by_medium["google_analytics"].append({
-                    "id": account_id,
-                    "property_id": property_id,
-                    "name": account.get("name", "Sin nombre"),
-                    "credential_email": account.get("credentialEmail", "analytics@epa.digital")
-                })
-            else:
-                accounts_by_medium["other"].append({
-                    "id": account.get("accountID", "N/A"),
-                    "name": account.get("name", "Sin nombre"),
-                    "provider": account.get("provider", "desconocido")
-                })
+        accounts_by_medium["other"] = [
+            a for a in target_customer.accounts if a.provider not in ("adwords", "facebook", "analytics4")
+        ]
         
         # Formatear la respuesta
         result = [f"# Cuentas disponibles para {customer_name} (ID: {customer_id})\n"]
@@ -508,7 +1007,7 @@ async def register_tools(mcp: FastMCP):
             result.append("| # | Nombre | ID | Login Customer ID |")
             result.append("| --- | --- | --- | --- |")
             for i, account in enumerate(accounts_by_medium["google_ads"], 1):
-                result.append(f"| {i} | {account['name']} | {account['id']} | {account['login_customer_id']} |")
+                result.append(f"| {i} | {account.name} | {account.account_id} | {account.login_customer_id or ''} |")
             result.append("\n**Para seleccionar todas las cuentas de Google Ads use:** `all_google_ads`")
         else:
             result.append("*No se encontraron cuentas de Google Ads*")
@@ -519,7 +1018,7 @@ async def register_tools(mcp: FastMCP):
             result.append("| # | Nombre | ID |")
             result.append("| --- | --- | --- |")
             for i, account in enumerate(accounts_by_medium["facebook_ads"], 1):
-                result.append(f"| {i} | {account['name']} | {account['id']} |")
+                result.append(f"| {i} | {account.name} | {account.account_id} |")
             result.append("\n**Para seleccionar todas las cuentas de Facebook Ads use:** `all_facebook_ads`")
         else:
             result.append("*No se encontraron cuentas de Facebook Ads*")
@@ -530,7 +1029,7 @@ async def register_tools(mcp: FastMCP):
             result.append("| # | Nombre | Property ID | Account ID | Email |")
             result.append("| --- | --- | --- | --- | --- |")
             for i, account in enumerate(accounts_by_medium["google_analytics"], 1):
-                result.append(f"| {i} | {account['name']} | {account['property_id']} | {account['id']} | {account['credential_email']} |")
+                result.append(f"| {i} | {account.name} | {account.property_id or 'N/A'} | {account.account_id} | {account.credential_email or DEFAULT_CREDENTIAL_EMAIL} |")
             result.append("\n**Para seleccionar todas las propiedades de Google Analytics use:** `all_google_analytics`")
         else:
             result.append("*No se encontraron propiedades de Google Analytics*")
@@ -541,17 +1040,19 @@ async def register_tools(mcp: FastMCP):
             result.append("| # | Nombre | ID | Proveedor |")
             result.append("| --- | --- | --- | --- |")
             for i, account in enumerate(accounts_by_medium["other"], 1):
-                result.append(f"| {i} | {account['name']} | {account['id']} | {account['provider']} |")
+                result.append(f"| {i} | {account.name} | {account.account_id} | {account.provider} |")
         
         # Agregar ayuda para comandos rápidos
         result.append("\n## Comandos rápidos")
         result.append("- `all`: Seleccionar todas las cuentas disponibles")
         result.append("- `[número]`: Seleccionar por número de la tabla (ej: `1,3,5`)")
         result.append("- `id:[ID]`: Seleccionar por ID específico (ej: `id:123456789,id:987654321`)")
+        result.append("- `[inicio]-[fin]`: Seleccionar un rango de la tabla (ej: `1-40`)")
+        result.append("- `[nombre]`: Seleccionar por nombre; use `*` como comodín (ej: `tienda*`)")
 
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def analytics4_metadata() -> str:
         """Show available GA4 dimensions and metrics"""
         try:
@@ -578,7 +1079,7 @@ async def register_tools(mcp: FastMCP):
 
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def facebook_schema() -> str:
         """Display Facebook Ads fields schema"""
         try:
@@ -595,7 +1096,7 @@ async def register_tools(mcp: FastMCP):
             result.append(f"| {field.get('name')} | {field.get('type', '')} |")
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def adwords_resources() -> str:
         """List Google Ads resources"""
         try:
@@ -610,7 +1111,7 @@ async def register_tools(mcp: FastMCP):
         result.extend(f"- {r}" for r in resources)
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def adwords_attributes(resource_name: str) -> str:
         """List attributes for a Google Ads resource"""
         try:
@@ -625,7 +1126,7 @@ async def register_tools(mcp: FastMCP):
         result.extend(f"- {a}" for a in attrs)
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def adwords_segments(resource_name: str) -> str:
         """List segments for a Google Ads resource"""
         try:
@@ -640,7 +1141,7 @@ async def register_tools(mcp: FastMCP):
         result.extend(f"- {s}" for s in segs)
         return "\n".join(result)
 
-    @mcp.tool()
+    @tool()
     async def adwords_metrics(resource_name: str) -> str:
         """List metrics for a Google Ads resource"""
         try:
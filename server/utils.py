@@ -1,7 +1,13 @@
 # server/utils.py
+import bisect
+import fnmatch
+import re
 from datetime import datetime, timedelta
 from typing import Tuple, Optional, List, Dict
 
+from pitagoras.models import Customer
+from pitagoras.text import fold_text
+
 def parse_date_range(date_range: str) -> Tuple[str, str]:
     """
     Parse various date range formats into start and end dates
@@ -51,7 +57,140 @@ def format_csv_data(headers: list, rows: list) -> str:
     return "\n".join(result)
 
 
-def parse_account_selection(selection: str, accounts: List[Dict]) -> List[Dict]:
+# Palabras clave que seleccionan todas las cuentas de una plataforma
+PLATFORM_KEYWORDS = {
+    "all_google_ads": "google_ads",
+    "all_facebook_ads": "facebook_ads",
+    "all_google_analytics": "google_analytics",
+}
+
+_RANGE_RE = re.compile(r"^(\d+)\s*-\s*(\d+)$")
+# IDs de Google Ads con guiones (123-456-7890), que también se aceptan sin ellos
+_GOOGLE_ADS_ID_RE = re.compile(r"^\d{3}-\d{3}-\d{4}$")
+
+
+def _account_id(account: Dict) -> str:
+    return str(account.get('id') or account.get('account_id'))
+
+
+def _id_key(account_id: str) -> str:
+    return account_id.replace('-', '') if _GOOGLE_ADS_ID_RE.match(account_id) else account_id
+
+
+class AccountIndex:
+    """Prebuilt lookups over a list of accounts for fast selection parsing.
+
+    Holds an ID map, a map of accent-folded names and a sorted list of folded
+    names for prefix queries, so each selection token costs a dictionary
+    lookup or a binary search instead of a scan over every account.
+    """
+
+    def __init__(self, accounts: List[Dict], platform: Optional[str] = None):
+        self.accounts = accounts
+        self.platform = platform
+        self.by_id: Dict[str, int] = {}
+        self.by_name: Dict[str, List[int]] = {}
+        for position, account in enumerate(accounts):
+            acc_id = _account_id(account)
+            if acc_id and acc_id != 'None':
+                self.by_id.setdefault(acc_id, position)
+                self.by_id.setdefault(_id_key(acc_id), position)
+            name = fold_text(account.get('name') or '')
+            if name:
+                self.by_name.setdefault(name, []).append(position)
+        self.sorted_names = sorted(self.by_name)
+
+    def lookup_id(self, token: str) -> Optional[int]:
+        return self.by_id.get(token, self.by_id.get(_id_key(token)))
+
+    def prefix(self, prefix: str) -> List[int]:
+        """Positions of accounts whose folded name starts with ``prefix``."""
+        positions: List[int] = []
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        for name in self.sorted_names[start:]:
+            if not name.startswith(prefix):
+                break
+            positions.extend(self.by_name[name])
+        return sorted(positions)
+
+    def glob(self, pattern: str) -> List[int]:
+        """Positions of accounts whose folded name matches a ``*``/``?`` pattern."""
+        head = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        if pattern == head + "*":
+            return self.prefix(head)
+        candidates = self.sorted_names
+        if head:
+            start = bisect.bisect_left(candidates, head)
+            candidates = [n for n in candidates[start:] if n.startswith(head)]
+        positions: List[int] = []
+        for name in candidates:
+            if fnmatch.fnmatchcase(name, pattern):
+                positions.extend(self.by_name[name])
+        return sorted(positions)
+
+    def resolve(self, token: str) -> List[int]:
+        """Positions selected by a single token."""
+        low = token.lower()
+        if low == 'all':
+            return list(range(len(self.accounts)))
+
+        if low in PLATFORM_KEYWORDS:
+            if self.platform is None or PLATFORM_KEYWORDS[low] == self.platform:
+                return list(range(len(self.accounts)))
+            return []
+
+        if low.startswith('id:'):
+            position = self.lookup_id(token.split(':', 1)[1].strip())
+            return [] if position is None else [position]
+
+        if token.isdigit():
+            index = int(token) - 1
+            if 0 <= index < len(self.accounts):
+                return [index]
+            # Números fuera de la tabla pueden ser IDs de cuenta
+            position = self.lookup_id(token)
+            return [] if position is None else [position]
+
+        # Los rangos van antes que los IDs: "1-40" no debe resolverse como la cuenta 140
+        match = _RANGE_RE.match(token)
+        if match:
+            first, last = sorted(int(n) for n in match.groups())
+            first, last = max(first, 1), min(last, len(self.accounts))
+            return list(range(first - 1, last))
+
+        position = self.lookup_id(token)
+        if position is not None:
+            return [position]
+
+        folded = fold_text(token)
+        if '*' in folded or '?' in folded:
+            return self.glob(folded)
+        return list(self.by_name.get(folded, []))
+
+
+def get_account_index(
+    accounts: List[Dict], platform: Optional[str] = None, customer: Optional[Customer] = None
+) -> AccountIndex:
+    """Return the :class:`AccountIndex` for ``accounts``.
+
+    With ``customer`` the index is kept on the customer, which is replaced
+    when the customers list is reloaded, so it is built once per load.
+    """
+    if customer is None:
+        return AccountIndex(accounts, platform)
+    key = platform or ""
+    index = customer.account_indexes.get(key)
+    if index is None or len(index.accounts) != len(accounts):
+        index = customer.account_indexes[key] = AccountIndex(accounts, platform)
+    return index
+
+
+def parse_account_selection(
+    selection: str,
+    accounts: List[Dict],
+    platform: Optional[str] = None,
+    customer: Optional[Customer] = None,
+) -> List[Dict]:
     """Interpret a user selection string and return the matching accounts.
 
     Parameters
@@ -60,60 +199,45 @@ def parse_account_selection(selection: str, accounts: List[Dict]) -> List[Dict]:
         User provided string such as ``"1,3,id:123"``.
     accounts: list[dict]
         Available account objects. Each must contain an ``id`` or ``account_id`` field.
+    platform: str, optional
+        Platform of ``accounts`` (``google_ads``, ``facebook_ads`` or
+        ``google_analytics``) used to resolve the ``all_<platform>`` keywords.
+    customer: Customer, optional
+        Owner of ``accounts``; its index for ``platform`` is reused between calls.
 
     Returns
     -------
     list[dict]
-        Accounts corresponding to the selection. Supports numbers (1 based),
-        ``id:<ID>``, raw IDs and the literal ``all``.
+        Accounts corresponding to the selection, without duplicates. Supports
+        numbers (1 based), ranges (``1-40``), ``id:<ID>``, raw IDs, exact
+        names (case and accent insensitive), name patterns (``tienda*``,
+        ``*mx``), the literal ``all`` and ``all_google_ads``,
+        ``all_facebook_ads`` or ``all_google_analytics``.
     """
     if not selection:
         return []
 
     tokens = [s.strip() for s in selection.split(',') if s.strip()]
-
-    id_map = {}
-    for account in accounts:
-        acc_id = str(account.get('id') or account.get('account_id'))
-        if acc_id:
-            id_map[acc_id] = account
+    index = get_account_index(accounts, platform, customer)
 
     selected: List[Dict] = []
-    seen_ids = set()
-
+    seen = set()
     for token in tokens:
-        low = token.lower()
-        if low == 'all':
-            return accounts
+        for position in index.resolve(token):
+            if position not in seen:
+                seen.add(position)
+                selected.append(accounts[position])
+            if len(seen) == len(accounts):
+                return selected
 
-        if low.startswith('id:'):
-            token_id = token.split(':', 1)[1]
-            acc = id_map.get(token_id)
-            if acc and token_id not in seen_ids:
-                selected.append(acc)
-                seen_ids.add(token_id)
-            continue
+    return selected
 
-        if token.isdigit():
-            idx = int(token) - 1
-            if 0 <= idx < len(accounts):
-                acc = accounts[idx]
-                acc_id = str(acc.get('id') or acc.get('account_id'))
-                if acc_id not in seen_ids:
-                    selected.append(acc)
-                    seen_ids.add(acc_id)
-            continue
-
-        acc = id_map.get(token)
-        if not acc:
-            for a in accounts:
-                if a.get('name', '').lower() == low:
-                    acc = a
-                    break
-        if acc:
-            acc_id = str(acc.get('id') or acc.get('account_id'))
-            if acc_id not in seen_ids:
-                selected.append(acc)
-                seen_ids.add(acc_id)
 
-    return selected
+def previous_period(start_date: str, end_date: str) -> Tuple[str, str]:
+    """Return the period of the same length immediately before the given one."""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    length = end - start
+    prev_end = start - timedelta(days=1)
+    prev_start = prev_end - length
+    return prev_start.strftime("%Y-%m-%d"), prev_end.strftime("%Y-%m-%d")
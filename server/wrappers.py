@@ -0,0 +1,111 @@
+# server/wrappers.py
+import asyncio
+import functools
+import inspect
+import logging
+from typing import Any, Awaitable, Callable
+
+from mcp.server.fastmcp import FastMCP
+
+from pitagoras import progress
+from pitagoras.deadline import deadline
+from .memory import memory_tracker
+from .profiling import profiles
+
+logger = logging.getLogger("pitagoras.tools")
+
+ToolFunction = Callable[..., Awaitable[Any]]
+
+
+def with_deadline(fn: ToolFunction, seconds: float) -> ToolFunction:
+    """Bound a tool call to ``seconds``.
+
+    The deadline is visible to every upstream request made by the call,
+    which clamps its timeout to the time left. When it passes, the call and
+    its outstanding subrequests are cancelled and a message is returned.
+    The wrapper keeps the tool's name, docstring and signature.
+    """
+    if not seconds or seconds <= 0:
+        return fn
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with deadline(seconds):
+            try:
+                async with asyncio.timeout(seconds):
+                    return await fn(*args, **kwargs)
+            except TimeoutError:
+                logger.warning(f"{fn.__name__} exceeded its {seconds:g}s deadline and was cancelled")
+                return (
+                    f"La consulta superó el tiempo límite de {seconds:g} segundos y se canceló. "
+                    "Intente con un rango de fechas menor o con menos cuentas."
+                )
+
+    return wrapper
+
+
+def with_progress(fn: ToolFunction, mcp: FastMCP) -> ToolFunction:
+    """Send MCP progress notifications while a tool call runs.
+
+    Only when the client sent a progress token. Each completed fetch is
+    reported as a progress notification (fetches done / planned) plus a log
+    message with the accounts done, rows fetched and elapsed time.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            ctx = mcp.get_context()
+            meta = ctx.request_context.meta
+        except (LookupError, ValueError):
+            meta = None
+        if meta is None or meta.progressToken is None:
+            return await fn(*args, **kwargs)
+
+        async def send(done: float, total: float, message: str) -> None:
+            await ctx.report_progress(done, total)
+            await ctx.info(message)
+
+        with progress.tracking(send):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+def with_memory_tracing(fn: ToolFunction) -> ToolFunction:
+    """Account the peak and retained memory of each call while tracing is on.
+
+    See ``pitagoras://memory`` for the per-tool totals and allocation sites.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with memory_tracker.record(fn.__name__):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+def with_profiling(fn: ToolFunction, always: bool = False) -> ToolFunction:
+    """Profile tool calls with cProfile when ``always`` or when asked.
+
+    Adds an optional ``profile`` argument to the tool so a single slow call
+    can be profiled without restarting the server. The profile is written
+    to ``PROFILE_DIR`` and summarized in ``pitagoras://profiles/latest``.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, profile: bool = False, **kwargs: Any) -> Any:
+        if not (always or profile):
+            return await fn(*args, **kwargs)
+        with profiles.record(fn.__name__):
+            return await fn(*args, **kwargs)
+
+    signature = inspect.signature(fn)
+    wrapper.__signature__ = signature.replace(
+        parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("profile", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool),
+        ]
+    )
+    return wrapper
@@ -0,0 +1,73 @@
+# tests/test_analysis.py
+from server.analysis import aggregate, join_periods, parse_conditions, percent_change, select_rows
+
+
+def test_join_periods_is_a_full_outer_join():
+    current = {("a",): [10.0, 1.0], ("b",): [5.0, 2.0]}
+    previous = {("b",): [4.0, 1.0], ("c",): [3.0, 3.0]}
+    joined = join_periods(current, previous)
+    assert joined == [
+        (("a",), [10.0, 1.0], [0.0, 0.0]),
+        (("b",), [5.0, 2.0], [4.0, 1.0]),
+        (("c",), [0.0, 0.0], [3.0, 3.0]),
+    ]
+
+
+def test_join_periods_preserves_totals():
+    current = {("a",): [10.0], ("b",): [5.0]}
+    previous = {("b",): [4.0], ("c",): [3.0]}
+    joined = join_periods(current, previous)
+    assert sum(cur[0] for _, cur, _ in joined) == 15.0
+    assert sum(prev[0] for _, _, prev in joined) == 7.0
+
+
+def test_join_periods_with_empty_current_period():
+    assert join_periods({}, {("a",): [1.0]}) == [(("a",), [0.0], [1.0])]
+    assert join_periods({}, {}) == []
+
+
+def test_percent_change():
+    assert percent_change(150, 100) == 50
+    assert percent_change(50, -100) == 150
+    assert percent_change(10, 0) is None
+
+
+def test_aggregate_sums_numeric_strings():
+    rows = [["a", "1"], ["a", "2"], ["b", None]]
+    assert aggregate(rows, [0], [1]) == {("a",): [3.0], ("b",): [0.0]}
+
+
+HEADERS = ["campaign", "metrics.clicks", "cpa"]
+ROWS = [["a", "10", 60.0], ["b", 3, 20.0], ["c", 25, None], ["d", "7", 80.5], ["e", 12, 55.0]]
+
+
+def test_select_rows_keeps_the_top_n():
+    rows, matched, errors = select_rows(HEADERS, iter(ROWS), top_n=2, sort_by="clicks")
+    assert errors == []
+    assert matched == 5
+    assert [row[0] for row in rows] == ["c", "e"]
+
+
+def test_select_rows_ascending_with_conditions():
+    rows, matched, errors = select_rows(HEADERS, ROWS, top_n=2, sort_by="cpa", ascending=True, where="cpa > 50 and clicks >= 7")
+    assert errors == []
+    assert matched == 3
+    assert [row[0] for row in rows] == ["e", "a"]
+
+
+def test_select_rows_without_sorting_keeps_the_order():
+    rows, matched, _ = select_rows(HEADERS, ROWS, top_n=2, where="cpa != 20")
+    assert matched == 3
+    assert [row[0] for row in rows] == ["a", "d"]
+
+
+def test_empty_cells_never_match_conditions():
+    predicate, errors = parse_conditions(HEADERS, "cpa >= 0")
+    assert errors == []
+    assert [row[0] for row in ROWS if predicate(row)] == ["a", "b", "d", "e"]
+
+
+def test_invalid_conditions_and_columns_are_reported():
+    rows, matched, errors = select_rows(HEADERS, ROWS, sort_by="ctr", where="clicks >> 3, cost > 1")
+    assert rows == [] and matched == 0
+    assert len(errors) == 3
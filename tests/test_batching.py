@@ -0,0 +1,78 @@
+# tests/test_batching.py
+import asyncio
+
+from pitagoras.batching import ReportBatcher, merge_reports, normalize_column, project_columns
+
+
+def test_normalize_column_strips_metrics_prefix():
+    assert normalize_column(" Metrics.Clicks ") == "clicks"
+
+
+def test_merge_reports_realigns_headers():
+    parts = [
+        {"headers": ["campaign", "metrics.clicks", "metrics.cost"], "rows": [["a", 1, 10]]},
+        {"headers": ["metrics.cost", "campaign", "clicks"], "rows": [[20, "b", 2]]},
+    ]
+    merged = merge_reports(parts)
+    assert merged["headers"] == ["campaign", "metrics.clicks", "metrics.cost"]
+    assert merged["rows"] == [["a", 1, 10], ["b", 2, 20]]
+    assert "errors" not in merged
+
+
+def test_merge_reports_fills_missing_columns_and_keeps_errors():
+    parts = [
+        {"headers": ["campaign", "clicks"], "rows": [["a", 1]]},
+        {"headers": ["campaign"], "rows": [["b"]], "errors": "cuenta 2 sin acceso"},
+    ]
+    merged = merge_reports(parts)
+    assert merged["rows"] == [["a", 1], ["b", None]]
+    assert merged["errors"] == ["cuenta 2 sin acceso"]
+
+
+def test_project_columns_drops_other_callers_columns():
+    data = {"headers": ["campaign", "clicks", "cost"], "rows": [["a", 1, 10]]}
+    projected = project_columns(data, ["campaign", "metrics.clicks"], ["campaign", "clicks", "cost"])
+    assert projected["headers"] == ["campaign", "clicks"]
+    assert projected["rows"] == [["a", 1]]
+
+
+def _recording_fetch(calls):
+    async def fetch(metrics, progress=None, **params):
+        calls.append(list(metrics))
+        if "bad" in metrics:
+            return {"headers": list(metrics), "rows": [], "errors": ["columna inválida: bad"]}
+        return {"headers": list(metrics), "rows": [[1] * len(metrics)]}
+    return fetch
+
+
+def test_report_batcher_merges_normalized_columns_once():
+    calls = []
+    batcher = ReportBatcher("test", _recording_fetch(calls), "metrics", window_ms=10)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit(metrics=["clicks"], account="1"),
+            batcher.submit(metrics=["metrics.clicks", "cost"], account="1"),
+        )
+
+    first, second = asyncio.run(run())
+    assert calls == [["clicks", "cost"]]
+    assert first["headers"] == ["clicks"]
+    assert second["headers"] == ["clicks", "cost"]
+
+
+def test_report_batcher_retries_each_caller_when_batch_fails():
+    calls = []
+    batcher = ReportBatcher("test", _recording_fetch(calls), "metrics", window_ms=10)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit(metrics=["clicks"], account="1"),
+            batcher.submit(metrics=["bad"], account="1"),
+        )
+
+    good, bad = asyncio.run(run())
+    assert calls[0] == ["clicks", "bad"]
+    assert sorted(calls[1:]) == [["bad"], ["clicks"]]
+    assert good == {"headers": ["clicks"], "rows": [[1]]}
+    assert bad["errors"] == ["columna inválida: bad"]
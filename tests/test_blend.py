@@ -0,0 +1,83 @@
+# tests/test_blend.py
+import pytest
+
+from server.blend import blend_reports, blend_table, campaign_normalizer, normalize_date
+
+PREFIXES = {"aw_": "google_ads", "fb_": "facebook_ads"}
+LABELS = {"google_ads": "Google Ads", "facebook_ads": "Facebook Ads"}
+
+
+def _normalize():
+    return campaign_normalizer(("prefix", "lowercase", "accents", "separators"), list(PREFIXES))
+
+
+def test_campaign_normalizer_rules():
+    normalize = _normalize()
+    assert normalize("AW_Promoción-Verano 2024") == "promocion verano 2024"
+    assert normalize("fb_promocion_verano.2024") == "promocion verano 2024"
+    assert campaign_normalizer(("lowercase",), [])("AW_Promo") == "aw_promo"
+    with pytest.raises(ValueError):
+        campaign_normalizer(("stemming",), [])
+
+
+def test_normalize_date():
+    assert normalize_date("20240501") == "2024-05-01"
+    assert normalize_date("2024-05-01T00:00:00") == "2024-05-01"
+
+
+def test_blend_reports_joins_campaigns_per_platform_and_date():
+    ads = {
+        "google_ads": {
+            "headers": ["segments.date", "campaign.name", "metrics.cost", "metrics.clicks"],
+            "rows": [
+                ["2024-05-01", "Promoción Verano", 100, 40],
+                ["2024-05-01", "Marca", 50, 10],
+            ],
+        },
+        "facebook_ads": {
+            "headers": ["date_start", "campaign_name", "spend", "clicks"],
+            "rows": [["2024-05-01", "Promo Invierno", "20", "5"]],
+        },
+    }
+    analytics = {
+        "headers": ["date", "sessionCampaignName", "sessions", "totalRevenue"],
+        "rows": [
+            ["20240501", "aw_promocion_verano", "30", "400"],
+            ["20240501", "fb_promo-invierno", "8", "60"],
+            ["20240501", "fb_solo_en_ga", "4", "0"],
+            ["20240501", "(direct)", "100", "900"],
+        ],
+    }
+    rows, summary = blend_reports(ads, analytics, _normalize(), PREFIXES, LABELS)
+
+    by_name = {row[1]: row for row in rows}
+    assert by_name["Promoción Verano"][2:] == ["Google Ads", 100.0, 40.0, 30.0, 400.0, 4.0]
+    assert by_name["Promo Invierno"][2:] == ["Facebook Ads", 20.0, 5.0, 8.0, 60.0, 3.0]
+    assert by_name["Marca"][5:] == [0.0, 0.0, 0.0]
+    assert by_name["fb_solo_en_ga"][2:] == ["Facebook Ads", 0.0, 0.0, 4.0, 0.0, None]
+    assert [row[1] for row in rows][0] == "Promoción Verano"
+
+    assert summary["matches"] == 2
+    assert summary["ad_campaigns"] == 3
+    assert summary["ga_only"] == 1
+    assert summary["unmatched_sessions"] == 100
+    assert summary["spend"] == 170
+    assert summary["roas"] == pytest.approx(460 / 170)
+
+
+def test_blend_without_dates_sums_the_period():
+    ads = {
+        "facebook_ads": {
+            "headers": ["date_start", "campaign_name", "spend"],
+            "rows": [["2024-05-01", "Promo", 10], ["2024-05-02", "Promo", 15]],
+        }
+    }
+    analytics = {
+        "headers": ["date", "sessionCampaignName", "sessions", "purchaseRevenue"],
+        "rows": [["20240501", "fb_promo", 3, 20], ["20240502", "fb_promo", 2, 30]],
+    }
+    rows, summary = blend_reports(ads, analytics, _normalize(), PREFIXES, LABELS, per_date=False)
+    assert rows == [["", "Promo", "Facebook Ads", 25.0, 0.0, 5.0, 50.0, 2.0]]
+    table = blend_table(rows, per_date=False)
+    assert table[0].startswith("| Campaña |")
+    assert "2.00" in table[2]
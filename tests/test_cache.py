@@ -0,0 +1,72 @@
+# tests/test_cache.py
+import asyncio
+
+from pitagoras.cache import ReportCache, estimate_size
+
+
+def _report(rows):
+    return {"headers": ["campaign", "clicks"], "rows": [[f"campaña {i}", i] for i in range(rows)]}
+
+
+def test_set_and_get_return_copies():
+    cache = ReportCache(ttl=60, max_entries=10)
+    cache.set("google_ads", {"a": 1}, _report(2))
+    cached = cache.get("google_ads", {"a": 1})
+    cached["rows"] = []
+    assert len(cache.get("google_ads", {"a": 1})["rows"]) == 2
+    assert cache.get("google_ads", {"a": 2}) is None
+
+
+def test_expired_entries_are_evicted():
+    cache = ReportCache(ttl=60, max_entries=10)
+    cache.set("google_ads", {"a": 1}, _report(2), ttl=0.001)
+    assert cache.size > 0
+    asyncio.run(asyncio.sleep(0.01))
+    assert cache.get("google_ads", {"a": 1}) is None
+    assert cache.size == 0
+
+
+def test_byte_limit_evicts_least_recently_used():
+    entry = estimate_size(_report(100))
+    cache = ReportCache(ttl=60, max_entries=100, max_bytes=int(entry * 2.5))
+    for i in range(3):
+        cache.set("google_ads", {"i": i}, _report(100))
+    assert cache.get("google_ads", {"i": 0}) is None
+    assert cache.get("google_ads", {"i": 2}) is not None
+    assert cache.size <= cache.max_bytes
+
+
+def test_oversized_responses_are_not_cached():
+    cache = ReportCache(ttl=60, max_entries=10, max_entry_bytes=estimate_size(_report(10)) * 2)
+    cache.set("google_ads", {"small": True}, _report(10))
+    cache.set("google_ads", {"small": False}, _report(1000))
+    assert cache.get("google_ads", {"small": True}) is not None
+    assert cache.get("google_ads", {"small": False}) is None
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ReportCache(ttl=60, max_entries=10)
+    calls = []
+
+    async def fetch(progress=None, **params):
+        calls.append(params)
+        await asyncio.sleep(0.01)
+        return _report(3)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_fetch("google_ads", {"a": 1}, fetch) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert calls == [{"a": 1}]
+    assert all(r == _report(3) for r in results)
+    assert cache.get("google_ads", {"a": 1}) == _report(3)
+
+
+def test_error_responses_are_not_cached():
+    cache = ReportCache(ttl=60, max_entries=10)
+
+    async def fetch(progress=None, **params):
+        return {"headers": [], "rows": [], "errors": ["sin acceso"]}
+
+    asyncio.run(cache.get_or_fetch("google_ads", {"a": 1}, fetch))
+    assert cache.get("google_ads", {"a": 1}) is None
@@ -0,0 +1,78 @@
+# tests/test_cassette.py
+import asyncio
+
+import httpx
+import pytest
+
+from pitagoras.cassette import RecordingTransport, ReplayTransport, load_cassette, request_key
+
+
+def _upstream(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/down":
+        raise httpx.ConnectError("sin conexión", request=request)
+    return httpx.Response(200, json={"path": request.url.path, "body": request.content.decode()})
+
+
+async def _record(path):
+    transport = RecordingTransport(str(path), httpx.MockTransport(_upstream))
+    async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+        responses = await asyncio.gather(
+            *(client.post(f"/report/{i}", json={"i": i}) for i in range(5)),
+            client.get("/customers", headers={"Authorization": "Bearer secreto"}),
+        )
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/down")
+    return responses
+
+
+def test_cassette_round_trip(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    recorded = asyncio.run(_record(path))
+
+    entries = load_cassette(str(path))
+    assert len(entries) == 7
+    customers = next(e for e in entries if e["url"] == "/customers")
+    assert customers["request_headers"]["authorization"] == "[REDACTED]"
+
+    async def replay():
+        transport = ReplayTransport(entries, latency_scale=0)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            report = await client.post("/report/3", json={"i": 3})
+            customers = await client.get("/customers")
+            with pytest.raises(httpx.ConnectError):
+                await client.get("/down")
+            with pytest.raises(httpx.ConnectError):
+                await client.post("/report/3", json={"i": 4})
+            return report, customers
+
+    report, customers = asyncio.run(replay())
+    assert report.json() == recorded[3].json()
+    assert customers.json() == recorded[5].json()
+
+
+def test_request_key_ignores_json_key_order():
+    a = request_key("POST", "/report", b'{"a": 1, "b": 2}')
+    b = request_key("POST", "/report", b'{"b":2,"a":1}')
+    assert a == b
+
+
+def test_transports_recording_to_one_file_share_its_lock(tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    first = RecordingTransport(str(path), httpx.MockTransport(_upstream))
+    second = RecordingTransport(str(tmp_path / "." / "cassette.jsonl.gz"), httpx.MockTransport(_upstream))
+    other = RecordingTransport(str(tmp_path / "otro.jsonl.gz"), httpx.MockTransport(_upstream))
+    assert first._lock is second._lock
+    assert first._lock is not other._lock
+
+    big = "x" * 200_000
+
+    async def record(transport, prefix):
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            await asyncio.gather(*(client.post(f"/{prefix}/{i}", content=big) for i in range(10)))
+
+    async def run():
+        await asyncio.gather(record(first, "a"), record(second, "b"))
+
+    asyncio.run(run())
+    entries = load_cassette(str(path))
+    assert sorted(e["url"] for e in entries) == sorted(f"/{p}/{i}" for p in "ab" for i in range(10))
@@ -0,0 +1,19 @@
+# tests/test_codec.py
+from datetime import date
+
+from pitagoras import codec
+
+
+def test_round_trip():
+    payload = {"campaña": "Año nuevo", "rows": [[1, 2.5, None, True]]}
+    assert codec.loads(codec.dumps(payload)) == payload
+
+
+def test_non_json_values_are_encoded_as_strings():
+    assert codec.loads(codec.dumps({"date": date(2024, 1, 31)})) == {"date": "2024-01-31"}
+
+
+def test_wide_integers_fall_back_to_the_standard_library():
+    big = 2 ** 70
+    assert codec.loads(codec.dumps({"n": big})) == {"n": big}
+    assert codec.loads(f'{{"n": {big}}}') == {"n": big}
@@ -0,0 +1,114 @@
+# tests/test_deadline.py
+import asyncio
+import time
+
+import pytest
+
+from pitagoras import deadline, progress
+from pitagoras.batching import ReportBatcher
+from pitagoras.cache import ReportCache
+
+
+def test_request_timeout_without_deadline():
+    assert deadline.request_timeout(30.0) == 30.0
+    assert deadline.request_timeout(None) is None
+
+
+def test_request_timeout_is_clamped_to_the_deadline():
+    with deadline.deadline(1.0):
+        assert deadline.request_timeout(30.0) <= 1.0
+        assert deadline.request_timeout(None) <= 1.0
+        assert deadline.request_timeout(0.5) == 0.5
+
+
+def test_inner_deadline_never_extends_the_outer_one():
+    with deadline.deadline(1.0):
+        with deadline.deadline(60.0):
+            assert deadline.remaining() <= 1.0
+
+
+def test_expired_deadline_raises():
+    with deadline.deadline(0.001):
+        time.sleep(0.01)
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.request_timeout(30.0)
+
+
+def test_detached_context_drops_deadline_and_progress():
+    async def send(done, total, message):
+        pass
+
+    with deadline.deadline(1.0), progress.tracking(send):
+        context = deadline.detached_context()
+        assert deadline.remaining() is not None
+    assert context.run(deadline.remaining) is None
+    assert context.run(progress.current) is None
+
+
+def test_shared_deadline_is_the_latest_of_its_members():
+    shared = deadline.SharedDeadline()
+    assert shared.at is None
+    shared.join(10.0)
+    shared.join(20.0)
+    assert shared.at == 20.0
+    shared.leave(20.0)
+    assert shared.at == 10.0
+    shared.join(None)
+    assert shared.at is None
+
+
+def test_nested_shared_deadlines_resolve_through_the_outer_one():
+    outer = deadline.SharedDeadline()
+    outer.join(5.0)
+    inner = deadline.SharedDeadline()
+    inner.join(outer)
+    assert inner.at == 5.0
+    outer.join(8.0)
+    assert inner.at == 8.0
+
+
+def _seen_remaining(seen):
+    async def fetch(progress=None, **params):
+        await asyncio.sleep(0.02)
+        seen.append(deadline.remaining())
+        return {"headers": ["clicks"], "rows": [[1]]}
+    return fetch
+
+
+def test_shared_cache_fetch_is_bounded_by_its_callers_deadlines():
+    cache = ReportCache(ttl=0, max_entries=10)
+    seen = []
+    fetch = _seen_remaining(seen)
+
+    async def call(seconds):
+        with deadline.deadline(seconds):
+            return await cache.get_or_fetch("google_ads", {"a": 1}, fetch)
+
+    async def run():
+        await asyncio.gather(call(5), call(10))
+        await asyncio.gather(call(5), cache.get_or_fetch("google_ads", {"a": 1}, fetch))
+
+    asyncio.run(run())
+    assert 5 < seen[0] <= 10
+    assert seen[1] is None
+
+
+def test_batched_request_is_bounded_by_its_callers_deadlines():
+    seen = []
+
+    async def fetch(metrics, progress=None, **params):
+        seen.append(deadline.remaining())
+        return {"headers": list(metrics), "rows": [[1] * len(metrics)]}
+
+    batcher = ReportBatcher("test", fetch, "metrics", window_ms=10)
+
+    async def call(seconds, metrics):
+        with deadline.deadline(seconds):
+            return await batcher.submit(metrics=metrics, account="1")
+
+    async def run():
+        await asyncio.gather(call(3, ["clicks"]), call(4, ["cost"]))
+
+    asyncio.run(run())
+    assert len(seen) == 1
+    assert 3 < seen[0] <= 4
@@ -0,0 +1,43 @@
+# tests/test_derived.py
+from server.derived import action_value, add_derived_metrics, expand_action_columns, required_metrics
+
+
+def test_action_value_prefers_one_purchase_type():
+    actions = [
+        {"action_type": "link_click", "value": "40"},
+        {"action_type": "purchase", "value": "4"},
+        {"action_type": "omni_purchase", "value": "5"},
+    ]
+    assert action_value(actions) == 5.0
+    assert action_value('[{"action_type": "purchase", "value": "4"}]') == 4.0
+    assert action_value(None) == 0.0
+    assert action_value("no es json") == 0.0
+
+
+def test_facebook_base_columns_are_requested_from_action_lists():
+    assert required_metrics("facebook_ads", ["roas", "cpa"]) == ["action_values", "spend", "actions"]
+
+
+def test_facebook_roas_and_cpa_from_actions():
+    headers = ["campaign_name", "spend", "actions", "action_values"]
+    rows = [
+        [
+            "Campaña",
+            "30",
+            [{"action_type": "purchase", "value": "4"}],
+            [{"action_type": "purchase", "value": "60"}],
+        ]
+    ]
+    headers, rows = expand_action_columns(headers, rows)
+    assert headers[-2:] == ["actions:purchase", "action_values:purchase"]
+
+    headers, rows, errors = add_derived_metrics("facebook_ads", headers, rows, ["roas", "cpa"])
+    assert errors == []
+    assert headers[-2:] == ["roas", "cpa"]
+    assert rows[0][-2:] == [2.0, 7.5]
+
+
+def test_missing_base_columns_are_reported():
+    headers, rows, errors = add_derived_metrics("google_ads", ["metrics.clicks"], [[10]], ["ctr", "foo"])
+    assert rows == [[10]]
+    assert len(errors) == 2
@@ -0,0 +1,40 @@
+# tests/test_export.py
+import pytest
+
+from server.export import export_report, infer_column_types
+
+pa = pytest.importorskip("pyarrow")
+
+
+def test_infer_column_types():
+    headers = ["date", "campaign", "clicks", "cost"]
+    rows = [["2024-01-01", "a", "10", "1.5"], ["2024-01-02", "b", 3, None]]
+    kinds = infer_column_types(headers, rows)
+    assert kinds[1] == "string"
+    assert kinds[2] != kinds[1]
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_export_report_writes_typed_file(tmp_path, export_format):
+    headers = ["campaign", "clicks", "cost"]
+    rows = [["a", "10", "1.5"], ["b", "3", "2"]]
+    summary = export_report(headers, rows, export_format, "google_ads_cliente", str(tmp_path))
+
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert str(files[0]) in summary
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(files[0])
+    else:
+        import pyarrow.ipc as ipc
+        table = ipc.open_file(str(files[0])).read_all()
+    assert table.column_names == headers
+    assert table.num_rows == 2
+    assert pa.types.is_string(table.schema.field("campaign").type)
+    assert not pa.types.is_string(table.schema.field("clicks").type)
+
+
+def test_export_report_rejects_unknown_formats(tmp_path):
+    with pytest.raises(ValueError):
+        export_report(["a"], [[1]], "xlsx", "x", str(tmp_path))
@@ -0,0 +1,53 @@
+# tests/test_filters.py
+import pytest
+
+from pitagoras.filters import FilterCompileError, apply_filter, compile_filter, filter_vars
+
+HEADERS = ["sessionDefaultChannelGroup", "deviceCategory", "sessions", "totalRevenue"]
+ROWS = [
+    ["Organic Search", "mobile", "120", "0"],
+    ["Paid Search", "desktop", "80", "1500.5"],
+    ["Paid Social", "mobile", "45", "300"],
+    ["Direct", "tablet", "5", "0"],
+]
+
+
+def test_compile_filter_compares_numeric_strings():
+    predicate = compile_filter({">=": [{"var": "sessions"}, 80]}, HEADERS)
+    assert [row[0] for row in ROWS if predicate(row)] == ["Organic Search", "Paid Search"]
+
+
+def test_compile_filter_combines_conditions():
+    spec = {
+        "and": [
+            {"in": ["Paid", {"var": "sessionDefaultChannelGroup"}]},
+            {"!": {"==": [{"var": "deviceCategory"}, "desktop"]}},
+        ]
+    }
+    predicate = compile_filter(spec, HEADERS)
+    assert [row[0] for row in ROWS if predicate(row)] == ["Paid Social"]
+
+
+def test_compile_filter_membership():
+    predicate = compile_filter({"in": [{"var": "deviceCategory"}, ["tablet", "desktop"]]}, HEADERS)
+    assert [row[1] for row in ROWS if predicate(row)] == ["desktop", "tablet"]
+
+
+def test_compile_filter_rejects_unknown_columns_and_operators():
+    with pytest.raises(FilterCompileError):
+        compile_filter({"==": [{"var": "country"}, "MX"]}, HEADERS)
+    with pytest.raises(FilterCompileError):
+        compile_filter({"regex": [{"var": "deviceCategory"}, "^m"]}, HEADERS)
+
+
+def test_apply_filter_keeps_headers_and_matching_rows():
+    data = {"headers": HEADERS, "rows": ROWS, "rowCount": 4}
+    result = apply_filter({">": [{"var": "totalRevenue"}, 0]}, data)
+    assert result["headers"] == HEADERS
+    assert [row[0] for row in result["rows"]] == ["Paid Search", "Paid Social"]
+    assert data["rows"] is ROWS
+
+
+def test_filter_vars():
+    spec = {"or": [{"var": "sessions"}, {"==": [{"var": ["deviceCategory"]}, "mobile"]}]}
+    assert filter_vars(spec) == {"sessions", "deviceCategory"}
@@ -0,0 +1,102 @@
+# tests/test_planner.py
+import asyncio
+
+import pytest
+
+from server import planner as planner_module
+from server.planner import QueryPlanner
+
+GENERIC = {
+    "dimensions": [{"value": "date"}, {"value": "sessionDefaultChannelGroup"}],
+    "metrics": [{"value": "sessions"}, {"value": "totalRevenue"}],
+}
+PROPERTIES = {
+    "111": {
+        "dimensions": GENERIC["dimensions"] + [{"value": "customEvent:tienda"}],
+        "metrics": GENERIC["metrics"],
+    },
+    "222": {
+        "dimensions": GENERIC["dimensions"],
+        "metrics": GENERIC["metrics"] + [{"value": "customEvent:valor"}],
+    },
+}
+
+
+@pytest.fixture
+def metadata_calls(monkeypatch):
+    calls = []
+
+    async def get_analytics4_metadata(property_id="0", credential_email=None):
+        calls.append(property_id)
+        return PROPERTIES.get(property_id, GENERIC)
+
+    async def get_adwords_metrics(resource):
+        return [{"name": "metrics.clicks"}, {"name": "metrics.cost_micros"}]
+
+    async def get_adwords_segments(resource):
+        return ["segments.date", "segments.device"]
+
+    async def get_facebook_schema():
+        return {"fields": [{"name": "spend"}, {"name": "impressions"}, {"name": "campaign_name"}]}
+
+    monkeypatch.setattr(planner_module, "get_analytics4_metadata", get_analytics4_metadata)
+    monkeypatch.setattr(planner_module, "get_adwords_metrics", get_adwords_metrics)
+    monkeypatch.setattr(planner_module, "get_adwords_segments", get_adwords_segments)
+    monkeypatch.setattr(planner_module, "get_facebook_schema", get_facebook_schema)
+    return calls
+
+
+def _account(property_id):
+    return {"property_id": property_id, "credential_email": "datos@example.com"}
+
+
+def test_google_analytics_columns_are_validated_per_property(metadata_calls):
+    planner = QueryPlanner()
+    plan = asyncio.run(
+        planner.plan_google_analytics(
+            ["Date", "customEvent:tienda"], ["sessions", "customEvent:valor"], [_account("111"), _account("222")]
+        )
+    )
+    assert plan.ok
+    assert plan.columns == {"dimensions": ["date", "customEvent:tienda"], "metrics": ["sessions", "customEvent:valor"]}
+    assert sorted(metadata_calls) == ["111", "222"]
+
+    plan = asyncio.run(planner.plan_google_analytics(["customEvent:otra"], ["sessions"], [_account("111")]))
+    assert not plan.ok
+    assert sorted(metadata_calls) == ["111", "222"]
+
+
+def test_scoped_columns_pass_through_without_properties(metadata_calls):
+    plan = asyncio.run(QueryPlanner().plan_google_analytics(["customUser:nivel"], ["sessions"]))
+    assert plan.ok
+    assert plan.columns["dimensions"] == ["customUser:nivel"]
+
+
+def test_unknown_columns_get_suggestions(metadata_calls):
+    plan = asyncio.run(QueryPlanner().plan_google_analytics(["date"], ["sesions"]))
+    assert not plan.ok
+    assert "sessions" in plan.errors[0]
+    assert "# Solicitud inválida" in plan.error_message()
+
+
+def test_google_ads_metrics_are_prefixed_and_segments_moved(metadata_calls):
+    plan = asyncio.run(QueryPlanner().plan_google_ads(["clicks", "metrics.clicks", "segments.device"]))
+    assert plan.ok
+    assert plan.columns == {"metrics": ["metrics.clicks"], "segments": ["segments.device"]}
+    assert plan.notes
+
+
+def test_facebook_fields(metadata_calls):
+    plan = asyncio.run(QueryPlanner().plan_facebook(["Spend", "campaign_name", "revenue"]))
+    assert plan.columns["fields"] == ["spend", "campaign_name"]
+    assert len(plan.errors) == 1
+
+
+def test_validation_is_skipped_when_metadata_fails(monkeypatch):
+    async def failing(*args, **kwargs):
+        raise RuntimeError("sin metadata")
+
+    monkeypatch.setattr(planner_module, "get_facebook_schema", failing)
+    plan = asyncio.run(QueryPlanner().plan_facebook(["cualquier_campo"]))
+    assert plan.ok
+    assert plan.columns["fields"] == ["cualquier_campo"]
@@ -0,0 +1,65 @@
+# tests/test_portfolio.py
+import asyncio
+
+from pitagoras.models import Customer
+from server.portfolio import RateLimiter, fetch_portfolio, select_customers, summarize_report
+
+
+def _customers():
+    payload = [
+        {"ID": "1", "name": "Tienda Norte", "status": "Activo", "accounts": []},
+        {"ID": "2", "name": "Tienda Sur", "status": "Inactivo", "accounts": []},
+        {"ID": "3", "name": "Tienda Centro", "status": "ACTIVO", "accounts": []},
+    ]
+    return [Customer.from_dict(c) for c in payload]
+
+
+def test_default_status_matches_the_api_spanish_value():
+    customers = _customers()
+    assert [c.id for c in select_customers(customers, "active")] == ["1", "3"]
+    assert [c.id for c in select_customers(customers, "Activo")] == ["1", "3"]
+    assert [c.id for c in select_customers(customers, "inactive")] == ["2"]
+
+
+def test_all_status_keeps_every_customer():
+    customers = _customers()
+    assert len(select_customers(customers, "all")) == 3
+    assert len(select_customers(customers, None)) == 3
+
+
+def test_status_filter_applies_to_query_matches():
+    customers = _customers()
+    matches = [customers[1], customers[2]]
+    assert [c.id for c in select_customers(customers, "active", matches)] == ["3"]
+
+
+def test_summarize_report_sums_metric_columns():
+    data = {"headers": ["campaign", "clicks", "cost"], "rows": [["a", "3", 1.5], ["b", 2, "2.5"]]}
+    assert summarize_report(data, [1, 2]) == [5.0, 4.0]
+    assert summarize_report({"rows": []}, [1]) == [0.0]
+
+
+def test_fetch_portfolio_keeps_going_when_a_customer_fails():
+    customers = _customers()
+    running = 0
+    peak = 0
+
+    async def fetch(customer):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if customer.id == "2":
+            raise RuntimeError("sin acceso\ndetalle")
+        if customer.id == "3":
+            return {"rows": [], "errors": ["cuenta suspendida"]}
+        return {"rows": [[1]]}
+
+    results = asyncio.run(fetch_portfolio(customers, fetch, concurrency=2, limiter=RateLimiter(0)))
+    assert [(c.id, data, error) for c, data, error in results] == [
+        ("1", {"rows": [[1]]}, None),
+        ("2", None, "sin acceso"),
+        ("3", None, "['cuenta suspendida']"),
+    ]
+    assert peak == 2
@@ -0,0 +1,53 @@
+# tests/test_progress.py
+import asyncio
+
+from pitagoras.progress import Progress, SharedProgress
+
+
+def _tracker():
+    sent = []
+
+    async def send(done, total, message):
+        sent.append((done, total, message))
+
+    return Progress(send), sent
+
+
+def test_shared_progress_steps_every_member():
+    (first, sent_first), (second, sent_second) = _tracker(), _tracker()
+    shared = SharedProgress(first, second)
+    shared.plan(2, accounts=4)
+    asyncio.run(shared.step("Google Ads", rows=10, accounts=2))
+    assert first.steps_done == second.steps_done == 1
+    assert first.steps_total == 2
+    assert sent_first[0][:2] == (1, 2)
+    assert "2/4 cuentas" in sent_second[0][2]
+
+
+def test_late_member_is_caught_up_silently():
+    shared = SharedProgress()
+    shared.plan(3)
+    asyncio.run(shared.step("lote", rows=5, accounts=1))
+    late, sent = _tracker()
+    shared.join(late)
+    assert (late.steps_done, late.steps_total, late.rows) == (1, 3, 5)
+    assert sent == []
+
+
+def test_member_that_left_gets_no_more_steps():
+    member, sent = _tracker()
+    shared = SharedProgress(member)
+    shared.leave(member)
+    asyncio.run(shared.step("lote"))
+    assert member.steps_done == 0
+    assert sent == []
+
+
+def test_nested_shared_progress():
+    member, sent = _tracker()
+    outer = SharedProgress(member)
+    inner = SharedProgress(outer)
+    inner.plan(1)
+    asyncio.run(inner.step("lote", rows=3))
+    assert (member.steps_done, member.steps_total, member.rows) == (1, 1, 3)
+    assert len(sent) == 1
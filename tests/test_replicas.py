@@ -0,0 +1,112 @@
+# tests/test_replicas.py
+import asyncio
+
+import httpx
+import pytest
+
+from pitagoras import api
+from pitagoras.replicas import ReplicaPool
+
+
+def _pool(handler, monkeypatch, urls=("http://a.test", "http://b.test")):
+    pool = ReplicaPool(
+        list(urls),
+        lambda url: httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(handler)),
+        failure_threshold=1,
+    )
+    monkeypatch.setattr(api, "replicas", pool)
+    return pool
+
+
+def test_idempotent_requests_fail_over(monkeypatch):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(503 if request.url.host == "a.test" else 200)
+
+    pool = _pool(handler, monkeypatch)
+    response = asyncio.run(api._send("POST", "/report", True, content=b"{}"))
+    assert response.status_code == 200
+    assert hosts == ["a.test", "b.test"]
+    assert not pool.replicas[0].healthy
+    assert pool.ordered()[0].base_url == "http://b.test"
+
+
+def test_non_idempotent_requests_use_one_replica(monkeypatch):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(503)
+
+    _pool(handler, monkeypatch)
+    response = asyncio.run(api._send("POST", "/report", False, content=b"{}"))
+    assert response.status_code == 503
+    assert hosts == ["a.test"]
+
+
+def test_timeouts_are_not_failed_over(monkeypatch):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        raise httpx.ReadTimeout("lento", request=request)
+
+    _pool(handler, monkeypatch)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(api._send("POST", "/report", True, content=b"{}"))
+    assert hosts == ["a.test"]
+
+
+def test_health_checks_keep_probe_latency_apart(monkeypatch):
+    pool = _pool(lambda request: httpx.Response(200), monkeypatch)
+    replica = pool.replicas[0]
+    replica.down_until = float("inf")
+
+    assert asyncio.run(pool.check(replica))
+    assert replica.healthy
+    assert replica.latency is None
+    assert replica.probe_latency is not None
+    assert replica.requests == 0
+
+
+@pytest.mark.parametrize("error", [httpx.ConnectTimeout, httpx.PoolTimeout])
+def test_timeouts_before_reaching_the_replica_fail_over(monkeypatch, error):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        if request.url.host == "a.test":
+            raise error("sin conexión", request=request)
+        return httpx.Response(200)
+
+    _pool(handler, monkeypatch)
+    response = asyncio.run(api._send("POST", "/report", True, content=b"{}"))
+    assert response.status_code == 200
+    assert hosts == ["a.test", "b.test"]
+
+
+def test_write_timeouts_are_not_failed_over(monkeypatch):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        raise httpx.WriteTimeout("lento", request=request)
+
+    _pool(handler, monkeypatch)
+    with pytest.raises(httpx.WriteTimeout):
+        asyncio.run(api._send("POST", "/report", True, content=b"{}"))
+    assert hosts == ["a.test"]
+
+
+def test_fast_failing_replica_never_ranks_first(monkeypatch):
+    pool = _pool(lambda request: httpx.Response(200), monkeypatch)
+    refusing, healthy = pool.replicas
+    for _ in range(5):
+        pool.record(healthy, 0.02, ok=True)
+        pool.record(refusing, 0.0003, ok=False)
+        # Fin del enfriamiento: vuelve a la rotación
+        refusing.down_until = 0.0
+        assert pool.ordered()[0] is healthy
+    assert refusing.errors == 5
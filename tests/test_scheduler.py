@@ -0,0 +1,71 @@
+# tests/test_scheduler.py
+import asyncio
+import importlib
+from datetime import date, datetime, time as dtime
+
+from pitagoras.cache import AccessStats, ReportCache
+from server.scheduler import RefreshScheduler, in_window, parse_window, rolled_params, seconds_until
+
+
+# server/__init__.py exporta la instancia "scheduler", que oculta el módulo como atributo del paquete
+scheduler_module = importlib.import_module("server.scheduler")
+
+
+def test_parse_window():
+    assert parse_window("01:00 - 05:30") == (dtime(1, 0), dtime(5, 30))
+
+
+def test_in_window_wraps_past_midnight():
+    start, end = parse_window("22:00-04:00")
+    assert in_window(datetime(2024, 5, 1, 23, 0), start, end)
+    assert in_window(datetime(2024, 5, 1, 3, 59), start, end)
+    assert not in_window(datetime(2024, 5, 1, 4, 0), start, end)
+    assert not in_window(datetime(2024, 5, 1, 12, 0), *parse_window("01:00-05:00"))
+
+
+def test_seconds_until_the_next_start():
+    assert seconds_until(datetime(2024, 5, 1, 0, 30), dtime(1, 0)) == 1800
+    assert seconds_until(datetime(2024, 5, 1, 2, 0), dtime(1, 0)) == 23 * 3600
+
+
+def _stats(start, end, accessed):
+    stats = AccessStats("google_ads", {"start_date": start, "end_date": end, "accounts": ["1"]})
+    stats.last_access = datetime.combine(accessed, dtime(12, 0)).timestamp()
+    return stats
+
+
+def test_relative_ranges_are_rolled_forward():
+    stats = _stats("2024-04-24", "2024-04-30", date(2024, 5, 1))
+    params = rolled_params(stats, date(2024, 5, 3))
+    assert (params["start_date"], params["end_date"]) == ("2024-04-26", "2024-05-02")
+    assert params["accounts"] == ["1"]
+
+
+def test_fixed_ranges_are_refreshed_as_is():
+    stats = _stats("2024-01-01", "2024-01-31", date(2024, 5, 1))
+    assert rolled_params(stats, date(2024, 5, 3)) is stats.params
+    same_day = _stats("2024-04-24", "2024-04-30", date(2024, 5, 3))
+    assert rolled_params(same_day, date(2024, 5, 3)) is same_day.params
+
+
+def test_refresh_hot_refetches_only_hot_specs(monkeypatch):
+    cache = ReportCache(ttl=60, max_entries=10)
+    monkeypatch.setattr(scheduler_module, "report_cache", cache)
+    calls = []
+
+    async def fetch(progress=None, **params):
+        calls.append(params)
+        return {"headers": ["clicks"], "rows": [[1]]}
+
+    today = date.today().isoformat()
+
+    async def run():
+        for _ in range(3):
+            await cache.get_or_fetch("google_ads", {"start_date": "2024-01-01", "end_date": "2024-01-31"}, fetch)
+        await cache.get_or_fetch("google_ads", {"start_date": today, "end_date": today}, fetch)
+        calls.clear()
+        scheduler = RefreshScheduler(False, "01:00-05:00", 30, 2, 5, 2, 3600)
+        return await scheduler.refresh_hot()
+
+    assert asyncio.run(run()) == 1
+    assert calls == [{"start_date": "2024-01-01", "end_date": "2024-01-31"}]
@@ -0,0 +1,42 @@
+# tests/test_search.py
+from pitagoras.models import Customer
+from pitagoras.search import CustomerIndex, trigrams
+
+
+def _index():
+    names = ["Zapatería López", "Ñandú Viajes", "Tienda Norte", "Tienda Sur", "Farmacia Central"]
+    customers = [
+        Customer.from_dict({"ID": f"RG-{i:03d}", "name": name, "status": "Activo", "accounts": []})
+        for i, name in enumerate(names, 1)
+    ]
+    return CustomerIndex(customers)
+
+
+def _names(results):
+    return [c.name for c in results]
+
+
+def test_trigrams_are_padded():
+    assert trigrams("ab") == {" ab", "ab "}
+
+
+def test_search_ignores_accents_and_small_typos():
+    index = _index()
+    assert _names(index.search("nandu"))[0] == "Ñandú Viajes"
+    assert _names(index.search("zapateria lopes"))[0] == "Zapatería López"
+
+
+def test_search_by_id():
+    assert _names(_index().search("rg-004"))[0] == "Tienda Sur"
+
+
+def test_word_prefixes_rank_before_fuzzy_matches():
+    assert _names(_index().search("tienda"))[:2] == ["Tienda Norte", "Tienda Sur"]
+    assert _names(_index().search("tie sur"))[0] == "Tienda Sur"
+
+
+def test_short_and_empty_queries():
+    index = _index()
+    assert "Tienda Sur" in _names(index.search("su"))
+    assert len(index.search("", limit=3)) == 3
+    assert index.search("xyzzy") == []
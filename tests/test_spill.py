@@ -0,0 +1,61 @@
+# tests/test_spill.py
+import json
+
+import pytest
+
+from server.reports import transform_report
+from server.spill import maybe_spill, spill_rows
+
+pytest.importorskip("pyarrow")
+
+HEADERS = ["campaign_name", "spend", "actions", "action_values"]
+
+
+def _facebook_rows(count):
+    return [
+        [
+            f"Campaña {i % 2}",
+            "15",
+            [{"action_type": "link_click", "value": "9"}, {"action_type": "purchase", "value": "2"}],
+            [{"action_type": "purchase", "value": "30"}],
+        ]
+        for i in range(count)
+    ]
+
+
+def test_spilled_rows_behave_like_a_list(tmp_path):
+    rows = [[f"c{i}", i, i / 2] for i in range(10)]
+    spilled = spill_rows(["campaign", "clicks", "cost"], rows, str(tmp_path))
+    assert len(spilled) == 10
+    assert list(spilled) == rows
+    assert spilled[3] == rows[3]
+    assert spilled[-1] == rows[-1]
+    assert spilled[2:5] == rows[2:5]
+    assert spilled.column("clicks") == list(range(10))
+    spilled.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nested_cells_are_spilled_as_json(tmp_path):
+    rows = _facebook_rows(2)
+    spilled = spill_rows(HEADERS, rows, str(tmp_path))
+    assert json.loads(spilled[0][2]) == rows[0][2]
+    spilled.close()
+
+
+def test_small_results_stay_in_memory():
+    data = {"headers": HEADERS, "rows": _facebook_rows(2)}
+    assert maybe_spill(dict(data), threshold_mb=100)["rows"] == data["rows"]
+
+
+def test_derived_metrics_from_a_spilled_facebook_report():
+    data = maybe_spill({"headers": HEADERS, "rows": _facebook_rows(100)}, threshold_mb=0.001)
+    assert not isinstance(data["rows"], list)
+
+    headers, rows, errors = transform_report(
+        "facebook_ads", data["headers"], data["rows"], None, ["campaign_name"], ["roas", "cpa"]
+    )
+    assert errors == []
+    roas, cpa = headers.index("roas"), headers.index("cpa")
+    assert [(row[roas], row[cpa]) for row in rows] == [(2.0, 7.5), (2.0, 7.5)]
+    data["rows"].close()
@@ -0,0 +1,57 @@
+# tests/test_utils.py
+from pitagoras.models import Customer
+from server.reports import platform_accounts
+from server.utils import get_account_index, parse_account_selection
+
+
+def _customer():
+    accounts = [
+        {"provider": "adwords", "accountID": str(i), "name": f"Tienda {i}"} for i in range(1, 50)
+    ]
+    accounts.append({"provider": "adwords", "accountID": "140", "name": "Cuenta 140"})
+    accounts.append({"provider": "adwords", "accountID": "123-456-7890", "name": "Tienda México"})
+    return Customer.from_dict({"ID": "C1", "name": "Cliente", "status": "active", "accounts": accounts})
+
+
+def _select(selection, customer=None):
+    customer = customer or _customer()
+    accounts = platform_accounts(customer, "google_ads")
+    return [a["id"] for a in parse_account_selection(selection, accounts, "google_ads", customer)]
+
+
+def test_range_is_resolved_before_ids():
+    selected = _select("1-40")
+    assert len(selected) == 40
+    assert "140" not in selected
+
+
+def test_numbers_outside_the_table_are_ids():
+    assert _select("140") == ["140"]
+    assert _select("id:140") == ["140"]
+
+
+def test_google_ads_ids_match_with_or_without_dashes():
+    assert _select("1234567890") == ["123-456-7890"]
+    assert _select("123-456-7890") == ["123-456-7890"]
+
+
+def test_names_are_accent_insensitive_and_support_patterns():
+    assert _select("tienda mexico") == ["123-456-7890"]
+    assert _select("tienda 4*") == ["4"] + [str(i) for i in range(40, 50)]
+
+
+def test_selection_has_no_duplicates():
+    assert _select("1,1-2,id:1") == ["1", "2"]
+
+
+def test_platform_keyword_only_selects_its_platform():
+    assert len(_select("all_google_ads")) == 51
+    assert _select("all_facebook_ads") == []
+
+
+def test_account_index_is_cached_on_the_customer():
+    customer = _customer()
+    accounts = platform_accounts(customer, "google_ads")
+    index = get_account_index(accounts, "google_ads", customer)
+    assert get_account_index(accounts, "google_ads", customer) is index
+    assert get_account_index(accounts, "google_ads") is not index